@@ -0,0 +1,294 @@
+# archive.py
+import argparse
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from repository import repository, collection_name, record_key
+from records import DefenseStatus, RequestStatus, decode_record, encode_record
+from ids import id_time
+from thesis_search import field_counts, tokenize
+
+ARCHIVE_DIR = "data/archive"
+THESIS_REQUESTS_FILE = "data/thesis_requests.json"
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+# رکورد بسته‌شده تا این مدت در فایل اصلی می‌ماند تا اصلاح‌های دیرهنگام ممکن باشد
+ARCHIVE_AFTER_DAYS = 30
+
+
+def _parse_time(text) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(text) if text else None
+    except (TypeError, ValueError):
+        return None
+
+
+def record_year(path: str, record: dict) -> str:
+    """Year a request belongs to: from its time-ordered ID, else its request date"""
+    moment = id_time(record.get(record_key(path)))
+    if moment is not None:
+        return str(moment.year)
+    year = str(record.get("request_date") or "")[:4]
+    return year if year.isdigit() else "undated"
+
+
+def graded_on(defense: dict) -> Optional[datetime]:
+    """When an approved defense got its last reviewer's grade, or None until both have graded"""
+    if defense.get("status") != DefenseStatus.APPROVED.value:
+        return None
+    reviewers = [defense.get("internal_reviewer_id"), defense.get("external_reviewer_id")]
+    grades = defense.get("grades") or {}
+    if not all(reviewers) or any(r not in grades for r in reviewers):
+        return None
+    dates = [_parse_time(grades[r].get("grading_date")) for r in reviewers]
+    return max((d for d in dates if d is not None), default=None) or datetime.min
+
+
+class ColdArchive:
+    """Closed requests moved out of the hot JSON files into per-year gzip files.
+
+    A fully graded defense and a rejected thesis request are closed once
+    they have been left alone for ARCHIVE_AFTER_DAYS; an approved thesis
+    request closes together with its student's graded defense. run() appends
+    the closed records to data/archive/<collection>-<year>.jsonl.gz (one JSON
+    object per line, each run adds a gzip member) and only then removes them
+    from the hot file with repository.remove_many, which checks every record
+    again under the lock. A crash in between, or a record that changed and
+    was not removed, leaves a copy in both places; readers prefer the hot
+    copy, and of several archived copies of a key only the last one counts.
+
+    Readers decompress on the fly and never hold an archive in memory. The
+    only cached data is, per archive file, which students appear in it with
+    which statuses and which lines were superseded by a later copy of the
+    same key, so the student views skip the files that cannot match.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        # archive file -> (signature, {student_id: statuses}, superseded line numbers)
+        self._summaries: Dict[str, tuple] = {}
+
+    # ----------------- فایل‌ها -----------------
+    def file_for(self, path: str, year: str) -> str:
+        return os.path.join(self.directory, f"{collection_name(path)}-{year}.jsonl.gz")
+
+    def files(self, path: str, years: Optional[Iterable] = None) -> List[str]:
+        """Archive files of a collection, oldest year first"""
+        prefix = collection_name(path) + "-"
+        try:
+            names = sorted(n for n in os.listdir(self.directory)
+                           if n.startswith(prefix) and n.endswith(".jsonl.gz"))
+        except FileNotFoundError:
+            return []
+        if years is not None:
+            wanted = {f"{prefix}{year}.jsonl.gz" for year in years}
+            names = [n for n in names if n in wanted]
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _read(self, path: str, archive_file: str) -> Iterator[dict]:
+        collection = collection_name(path)
+        try:
+            with gzip.open(archive_file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield decode_record(collection, json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # خط نیمه‌کاره‌ی یک اجرای قطع‌شده
+        except FileNotFoundError:
+            return
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            return  # عضو آخر ناقص است؛ رکوردهای قبلی خوانده شده‌اند
+
+    def _append(self, path: str, records: List[dict]):
+        by_year: Dict[str, List[dict]] = {}
+        for record in records:
+            by_year.setdefault(record_year(path, record), []).append(record)
+        os.makedirs(self.directory, exist_ok=True)
+        for year, chunk in by_year.items():
+            data = "".join(json.dumps(r, ensure_ascii=False, default=encode_record) + "\n" for r in chunk)
+            with open(self.file_for(path, year), "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    f.write(data.encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    # ----------------- خواندن -----------------
+    def iter_records(self, path: str, years: Optional[Iterable] = None,
+                     files: Optional[List[str]] = None) -> Iterator[dict]:
+        """Stream the archived records of a collection, the last copy of each key"""
+        # یک کلید همیشه در فایل همان سال می‌ماند، پس نسخه‌های تکراری در یک فایل‌اند
+        for archive_file in self.files(path, years) if files is None else files:
+            superseded = self._summary(path, archive_file)[1]
+            for line, record in enumerate(self._read(path, archive_file)):
+                if line not in superseded:
+                    yield record
+
+    def all_records(self, path: str) -> Iterator[dict]:
+        """Hot records followed by the archived ones that are not hot any more"""
+        hot = repository.load(path)
+        yield from hot
+        key_field = record_key(path)
+        keys = {r.get(key_field) for r in hot}
+        for record in self.iter_records(path):
+            if record.get(key_field) not in keys:
+                yield record
+
+    def _summary(self, path: str, archive_file: str) -> tuple:
+        """({student_id: statuses}, superseded line numbers) of an archive file"""
+        try:
+            stat = os.stat(archive_file)
+        except FileNotFoundError:
+            return {}, set()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._summaries.get(archive_file)
+            if cached is not None and cached[0] == signature:
+                return cached[1], cached[2]
+        key_field = record_key(path)
+        last: Dict[object, int] = {}
+        statuses: Dict[object, tuple] = {}
+        superseded = set()
+        for line, record in enumerate(self._read(path, archive_file)):
+            key = record.get(key_field)
+            if key in last:
+                superseded.add(last[key])
+            last[key] = line
+            statuses[key] = (record.get("student_id"), record.get("status"))
+        students: Dict[str, Set[str]] = {}
+        for student_id, status in statuses.values():
+            students.setdefault(student_id, set()).add(status)
+        with self._lock:
+            self._summaries[archive_file] = (signature, students, superseded)
+        return students, superseded
+
+    def _student_statuses(self, path: str, archive_file: str) -> Dict[str, Set[str]]:
+        return self._summary(path, archive_file)[0]
+
+    def statuses(self, path: str, student_id: str) -> Set[str]:
+        """Statuses of a student's archived requests in a collection"""
+        result = set()
+        for archive_file in self.files(path):
+            result |= self._student_statuses(path, archive_file).get(student_id, set())
+        return result
+
+    def find(self, path: str, student_id: Optional[str] = None, **criteria) -> List[dict]:
+        """Archived records whose fields equal the given values"""
+        files = self.files(path)
+        if student_id is not None:
+            files = [f for f in files if student_id in self._student_statuses(path, f)]
+            criteria["student_id"] = student_id
+        return [r for r in self.iter_records(path, files=files)
+                if all(r.get(field) == value for field, value in criteria.items())]
+
+    def get(self, path: str, key) -> Optional[dict]:
+        """An archived record by key; IDs carry their year, so one file is read"""
+        moment = id_time(key)
+        years = [moment.year] if moment is not None else None
+        key_field = record_key(path)
+        return next((r for r in self.iter_records(path, years) if r.get(key_field) == key), None)
+
+    def search(self, query: str, limit: int = 10, path: str = DEFENSE_REQUESTS_FILE) -> List[dict]:
+        """Archived defenses holding every term of query, best title/keyword/abstract match first"""
+        terms = set(tokenize(query))
+        if not terms or limit <= 0:
+            return []
+        hits = []
+        for record in self.iter_records(path):
+            counts = field_counts(record)
+            if all(term in counts for term in terms):
+                hits.append((sum(counts[term] for term in terms), record))
+        hits.sort(key=lambda hit: (-hit[0], hit[1].get("defense_id") or ""))
+        return [record for _, record in hits[:limit]]
+
+    # ----------------- بایگانی -----------------
+    @staticmethod
+    def _is_closed_defense(defense: dict, cutoff: datetime) -> bool:
+        graded = graded_on(defense)
+        return graded is not None and graded <= cutoff
+
+    def _is_closed_thesis(self, request: dict, cutoff: datetime, defended: Set[str]) -> bool:
+        status = request.get("status")
+        if status == RequestStatus.REJECTED.value:
+            if request.get("seat_returned") is False:
+                return False  # صندلی‌اش هنوز به درس برنگشته است
+            # بدون تاریخ رد، زمان ثبت درخواست ملاک است
+            rejected = (_parse_time(request.get("rejection_date")) or _parse_time(request.get("request_date"))
+                        or id_time(request.get("request_id")))
+            return rejected is not None and rejected <= cutoff
+        return status == RequestStatus.APPROVED.value and request.get("student_id") in defended
+
+    def closed(self, older_than_days: int = ARCHIVE_AFTER_DAYS,
+               now: Optional[datetime] = None) -> Dict[str, List[dict]]:
+        """Hot records that run() would archive, per collection file"""
+        cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+        defenses = [d for d in repository.load(DEFENSE_REQUESTS_FILE) if self._is_closed_defense(d, cutoff)]
+        # پایان‌نامه‌ی تاییدشده با دفاع نمره‌گرفته‌ی دانشجو (در فایل اصلی یا قبلاً بایگانی‌شده) بسته است
+        defended = {d.get("student_id") for d in defenses}
+        defended |= {d.get("student_id") for d in self.iter_records(DEFENSE_REQUESTS_FILE)}
+        theses = [r for r in repository.load(THESIS_REQUESTS_FILE)
+                  if self._is_closed_thesis(r, cutoff, defended)]
+        return {DEFENSE_REQUESTS_FILE: defenses, THESIS_REQUESTS_FILE: theses}
+
+    def run(self, older_than_days: int = ARCHIVE_AFTER_DAYS, now: Optional[datetime] = None,
+            dry_run: bool = False) -> Dict[str, int]:
+        """Move closed requests into the archive; returns how many left each hot file"""
+        cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+        candidates = self.closed(older_than_days, now)
+        if dry_run:
+            return {collection_name(path): len(records) for path, records in candidates.items()}
+
+        moved = {}
+        defended = set()
+        # دفاع‌ها اول، تا پایان‌نامه‌ی تاییدشده فقط بعد از دفاعش جابه‌جا شود
+        for path in [DEFENSE_REQUESTS_FILE, THESIS_REQUESTS_FILE]:
+            records = candidates[path]
+            if path == DEFENSE_REQUESTS_FILE:
+                check = lambda r: self._is_closed_defense(r, cutoff)
+            else:
+                defended |= {d.get("student_id") for d in self.iter_records(DEFENSE_REQUESTS_FILE)}
+                check = lambda r: self._is_closed_thesis(r, cutoff, defended)
+            key_field = record_key(path)
+            self._append(path, records)
+            removed = repository.remove_many(path, {r.get(key_field): check for r in records})
+            moved[collection_name(path)] = len(removed)
+        return moved
+
+
+cold_archive = ColdArchive()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed requests or look through the archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="move closed requests into the yearly archives")
+    run_parser.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS,
+                            help="days a request must have been closed")
+    run_parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+    search_parser = commands.add_parser("search", help="search archived defenses")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=10)
+    find_parser = commands.add_parser("find", help="list a student's archived requests")
+    find_parser.add_argument("student_id")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        counts = cold_archive.run(args.older_than, dry_run=args.dry_run)
+        verb = "would be archived" if args.dry_run else "archived"
+        for name, count in counts.items():
+            print(f"🗄️ {name}: {count} {verb}")
+    elif args.command == "search":
+        results = cold_archive.search(args.query, args.limit)
+        if not results:
+            print("❌ No matching archived theses")
+        for rank, record in enumerate(results, 1):
+            print(f"{rank}. {record.get('thesis_title')} — {record.get('student_name')} "
+                  f"({record.get('professor')}, {record_year(DEFENSE_REQUESTS_FILE, record)})")
+            print(f"   {record.get('defense_id')}")
+    else:
+        for path in [THESIS_REQUESTS_FILE, DEFENSE_REQUESTS_FILE]:
+            for record in cold_archive.find(path, student_id=args.student_id):
+                print(f"📦 {record.get(record_key(path))}  {record.get('status')}  {record.get('request_date')}")
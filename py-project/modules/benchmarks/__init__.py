@@ -0,0 +1,10 @@
+# benchmarks/__init__.py
+"""Scaling benchmarks for the thesis system.
+
+Run from the modules directory:
+
+    python -m benchmarks --scale 1000 10000 100000 --output report.json
+
+Each scale is generated into a temporary data directory and the console
+operations are driven with scripted answers; see runner.py.
+"""
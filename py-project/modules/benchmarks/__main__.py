@@ -0,0 +1,64 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MODULES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=MODULES_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_summary(report: dict):
+    print(f"\n📊 Benchmark ({report['backend']}, commit {report['commit'] or '-'})")
+    for scale, result in report["scales"].items():
+        print(f"\nscale {scale}:")
+        print(f"  {'operation':<26}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'read/op':>12}{'written/op':>12}")
+        for name, stats in result["operations"].items():
+            if not stats.get("runs"):
+                print(f"  {name:<26}{'-':>10}")
+                continue
+            print(f"  {name:<26}{stats['p50_ms']:>10}{stats['p90_ms']:>10}{stats['p99_ms']:>10}"
+                  f"{stats['bytes_read_per_op']:>12}{stats['bytes_written_per_op']:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the thesis system on generated data")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of students to generate (one run per value)")
+    parser.add_argument("--iterations", type=int, default=20, help="runs per operation and scale")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_report.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    commit = _git_commit()
+    original_dir = os.getcwd()
+    sys.path.insert(0, MODULES_DIR)
+
+    # ماژول‌ها مسیر data/ را نسبت به پوشه‌ی جاری می‌خوانند
+    with tempfile.TemporaryDirectory(prefix="thesis-bench-") as work_dir:
+        os.chdir(work_dir)
+        os.makedirs("data")
+        try:
+            from benchmarks.runner import run_benchmarks
+            report = run_benchmarks(args.scale, args.iterations, args.seed, commit)
+        finally:
+            os.chdir(original_dir)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    _print_summary(report)
+    print(f"\n💾 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
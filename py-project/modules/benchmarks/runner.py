@@ -0,0 +1,199 @@
+# benchmarks/runner.py
+"""Drive the console operations against generated data and time them.
+
+Import this module only after changing into the scratch directory: the
+project modules resolve their data/*.json paths (and the SQLite database
+path) relative to the current directory.
+"""
+import builtins
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from repository import repository
+from user import User, UserType
+from student import StudentSystem, RequestStatus, DefenseStatus
+from professor import ProfessorSystem
+from reviewer import ReviewerSystem
+from capacity import capacity_counters
+from final_grades import final_grades
+from benchmarks import synthetic_data
+
+PERCENTILES = [50, 90, 99]
+
+
+def _io_counters() -> Optional[tuple]:
+    """(bytes read, bytes written) by this process so far; Linux only"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+@contextmanager
+def scripted_input(answers: List[str]):
+    """Feed answers to input() and throw the menu output away"""
+    remaining = iter(answers)
+
+    def fake_input(prompt=""):
+        try:
+            return next(remaining)
+        except StopIteration:
+            raise RuntimeError("the operation asked for more input than scripted")
+
+    original = builtins.input
+    builtins.input = fake_input
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            yield
+    finally:
+        builtins.input = original
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(setup: Callable[[], Optional[Callable[[], object]]], iterations: int) -> dict:
+    """Time `iterations` runs; setup() prepares one run (untimed) and returns it"""
+    timings, read, written, errors = [], 0, 0, 0
+    for _ in range(iterations):
+        run = setup()
+        if run is None:
+            continue
+        before = _io_counters()
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception:
+            errors += 1
+        timings.append((time.perf_counter() - start) * 1000)
+        after = _io_counters()
+        if before and after:
+            read += after[0] - before[0]
+            written += after[1] - before[1]
+
+    if not timings:
+        return {"runs": 0, "errors": errors}
+    ordered = sorted(timings)
+    stats = {
+        "runs": len(timings),
+        "errors": errors,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "max_ms": round(ordered[-1], 3),
+        "bytes_read_per_op": read // len(timings),
+        "bytes_written_per_op": written // len(timings),
+    }
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = round(_percentile(ordered, p), 3)
+    return stats
+
+
+def _reset_caches():
+    repository.invalidate()
+    User._directory = None
+
+
+class ScaleBenchmark:
+    """One generated dataset and the operations measured on it"""
+
+    def __init__(self, scale: int, seed: int = 42):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        start = time.perf_counter()
+        collections = synthetic_data.generate(scale, seed)
+        synthetic_data.write(collections)
+        _reset_caches()
+        capacity_counters.rebuild()
+        final_grades.rebuild()
+        self.setup_seconds = round(time.perf_counter() - start, 3)
+
+        self.counts = {name: len(records) for name, records in collections.items()}
+        self.students = [s["user_id"] for s in collections["students"]]
+        requested = {r["student_id"] for r in collections["thesis_requests"]}
+        self.free_students = [s for s in self.students if s not in requested]
+        self.rng.shuffle(self.free_students)
+        self.professors_with_pending = self._pending_professors(collections)
+        self.graders = sorted({d["external_reviewer_id"] for d in collections["defense_requests"]
+                               if d.get("status") == DefenseStatus.APPROVED.value})
+
+    @staticmethod
+    def _pending_professors(collections) -> List[str]:
+        names = {r["professor"] for r in collections["thesis_requests"]
+                 if r["status"] == RequestStatus.PENDING.value}
+        return sorted(p["user_id"] for p in collections["professors"] if p["name"] in names)
+
+    def dataset(self) -> dict:
+        files = {}
+        for name in sorted(os.listdir("data")):
+            files[name] = os.path.getsize(os.path.join("data", name))
+        return {"records": self.counts, "file_bytes": files, "setup_seconds": self.setup_seconds}
+
+    # ----------------- عملیات -----------------
+    def login(self):
+        user_id = self.rng.choice(self.students)
+        return lambda: User.login(user_id, synthetic_data.password_for(user_id))
+
+    def request_thesis_course(self):
+        if not self.free_students:
+            return None
+        student = StudentSystem(self.free_students.pop(), verbose=False)
+
+        def run():
+            with scripted_input(["1"]):
+                student.request_thesis_course()
+        return run
+
+    def manage_thesis_requests(self):
+        if not self.professors_with_pending:
+            return None
+        professor = ProfessorSystem(self.rng.choice(self.professors_with_pending), verbose=False)
+
+        def run():
+            # اولین درخواست در انتظار رد می‌شود تا ظرفیت راهنمایی ثابت بماند
+            with scripted_input(["1", "2"]):
+                professor.manage_thesis_requests()
+        return run
+
+    def grade_defense_session(self):
+        if not self.graders:
+            return None
+        reviewer = ReviewerSystem(self.rng.choice(self.graders), UserType.GUEST_REVIEWER, verbose=False)
+
+        def run():
+            with scripted_input(["1", "1", "benchmark"]):
+                reviewer.grade_defense_session()
+        return run
+
+    OPERATIONS = ["login", "request_thesis_course", "manage_thesis_requests", "grade_defense_session"]
+
+    def run(self, iterations: int) -> Dict[str, dict]:
+        return {name: measure(getattr(self, name), iterations) for name in self.OPERATIONS}
+
+
+def run_benchmarks(scales: List[int], iterations: int = 20, seed: int = 42, commit: str = None) -> dict:
+    """Benchmark every scale in turn and return the JSON-ready report"""
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "backend": type(repository).__name__,
+        "iterations": iterations,
+        "seed": seed,
+        "scales": {}
+    }
+    for scale in scales:
+        print(f"⏱️ scale {scale}: generating data...", file=sys.stderr)
+        bench = ScaleBenchmark(scale, seed)
+        print(f"⏱️ scale {scale}: running operations...", file=sys.stderr)
+        report["scales"][str(scale)] = {"dataset": bench.dataset(), "operations": bench.run(iterations)}
+    return report
@@ -0,0 +1,153 @@
+# benchmarks/synthetic_data.py
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+from repository import repository, VERSION_FIELD
+from user import hash_password
+from student import RequestStatus, DefenseStatus
+from grading import GRADE_LABELS
+from ids import format_id, SEQUENCE_LIMIT
+
+MAJORS = ["Computer", "Electrical Engineering", "Mechanical Engineering", "Civil Engineering", "Physics"]
+SEMESTERS = ["First", "Second"]
+TOPICS = ["machine learning", "power systems", "robotics", "structural analysis", "quantum optics",
+          "compilers", "signal processing", "fluid dynamics", "databases", "computer vision"]
+
+# نسبت‌ها تقریبا مثل داده‌ی واقعی دانشکده
+STUDENTS_PER_PROFESSOR = 50
+STUDENTS_PER_GUEST = 200
+APPROVED_PER_PROFESSOR = 3  # زیر سقف ۵ راهنمایی تا تایید/رد در بنچمارک ممکن باشد
+STUDENTS_WITHOUT_REQUEST = 0.1
+
+
+def password_for(user_id: str) -> str:
+    """Plain password of every generated user"""
+    return f"pw{user_id}"
+
+
+def generate(scale: int, seed: int = 42) -> Dict[str, List[dict]]:
+    """Build collections for `scale` students; returns collection name -> records"""
+    rng = random.Random(seed)
+    base_date = datetime(2024, 9, 1)
+    professor_count = max(5, scale // STUDENTS_PER_PROFESSOR)
+    guest_count = max(2, scale // STUDENTS_PER_GUEST)
+
+    def user(user_id, name, user_type, **extra):
+        return {"user_id": user_id, "name": name, "password": hash_password(password_for(user_id)),
+                "user_type": user_type, "national_id": f"9{user_id}", **extra, VERSION_FIELD: 1}
+
+    professors = [user(f"P{i:06d}", f"Dr. Professor {i}", "professor") for i in range(professor_count)]
+    guests = [user(f"G{i:06d}", f"Dr. Guest {i}", "guest_reviewer", affiliation=f"University {i % 17}")
+              for i in range(guest_count)]
+    students = [user(f"S{i:07d}", f"Student {i}", "student", major=MAJORS[i % len(MAJORS)])
+                for i in range(scale)]
+
+    courses = []
+    for i, professor in enumerate(professors):
+        for j in range(2):
+            courses.append({
+                "course_id": f"C{i:05d}{j}",
+                "title": f"{rng.choice(TOPICS).title()} Thesis {i}-{j}",
+                "professor": professor["name"],
+                "year": str(2023 + (i + j) % 3),
+                "semester": SEMESTERS[j],
+                "capacity": STUDENTS_PER_PROFESSOR,
+                "major": MAJORS[(i + j) % len(MAJORS)],
+                "resources": ", ".join(rng.sample(TOPICS, 2)),
+                "sessions": 16,
+                "units": 4,
+                VERSION_FIELD: 1
+            })
+    courses_by_major = {}
+    for course in courses:
+        courses_by_major.setdefault(course["major"], []).append(course)
+    professor_ids = {p["name"]: p["user_id"] for p in professors}
+
+    thesis_requests, defense_requests = [], []
+    approved_per_professor = {}
+    for i, student in enumerate(students):
+        if rng.random() < STUDENTS_WITHOUT_REQUEST:
+            continue
+        course = rng.choice(courses_by_major[student["major"]])
+        request_date = base_date + timedelta(minutes=i)
+        request = {
+            "request_id": format_id("TR", request_date, i % SEQUENCE_LIMIT),
+            "student_id": student["user_id"],
+            "student_name": student["name"],
+            "course_id": course["course_id"],
+            "course_title": course["title"],
+            "professor": course["professor"],
+            "request_date": request_date.isoformat(),
+            "status": RequestStatus.PENDING.value,
+            "major": student["major"],
+            VERSION_FIELD: 1
+        }
+        if approved_per_professor.get(course["professor"], 0) < APPROVED_PER_PROFESSOR:
+            approved_per_professor[course["professor"]] = approved_per_professor.get(course["professor"], 0) + 1
+            request.update(status=RequestStatus.APPROVED.value,
+                           approval_date=(request_date + timedelta(days=2)).isoformat(),
+                           professor_id=professor_ids[course["professor"]])
+            defense_requests.append(_defense(rng, request, professors, guests, len(defense_requests)))
+        elif rng.random() < 0.3:
+            request.update(status=RequestStatus.REJECTED.value,
+                           rejection_date=(request_date + timedelta(days=2)).isoformat())
+        thesis_requests.append(request)
+
+    return {
+        "students": students,
+        "professors": professors,
+        "guest_reviewers": guests,
+        "courses": courses,
+        "thesis_requests": thesis_requests,
+        "defense_requests": defense_requests,
+    }
+
+
+def _defense(rng: random.Random, thesis: dict, professors: List[dict], guests: List[dict], n: int) -> dict:
+    topic = rng.choice(TOPICS)
+    defense = {
+        "defense_id": format_id("DR", datetime.fromisoformat(thesis["approval_date"]), n % SEQUENCE_LIMIT),
+        "student_id": thesis["student_id"],
+        "student_name": thesis["student_name"],
+        "thesis_title": f"A study of {topic} ({n})",
+        "abstract": f"This thesis investigates {topic} with applications to {rng.choice(TOPICS)}. " * 3,
+        "keywords": [topic, rng.choice(TOPICS)],
+        "pdf_path": f"uploads/theses/{n:02x}/{n:064x}.pdf",
+        "pdf_sha256": f"{n:064x}",
+        "first_page_path": f"uploads/theses/{n:02x}/{n:064x}.png",
+        "first_page_sha256": f"{n:064x}",
+        "request_date": thesis["approval_date"],
+        "status": DefenseStatus.UNDER_REVIEW.value,
+        "professor": thesis["professor"],
+        "professor_id": thesis["professor_id"],
+        "course_id": thesis["course_id"],
+        VERSION_FIELD: 1
+    }
+    if rng.random() < 0.7:
+        internal = rng.choice([p for p in professors if p["user_id"] != thesis["professor_id"]])
+        guest = rng.choice(guests)
+        defense.update({
+            "status": DefenseStatus.APPROVED.value,
+            "approval_date": thesis["approval_date"],
+            "approved_by": thesis["professor_id"],
+            "defense_date": "2025-02-01 10:00",
+            "defense_location": f"Room {rng.randint(1, 30)}",
+            "internal_reviewer": {"id": internal["user_id"], "name": internal["name"]},
+            "external_reviewer": {"id": guest["user_id"], "name": guest["name"],
+                                  "affiliation": guest["affiliation"], "email": ""},
+            "internal_reviewer_id": internal["user_id"],
+            "external_reviewer_id": guest["user_id"],
+        })
+        if rng.random() < 0.5:
+            defense["grades"] = {
+                internal["user_id"]: {"label": rng.choice(GRADE_LABELS), "comments": "",
+                                      "grading_date": thesis["approval_date"],
+                                      "reviewer_type": "internal", "reviewer_name": internal["name"]}
+            }
+    return defense
+
+
+def write(collections: Dict[str, List[dict]], data_dir: str = "data"):
+    """Store generated collections through the configured repository backend"""
+    for name, records in collections.items():
+        repository.save(f"{data_dir}/{name}.json", records)
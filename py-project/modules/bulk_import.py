@@ -0,0 +1,121 @@
+# bulk_import.py
+import argparse
+import csv
+from typing import Dict, List
+from repository import repository
+from user import User, UserType, hash_password
+
+COURSE_INT_FIELDS = ["capacity", "sessions", "units"]
+
+
+def _read_csv(path: str) -> List[dict]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [{k.strip(): (v or "").strip() for k, v in row.items() if k}
+                for row in csv.DictReader(f)]
+
+
+def import_users(rows_by_type: Dict[UserType, List[dict]]) -> Dict[str, int]:
+    """Validate, de-duplicate and add users; each users file is written once.
+
+    A row is skipped when its user_id exists in any users file or earlier in
+    the batch, or when its national_id already exists for that user type.
+    The new records of a file are added with one repository.insert_many, so
+    users registered by other sessions meanwhile are kept (and win a clash).
+    """
+    directory = User._users_directory()
+    seen_ids = set()
+    accepted: Dict[UserType, List[dict]] = {}
+    summary = {}
+
+    for user_type, rows in rows_by_type.items():
+        seen_national_ids = set()
+        accepted[user_type] = []
+        skipped = 0
+        for row in rows:
+            user_id, national_id = row.get("user_id"), row.get("national_id") or None
+            if (not user_id or not row.get("password") or user_id in seen_ids
+                    or any(True for _ in directory.lookup(user_id))
+                    or (national_id and (national_id in seen_national_ids
+                                         or directory.find_by_national_id(user_type, national_id)))):
+                skipped += 1
+                continue
+            seen_ids.add(user_id)
+            if national_id:
+                seen_national_ids.add(national_id)
+            accepted[user_type].append(row)
+        summary[f"{user_type.value}_skipped"] = skipped
+
+    for user_type, rows in accepted.items():
+        records = []
+        for row in rows:
+            record = {
+                "user_id": row["user_id"],
+                "name": row.get("name", ""),
+                "password": hash_password(row["password"]),
+                "user_type": user_type.value,
+                "national_id": row.get("national_id") or None
+            }
+            if user_type == UserType.STUDENT and row.get("major"):
+                record["major"] = row["major"]
+            if user_type == UserType.GUEST_REVIEWER:
+                record["affiliation"] = row.get("affiliation", "")
+            records.append(record)
+        added = repository.insert_many(User._get_file_path(user_type), records) if records else []
+        for record in added:
+            directory.add(user_type, record)
+        summary[f"{user_type.value}_skipped"] += len(records) - len(added)
+        summary[f"{user_type.value}_imported"] = len(added)
+    return summary
+
+
+def import_courses(rows: List[dict], courses_file: str = "data/courses.json") -> Dict[str, int]:
+    """Add new courses (unknown course_id) with one write of the courses file"""
+    known = {c.get("course_id") for c in repository.load(courses_file)}
+    courses = []
+    skipped = 0
+    for row in rows:
+        if not row.get("course_id") or row["course_id"] in known:
+            skipped += 1
+            continue
+        course = dict(row)
+        try:
+            for field in COURSE_INT_FIELDS:
+                if field in course:
+                    course[field] = int(course[field] or 0)
+        except ValueError:
+            skipped += 1
+            continue
+        known.add(course["course_id"])
+        courses.append(course)
+    added = repository.insert_many(courses_file, courses) if courses else []
+    skipped += len(courses) - len(added)
+    return {"courses_imported": len(added), "courses_skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users and courses from CSV files")
+    parser.add_argument("--students", help="CSV with user_id,name,password,national_id,major")
+    parser.add_argument("--professors", help="CSV with user_id,name,password,national_id")
+    parser.add_argument("--guest-reviewers", help="CSV with user_id,name,password,national_id,affiliation")
+    parser.add_argument("--courses", help="CSV with the courses.json fields (course_id,title,...)")
+    args = parser.parse_args()
+
+    rows_by_type = {}
+    for user_type, path in [(UserType.STUDENT, args.students),
+                            (UserType.PROFESSOR, args.professors),
+                            (UserType.GUEST_REVIEWER, args.guest_reviewers)]:
+        if path:
+            rows_by_type[user_type] = _read_csv(path)
+
+    summary = {}
+    if rows_by_type:
+        summary.update(import_users(rows_by_type))
+    if args.courses:
+        summary.update(import_courses(_read_csv(args.courses)))
+
+    for name, count in summary.items():
+        print(f"{name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
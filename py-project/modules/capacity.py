@@ -0,0 +1,152 @@
+# capacity.py
+import argparse
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from repository import repository, collection_name, ConflictError, VERSION_FIELD
+from records import RequestStatus
+from archive import cold_archive
+
+
+class CapacityCounters:
+    """Per-professor guidance and review counters.
+
+    Counters live in data/capacity_counters.json and are adjusted by
+    record_change() whenever a thesis or defense request is written, so the
+    capacity checks read one record instead of scanning every request.
+    rebuild() recomputes them from the request files and verify() reports
+    any drift between the two. Reads and writes never rebuild on their own;
+    main.initialize_data_files() builds missing counters once at start-up
+    and otherwise only an explicit --rebuild does.
+    """
+
+    _counters_file = "data/capacity_counters.json"
+    _thesis_requests_file = "data/thesis_requests.json"
+    _defense_requests_file = "data/defense_requests.json"
+
+    @staticmethod
+    def _contributions(collection: str, record: Optional[dict]) -> Counter:
+        """How much one request adds to each (professor_id, counter)"""
+        result = Counter()
+        if not record:
+            return result
+        if collection == "thesis_requests":
+            if record.get("status") == RequestStatus.APPROVED.value and record.get("professor_id"):
+                result[(record["professor_id"], "guidance")] += 1
+        elif collection == "defense_requests":
+            reviewers = {record.get("internal_reviewer_id"), record.get("external_reviewer_id")}
+            for reviewer_id in reviewers - {None}:
+                result[(reviewer_id, "review")] += 1
+        return result
+
+    def get(self, professor_id: str) -> Dict[str, int]:
+        counters = repository.get(self._counters_file, professor_id) or {}
+        return {"guidance": counters.get("guidance", 0), "review": counters.get("review", 0)}
+
+    def guidance_count(self, professor_id: str) -> int:
+        return self.get(professor_id)["guidance"]
+
+    def review_count(self, professor_id: str) -> int:
+        return self.get(professor_id)["review"]
+
+    def review_counts(self) -> Dict[str, int]:
+        """Review count of every reviewer that has one, from a single read"""
+        return {c.get("professor_id"): c.get("review", 0) for c in repository.load(self._counters_file)}
+
+    def record_change(self, path: str, before: Optional[dict], after: Optional[dict]):
+        """Adjust the counters for a request that changed from before to after"""
+        collection = collection_name(path)
+        delta = self._contributions(collection, after)
+        delta.subtract(self._contributions(collection, before))
+        for (professor_id, field), change in delta.items():
+            if change:
+                self._add(professor_id, field, change)
+
+    def _add(self, professor_id: str, field: str, change: int):
+        def apply(counters):
+            counters[field] = counters.get(field, 0) + change
+
+        while repository.update(self._counters_file, professor_id, apply) is None:
+            # اولین شمارنده‌ی این استاد؛ فقط اگر هنوز کسی آن را نساخته باشد
+            counters = {"professor_id": professor_id, "guidance": 0, "review": 0}
+            apply(counters)
+            if repository.compare_and_swap(self._counters_file, counters, 0):
+                return
+
+    def compute(self) -> Dict[str, Dict[str, int]]:
+        """Count guidance and reviews from scratch out of the request files and their archives"""
+        totals = Counter()
+        for path in [self._thesis_requests_file, self._defense_requests_file]:
+            collection = collection_name(path)
+            for record in cold_archive.all_records(path):
+                totals.update(self._contributions(collection, record))
+        result: Dict[str, Dict[str, int]] = {}
+        for (professor_id, field), count in totals.items():
+            result.setdefault(professor_id, {"guidance": 0, "review": 0})[field] = count
+        return result
+
+    def rebuild(self, retries: int = 10) -> Dict[str, Dict[str, int]]:
+        """Recompute every counter and store the ones that differ.
+
+        The counter versions are read before counting. A counter that another
+        session changed or created before it is written aborts the attempt
+        and the counting starts again, so no concurrent increment is lost.
+        """
+        for attempt in range(retries):
+            versions = {c.get("professor_id"): c.get(VERSION_FIELD, 0)
+                        for c in repository.load(self._counters_file)}
+            computed = self.compute()
+            stale = []
+
+            def setter(professor_id, counts):
+                def apply(counters):
+                    if counters.get(VERSION_FIELD, 0) != versions[professor_id]:
+                        stale.append(professor_id)
+                        return False
+                    if all(counters.get(field, 0) == counts[field] for field in counts):
+                        return False
+                    counters.update(counts)
+                return apply
+
+            zero = {"guidance": 0, "review": 0}
+            repository.update_many(self._counters_file, {
+                pid: setter(pid, computed.get(pid, zero)) for pid in versions
+            })
+            missing = [{"professor_id": pid, **counts} for pid, counts in computed.items() if pid not in versions]
+            added = repository.insert_many(self._counters_file, missing) if missing else []
+            if not stale and len(added) == len(missing):
+                return computed
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+        raise ConflictError("Capacity counters kept changing during the rebuild")
+
+    def verify(self) -> List[str]:
+        """Return a description of every counter that differs from a rebuild"""
+        computed = self.compute()
+        stored = {c.get("professor_id"): c for c in repository.load(self._counters_file)}
+        problems = []
+        for professor_id in sorted(set(computed) | set(stored), key=str):
+            expected = computed.get(professor_id, {})
+            actual = stored.get(professor_id, {})
+            for field in ["guidance", "review"]:
+                if expected.get(field, 0) != actual.get(field, 0):
+                    problems.append(f"{professor_id} {field}: stored {actual.get(field, 0)}, "
+                                    f"actual {expected.get(field, 0)}")
+        return problems
+
+
+capacity_counters = CapacityCounters()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify or rebuild the professor capacity counters")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite the counters from scratch")
+    args = parser.parse_args()
+    problems = capacity_counters.verify()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Capacity counters are consistent")
+    elif args.rebuild:
+        capacity_counters.rebuild()
+        print("🔧 Capacity counters rebuilt")
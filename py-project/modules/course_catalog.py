@@ -0,0 +1,162 @@
+# course_catalog.py
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from repository import repository
+
+COURSES_FILE = "data/courses.json"
+THESIS_REQUESTS_FILE = "data/thesis_requests.json"
+
+
+def normalize_key(value) -> str:
+    """Form of major / semester / year used as an index key ("Computer " == "computer")"""
+    return str(value if value is not None else "").strip().casefold()
+
+
+class PositionIndex(ABC):
+    """Positions of the records of one collection, grouped for lookup.
+
+    The index points into the list the repository caches, so lookups see
+    every in-place change without copying records. It is rebuilt only when
+    the repository hands back a different list (the file was reloaded);
+    records appended to the same list since the last lookup are indexed on
+    their own.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._records: Optional[list] = None
+        self._indexed = 0
+
+    def _current(self) -> list:
+        records = repository.load(self.path)
+        if records is not self._records or len(records) < self._indexed:
+            self._clear()
+            self._records, self._indexed = records, 0
+        for position in range(self._indexed, len(records)):
+            self._index(position, records[position])
+        self._indexed = len(records)
+        return records
+
+    @abstractmethod
+    def _clear(self):
+        """Forget everything indexed so far"""
+
+    @abstractmethod
+    def _index(self, position: int, record: dict):
+        """Add the record at position of the cached list to the index"""
+
+
+class CourseCatalog(PositionIndex):
+    """Courses indexed by course_id and by (major, semester, year), plus a
+    view of the courses that still have free seats per major.
+
+    Taking a seat changes a course in place, so whoever changes a capacity
+    reports it with course_changed(); the view is then fixed for that one
+    course instead of rescanning the catalog.
+    """
+
+    def __init__(self, path: str = COURSES_FILE):
+        super().__init__(path)
+        self._clear()
+
+    def _clear(self):
+        self._by_id: Dict[str, int] = {}
+        self._by_term: Dict[Tuple[str, str, str], List[int]] = {}
+        self._available: Dict[str, Dict[int, None]] = {}  # major -> positions, used as an ordered set
+        self._available_lists: Dict[str, List[int]] = {}
+
+    def _index(self, position: int, course: dict):
+        self._by_id.setdefault(course.get("course_id"), position)
+        key = tuple(normalize_key(course.get(field)) for field in ("major", "semester", "year"))
+        self._by_term.setdefault(key, []).append(position)
+        self._place(position, course)
+
+    def _place(self, position: int, course: dict):
+        """Put course in or take it out of the free-seat view of its major"""
+        major = normalize_key(course.get("major"))
+        view = self._available.setdefault(major, {})
+        if course.get("capacity", 0) > 0:
+            if position not in view:
+                view[position] = None
+                self._available_lists.pop(major, None)
+        elif position in view:
+            del view[position]
+            self._available_lists.pop(major, None)
+
+    def course_changed(self, course_id: str):
+        """Re-check the seats of one course after it was stored in this process"""
+        with self._lock:
+            records = self._current()
+            position = self._by_id.get(course_id)
+            if position is not None:
+                self._place(position, records[position])
+
+    def get(self, course_id: str) -> Optional[dict]:
+        with self._lock:
+            records = self._current()
+            position = self._by_id.get(course_id)
+            return None if position is None else records[position]
+
+    def available(self, major: str) -> List[dict]:
+        """Courses of major with free seats, in catalog order"""
+        major = normalize_key(major)
+        with self._lock:
+            records = self._current()
+            positions = self._available_lists.get(major)
+            if positions is None:
+                positions = self._available_lists[major] = sorted(self._available.get(major, ()))
+            # ظرفیتی که جای دیگری در همین پردازه صفر شده باشد اینجا هم دیده می‌شود
+            return [records[p] for p in positions if records[p].get("capacity", 0) > 0]
+
+    def available_course(self, major: str, course_id: str) -> Optional[dict]:
+        """The course if it belongs to major and still has a free seat"""
+        with self._lock:
+            records = self._current()
+            position = self._by_id.get(course_id)
+            if position is None or position not in self._available.get(normalize_key(major), {}):
+                return None
+            course = records[position]
+            return course if course.get("capacity", 0) > 0 else None
+
+    def find(self, major=None, semester=None, year=None, available_only: bool = False) -> List[dict]:
+        """Courses matching every given field, in catalog order"""
+        wanted = [None if value is None else normalize_key(value) for value in (major, semester, year)]
+        with self._lock:
+            records = self._current()
+            if None not in wanted:
+                positions = list(self._by_term.get(tuple(wanted), ()))
+            else:
+                positions = sorted(p for key, group in self._by_term.items()
+                                   if all(w is None or w == k for w, k in zip(wanted, key)) for p in group)
+            courses = [records[p] for p in positions]
+        if available_only:
+            courses = [c for c in courses if c.get("capacity", 0) > 0]
+        return courses
+
+
+class RequestHistory(PositionIndex):
+    """Thesis requests of each student, oldest first"""
+
+    def __init__(self, path: str = THESIS_REQUESTS_FILE):
+        super().__init__(path)
+        self._clear()
+
+    def _clear(self):
+        self._by_student: Dict[str, List[int]] = {}
+
+    def _index(self, position: int, request: dict):
+        self._by_student.setdefault(request.get("student_id"), []).append(position)
+
+    def history(self, student_id: str, status: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            records = self._current()
+            requests = [records[p] for p in self._by_student.get(student_id, ())]
+        if status is not None:
+            requests = [r for r in requests if r.get("status") == status]
+        return requests
+
+
+course_catalog = CourseCatalog()
+request_history = RequestHistory()
@@ -0,0 +1,220 @@
+# defense_schedule.py
+import argparse
+import threading
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from repository import repository, collection_name
+from records import DefenseStatus
+from course_catalog import normalize_key
+
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+DEFENSE_MINUTES = 90
+# پیشنهاد زمان خالی فقط در ساعت کاری
+DAY_START = time(8, 0)
+DAY_END = time(18, 0)
+SLOT_FORMAT = "%Y-%m-%d %H:%M"
+_ACCEPTED_FORMATS = (SLOT_FORMAT, "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+
+class ScheduleConflict(Exception):
+    """A defense slot clashes with another defense in the same room or of the same reviewer.
+
+    clashes holds (resource, defense_id, start) of the bookings in the way
+    and suggestion the next slot where room and reviewers are all free.
+    """
+
+    def __init__(self, clashes: List[Tuple[tuple, str, datetime]], suggestion: Optional[datetime]):
+        described = ", ".join(f"{kind} '{name}' ({defense_id} at {start:{SLOT_FORMAT}})"
+                              for (kind, name), defense_id, start in clashes)
+        message = f"Slot is taken: {described}"
+        if suggestion is not None:
+            message += f"; next free slot is {suggestion:{SLOT_FORMAT}}"
+        super().__init__(message)
+        self.clashes = clashes
+        self.suggestion = suggestion
+
+
+def parse_slot(text: str) -> datetime:
+    """Start of a defense from "YYYY-MM-DD HH:MM" (ISO forms are accepted too)"""
+    text = (text or "").strip()
+    for fmt in _ACCEPTED_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid defense date '{text}', expected YYYY-MM-DD HH:MM")
+
+
+def _duration() -> timedelta:
+    return timedelta(minutes=DEFENSE_MINUTES)
+
+
+class DefenseSchedule:
+    """Booked defense slots, indexed per room and per reviewer.
+
+    Each room and each reviewer (internal or external) has its bookings in
+    a list sorted by start. Every defense lasts DEFENSE_MINUTES, so the
+    bookings of one resource are sorted by their end as well, and a new
+    slot can only clash with the bookings right before and after its
+    position: a conflict check is a bisect per resource.
+
+    The index is built from the stored defense requests and rebuilt when
+    the file is reloaded; changes made in this process are reported with
+    record_change().
+    """
+
+    def __init__(self, path: str = DEFENSE_REQUESTS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._source = None
+        self._source_len = 0
+        self._bookings: Dict[tuple, Tuple[List[datetime], List[str]]] = {}  # resource -> (starts, defense ids)
+        self._booked: Dict[str, Tuple[datetime, List[tuple]]] = {}  # defense_id -> (start, resources)
+
+    @staticmethod
+    def resources(location: Optional[str], reviewer_ids: Iterable[Optional[str]]) -> List[tuple]:
+        result = [("room", normalize_key(location))] if normalize_key(location) else []
+        result.extend(("reviewer", reviewer_id) for reviewer_id in dict.fromkeys(reviewer_ids) if reviewer_id)
+        return result
+
+    @classmethod
+    def _slot(cls, record: Optional[dict]) -> Optional[Tuple[datetime, List[tuple]]]:
+        """(start, resources) a defense request occupies, or None"""
+        if not record or not record.get("defense_date") or record.get("status") == DefenseStatus.REJECTED.value:
+            return None
+        try:
+            start = parse_slot(record["defense_date"])
+        except ValueError:
+            return None  # تاریخ‌های متنی قدیمی در برنامه‌ریزی شرکت نمی‌کنند
+        return start, cls.resources(record.get("defense_location"),
+                                    [record.get("internal_reviewer_id"), record.get("external_reviewer_id")])
+
+    # ----------------- نگهداری ایندکس -----------------
+    def _book(self, record: dict):
+        slot = self._slot(record)
+        if slot is None:
+            return
+        start, resources = slot
+        for resource in resources:
+            starts, ids = self._bookings.setdefault(resource, ([], []))
+            index = bisect_left(starts, start)
+            starts.insert(index, start)
+            ids.insert(index, record["defense_id"])
+        self._booked[record["defense_id"]] = slot
+
+    def _unbook(self, defense_id: str):
+        slot = self._booked.pop(defense_id, None)
+        if slot is None:
+            return
+        start, resources = slot
+        for resource in resources:
+            starts, ids = self._bookings[resource]
+            index = bisect_left(starts, start)
+            while ids[index] != defense_id:
+                index += 1
+            del starts[index], ids[index]
+
+    def _refresh(self):
+        records = repository.load(self.path)
+        if records is not self._source or len(records) < self._source_len:
+            self._bookings, self._booked = {}, {}
+            self._source, self._source_len = records, 0
+        for record in records[self._source_len:]:
+            self._book(record)
+        self._source_len = len(records)
+
+    def record_change(self, path: str, before: Optional[dict], after: Optional[dict]):
+        """Move the booking of a defense request that changed from before to after"""
+        if collection_name(path) != collection_name(self.path):
+            return
+        with self._lock:
+            self._refresh()
+            record = after if after is not None else before
+            if record is None or not record.get("defense_id"):
+                return
+            self._unbook(record["defense_id"])
+            if after is not None:
+                self._book(after)
+
+    # ----------------- بررسی تداخل -----------------
+    def _clashes(self, start: datetime, resources: List[tuple], exclude: Optional[str]) -> List[Tuple[tuple, str, datetime]]:
+        end, duration = start + _duration(), _duration()
+        clashes = []
+        for resource in resources:
+            starts, ids = self._bookings.get(resource, ((), ()))
+            index = bisect_left(starts, start)
+            # همسایه‌ی قبلی (خود جلسه در جابه‌جایی حساب نمی‌شود)
+            before = index - 1
+            while before >= 0 and ids[before] == exclude:
+                before -= 1
+            if before >= 0 and starts[before] + duration > start:
+                clashes.append((resource, ids[before], starts[before]))
+            after = index
+            while after < len(ids) and ids[after] == exclude:
+                after += 1
+            if after < len(ids) and starts[after] < end:
+                clashes.append((resource, ids[after], starts[after]))
+        return clashes
+
+    def conflicts(self, start: datetime, location: Optional[str], reviewer_ids: Iterable[Optional[str]],
+                  exclude: Optional[str] = None) -> List[Tuple[tuple, str, datetime]]:
+        """Bookings that overlap a defense at start in location with the given reviewers"""
+        with self._lock:
+            self._refresh()
+            return self._clashes(start, self.resources(location, reviewer_ids), exclude)
+
+    def next_free(self, start: datetime, location: Optional[str], reviewer_ids: Iterable[Optional[str]],
+                  exclude: Optional[str] = None, max_steps: int = 1000) -> Optional[datetime]:
+        """Earliest slot from start, within working hours, where room and reviewers are all free"""
+        with self._lock:
+            self._refresh()
+            resources = self.resources(location, reviewer_ids)
+            candidate = start
+            for _ in range(max_steps):
+                day_start = datetime.combine(candidate.date(), DAY_START)
+                if candidate < day_start:
+                    candidate = day_start
+                elif candidate + _duration() > datetime.combine(candidate.date(), DAY_END):
+                    candidate = day_start + timedelta(days=1)
+                clashes = self._clashes(candidate, resources, exclude)
+                if not clashes:
+                    return candidate
+                candidate = max(booked for _, _, booked in clashes) + _duration()
+            return None
+
+    def check(self, defense_id: str, defense_date: str, location: str,
+              reviewer_ids: Iterable[Optional[str]]) -> datetime:
+        """Parsed start of a requested slot; raises ScheduleConflict when it is taken"""
+        start = parse_slot(defense_date)
+        reviewer_ids = list(reviewer_ids)
+        clashes = self.conflicts(start, location, reviewer_ids, exclude=defense_id)
+        if clashes:
+            raise ScheduleConflict(clashes, self.next_free(start, location, reviewer_ids, exclude=defense_id))
+        return start
+
+    def bookings(self, kind: str, name: str, since: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+        """(start, defense_id) booked for a room or reviewer, from since on"""
+        resource = ("room", normalize_key(name)) if kind == "room" else (kind, name)
+        with self._lock:
+            self._refresh()
+            starts, ids = self._bookings.get(resource, ((), ()))
+            index = bisect_left(starts, since) if since else 0
+            return list(zip(starts[index:], ids[index:]))
+
+
+defense_schedule = DefenseSchedule()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the defenses booked for a room or a reviewer")
+    parser.add_argument("kind", choices=["room", "reviewer"])
+    parser.add_argument("name", help="location, or reviewer user_id")
+    parser.add_argument("--since", type=parse_slot, help='"YYYY-MM-DD HH:MM"')
+    args = parser.parse_args()
+
+    booked = defense_schedule.bookings(args.kind, args.name, args.since)
+    if not booked:
+        print("📭 Nothing booked")
+    for start, defense_id in booked:
+        print(f"📅 {start:{SLOT_FORMAT}} - {(start + _duration()):%H:%M}  {defense_id}")
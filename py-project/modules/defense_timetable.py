@@ -0,0 +1,322 @@
+# defense_timetable.py
+import argparse
+import json
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from repository import repository
+from records import DefenseStatus
+from defense_schedule import (defense_schedule, parse_slot, DEFENSE_MINUTES, DAY_START, DAY_END,
+                              SLOT_FORMAT)
+
+Window = Tuple[datetime, datetime]
+
+# وزن‌های هدف؛ قیدهای سخت (اتاق، داور، در دسترس بودن) هرگز شکسته نمی‌شوند
+NEW_DAY_PENALTY = 10.0  # a reviewer has to come in on one more day
+ROOM_SWITCH_PENALTY = 4.0  # back-to-back defenses of a reviewer in different rooms
+SAME_DAY_GAP_PENALTY = 1.0  # a reviewer waits between two defenses of the day
+BACK_TO_BACK_BONUS = 3.0  # a reviewer stays in the room for the next defense
+ROOM_COMPACT_BONUS = 1.0  # the room is not left idle before this slot
+FREE_SLOTS_PER_ROOM = 3  # earliest free slots of each room tried as fresh starts
+IMPROVEMENT_PASSES = 3
+
+
+def read_windows(data: Dict[str, list]) -> Dict[str, List[Window]]:
+    """{"name": [["YYYY-MM-DD HH:MM", "YYYY-MM-DD HH:MM"], ...]} -> parsed windows"""
+    return {name: sorted((parse_slot(start), parse_slot(end)) for start, end in windows)
+            for name, windows in data.items()}
+
+
+def daily_windows(first_day: datetime, days: int) -> List[Window]:
+    """Working hours (DAY_START-DAY_END) of days consecutive days"""
+    return [(datetime.combine((first_day + timedelta(days=i)).date(), DAY_START),
+             datetime.combine((first_day + timedelta(days=i)).date(), DAY_END)) for i in range(days)]
+
+
+class TimetableSolver:
+    """Places approved, undated defenses into room slots for a defense week.
+
+    Rooms are open in given windows, cut into DEFENSE_MINUTES slots. Hard
+    constraints: one defense per room slot, a reviewer is never in two
+    defenses at once, only inside their availability windows (when given)
+    and never against a defense already on the schedule.
+
+    Defenses are placed greedily, those of the busiest reviewers first and
+    grouped by reviewer, each in the cheapest feasible slot. The cost
+    charges a reviewer for every extra day on campus, for changing rooms
+    between back-to-back defenses and for waiting between defenses, and
+    rewards slots that continue a reviewer's block in the same room or
+    follow the room's last defense without a gap. Only slots next to a
+    reviewer's earlier defenses and the first free slots of every room are
+    priced; the full slot list is walked only when none of those fits.
+    """
+
+    _defense_requests_file = "data/defense_requests.json"
+
+    def __init__(self, rooms: Dict[str, List[Window]], availability: Optional[Dict[str, List[Window]]] = None):
+        self.duration = timedelta(minutes=DEFENSE_MINUTES)
+        self.availability = availability or {}
+        self.room_slots: Dict[str, List[datetime]] = {}
+        for room, windows in rooms.items():
+            starts = []
+            for opens, closes in windows:
+                start = opens
+                while start + self.duration <= closes:
+                    starts.append(start)
+                    start += self.duration
+            # اسلات‌هایی که از قبل در برنامه‌ی اتاق رزرو شده‌اند کنار می‌روند
+            self.room_slots[room] = [s for s in sorted(set(starts)) if not defense_schedule.conflicts(s, room, [])]
+        self.slots = sorted((start, room) for room, starts in self.room_slots.items() for start in starts)
+        self._booked_cache: Dict[Tuple[str, datetime], bool] = {}
+
+    @classmethod
+    def pending_defenses(cls) -> List[dict]:
+        """Approved defenses that have no date yet"""
+        defenses = repository.find(cls._defense_requests_file, status=DefenseStatus.APPROVED.value)
+        return sorted((d for d in defenses if not d.get("defense_date")), key=lambda d: d.get("request_date", ""))
+
+    # ----------------- قیدها -----------------
+    def _available(self, reviewer_id: str, start: datetime) -> bool:
+        windows = self.availability.get(reviewer_id)
+        if windows is not None:
+            end = start + self.duration
+            if not any(opens <= start and end <= closes for opens, closes in windows):
+                return False
+        key = (reviewer_id, start)
+        booked = self._booked_cache.get(key)
+        if booked is None:
+            booked = self._booked_cache[key] = bool(defense_schedule.conflicts(start, None, [reviewer_id]))
+        return not booked
+
+    def _feasible(self, reviewers: List[str], start: datetime, room: str) -> bool:
+        if (room, start) in self._taken:
+            return False
+        for reviewer_id in reviewers:
+            plan = self._plans.get(reviewer_id, ())
+            index = bisect_left(plan, (start,))
+            if index < len(plan) and plan[index][0] < start + self.duration:
+                return False
+            if index > 0 and plan[index - 1][0] + self.duration > start:
+                return False
+            if not self._available(reviewer_id, start):
+                return False
+        return True
+
+    # ----------------- هزینه -----------------
+    def _cost(self, reviewers: List[str], start: datetime, room: str) -> float:
+        cost, day = 0.0, start.date()
+        for reviewer_id in reviewers:
+            days = self._days.get(reviewer_id)
+            if days and day not in days:
+                cost += NEW_DAY_PENALTY
+            for other, other_room in self._plans.get(reviewer_id, ()):
+                if other.date() != day:
+                    continue
+                if other + self.duration == start or start + self.duration == other:
+                    cost += -BACK_TO_BACK_BONUS if other_room == room else ROOM_SWITCH_PENALTY
+                else:
+                    cost += SAME_DAY_GAP_PENALTY
+        if (room, start - self.duration) in self._taken or start == self._first_slot.get((room, day)):
+            cost -= ROOM_COMPACT_BONUS
+        # در تساوی، اسلات زودتر
+        return cost + (start - self._origin).total_seconds() / 1e9
+
+    def _candidates(self, reviewers: List[str]):
+        for reviewer_id in reviewers:
+            for other, other_room in self._plans.get(reviewer_id, ()):
+                for start in (other - self.duration, other + self.duration):
+                    yield start, other_room
+                    for room in self.room_slots:
+                        yield start, room
+        for room, starts in self.room_slots.items():
+            found, index = 0, self._next_free.get(room, 0)
+            while index < len(starts) and found < FREE_SLOTS_PER_ROOM:
+                if (room, starts[index]) not in self._taken:
+                    yield starts[index], room
+                    found += 1
+                index += 1
+
+    def _best(self, reviewers: List[str]) -> Optional[Tuple[datetime, str]]:
+        best, best_cost = None, None
+        for start, room in self._candidates(reviewers):
+            if start not in self._room_starts.get(room, ()) or not self._feasible(reviewers, start, room):
+                continue
+            cost = self._cost(reviewers, start, room)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (start, room), cost
+        if best is None:
+            # هیچ‌کدام از گزینه‌های نزدیک جا نداشت: اولین اسلات ممکن
+            best = next(((s, r) for s, r in self.slots if self._feasible(reviewers, s, r)), None)
+        return best
+
+    def _occupy(self, slot: Tuple[datetime, str], reviewers: List[str]):
+        start, room = slot
+        self._taken.add((room, start))
+        for reviewer_id in reviewers:
+            insort(self._plans.setdefault(reviewer_id, []), slot)
+            self._days.setdefault(reviewer_id, Counter())[start.date()] += 1
+        starts, index = self.room_slots[room], self._next_free.get(room, 0)
+        while index < len(starts) and (room, starts[index]) in self._taken:
+            index += 1
+        self._next_free[room] = index
+
+    def _release(self, slot: Tuple[datetime, str], reviewers: List[str]):
+        start, room = slot
+        self._taken.discard((room, start))
+        for reviewer_id in reviewers:
+            self._plans[reviewer_id].remove(slot)
+            days = self._days[reviewer_id]
+            days[start.date()] -= 1
+            if not days[start.date()]:
+                del days[start.date()]
+        position = bisect_left(self.room_slots[room], start)
+        self._next_free[room] = min(self._next_free.get(room, 0), position)
+
+    def _improve(self, placed: Dict[str, Tuple[Tuple[datetime, str], List[str]]]) -> int:
+        """One pass taking every defense out and putting it back in its cheapest slot"""
+        moved = 0
+        for defense_id, (slot, reviewers) in list(placed.items()):
+            self._release(slot, reviewers)
+            current = self._cost(reviewers, *slot)
+            best = self._best(reviewers)
+            if best is not None and best != slot and self._cost(reviewers, *best) < current - 1e-6:
+                slot = best
+                moved += 1
+            self._occupy(slot, reviewers)
+            placed[defense_id] = (slot, reviewers)
+        return moved
+
+    def solve(self, defenses: List[dict] = None) -> Tuple[List[dict], List[Tuple[dict, str]]]:
+        """Compute the timetable without writing anything.
+
+        Returns (timetable, unscheduled); timetable entries hold defense_id,
+        defense_date and defense_location, unscheduled ones the defense and
+        the reason it could not be placed.
+        """
+        if defenses is None:
+            defenses = self.pending_defenses()
+        self._taken, self._plans, self._days, self._next_free = set(), {}, {}, {}
+        self._room_starts = {room: set(starts) for room, starts in self.room_slots.items()}
+        self._first_slot = {}
+        for room, starts in self.room_slots.items():
+            for start in starts:
+                self._first_slot.setdefault((room, start.date()), start)
+        self._origin = self.slots[0][0] if self.slots else datetime.min
+
+        load = Counter(r for d in defenses for r in self._reviewers(d))
+        ordered = sorted(defenses, key=lambda d: (-max((load[r] for r in self._reviewers(d)), default=0),
+                                                  self._reviewers(d), d.get("request_date", "")))
+        placed: Dict[str, Tuple[Tuple[datetime, str], List[str]]] = {}
+        unscheduled = []
+        for defense in ordered:
+            reviewers = self._reviewers(defense)
+            if len(reviewers) < 2:
+                unscheduled.append((defense, "reviewers are not assigned yet"))
+                continue
+            slot = self._best(reviewers)
+            if slot is None:
+                unscheduled.append((defense, "no room slot where both reviewers are free"))
+                continue
+            self._occupy(slot, reviewers)
+            placed[defense["defense_id"]] = (slot, reviewers)
+        for _ in range(IMPROVEMENT_PASSES):
+            if not self._improve(placed):
+                break
+
+        timetable = [{"defense_id": defense_id,
+                      "defense_date": start.strftime(SLOT_FORMAT),
+                      "defense_location": room} for defense_id, ((start, room), _) in placed.items()]
+        timetable.sort(key=lambda t: (t["defense_date"], t["defense_location"]))
+        return timetable, unscheduled
+
+    @staticmethod
+    def _reviewers(defense: dict) -> List[str]:
+        return [r for r in dict.fromkeys([defense.get("internal_reviewer_id"), defense.get("external_reviewer_id")]) if r]
+
+    def summary(self) -> Dict[str, int]:
+        """Quality of the last solve(): reviewer days, room switches and idle room slots"""
+        switches = 0
+        for plan in self._plans.values():
+            for (start, room), (following, following_room) in zip(plan, plan[1:]):
+                if start + self.duration == following and room != following_room:
+                    switches += 1
+        idle = 0
+        for room, starts in self.room_slots.items():
+            by_day: Dict[object, List[bool]] = {}
+            for start in starts:
+                by_day.setdefault(start.date(), []).append((room, start) in self._taken)
+            for used in by_day.values():
+                if any(used):
+                    last = len(used) - used[::-1].index(True)
+                    idle += used[:last].count(False)
+        return {
+            "reviewer_days": sum(len(days) for days in self._days.values()),
+            "room_switches": switches,
+            "idle_room_slots": idle,
+        }
+
+    def apply(self, timetable: List[dict]) -> int:
+        """Write every slot in one commit; returns how many defenses were stored"""
+        now = datetime.now().isoformat()
+
+        def schedule(entry):
+            def mutate(defense):
+                if defense.get("status") != DefenseStatus.APPROVED.value or defense.get("defense_date"):
+                    return False
+                defense["defense_date"] = entry["defense_date"]
+                defense["defense_location"] = entry["defense_location"]
+                defense["defense_setup_date"] = now
+            return mutate
+
+        changed = repository.update_many(self._defense_requests_file,
+                                         {entry["defense_id"]: schedule(entry) for entry in timetable})
+        for before, after in changed.values():
+            defense_schedule.record_change(self._defense_requests_file, before, after)
+        return len(changed)
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Timetable all approved defenses that have no date yet")
+    parser.add_argument("--rooms", help='JSON file {"room": [["YYYY-MM-DD HH:MM", "YYYY-MM-DD HH:MM"], ...]}')
+    parser.add_argument("--room", action="append", default=[], help="room open during working hours (repeatable)")
+    parser.add_argument("--from", dest="first_day", type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help="first day for --room (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=5, help="number of days for --room")
+    parser.add_argument("--availability", help='JSON file {"reviewer_id": [[start, end], ...]}; '
+                                               "reviewers not listed are always available")
+    parser.add_argument("--dry-run", action="store_true", help="print the timetable without saving it")
+    args = parser.parse_args()
+
+    rooms: Dict[str, List[Window]] = {}
+    if args.rooms:
+        with open(args.rooms, encoding="utf-8") as f:
+            rooms.update(read_windows(json.load(f)))
+    if args.room:
+        if not args.first_day:
+            parser.error("--room needs --from")
+        for room in args.room:
+            rooms.setdefault(room, []).extend(daily_windows(args.first_day, args.days))
+    if not rooms:
+        parser.error("give --rooms or --room with --from")
+    availability = None
+    if args.availability:
+        with open(args.availability, encoding="utf-8") as f:
+            availability = read_windows(json.load(f))
+
+    started = time.perf_counter()
+    solver = TimetableSolver(rooms, availability)
+    timetable, unscheduled = solver.solve()
+    elapsed = time.perf_counter() - started
+    for entry in timetable:
+        print(f"📅 {entry['defense_date']}  {entry['defense_location']:<12} {entry['defense_id']}")
+    for defense, reason in unscheduled:
+        print(f"❌ {defense.get('defense_id')}: {reason}")
+    quality = solver.summary()
+    print(f"\n⏱️ {len(timetable)} scheduled, {len(unscheduled)} left in {elapsed:.2f} s - "
+          f"reviewer days: {quality['reviewer_days']}, room switches: {quality['room_switches']}, "
+          f"idle room slots: {quality['idle_room_slots']}")
+    if not args.dry_run and timetable:
+        print(f"💾 {solver.apply(timetable)} defenses updated")
@@ -0,0 +1,251 @@
+# final_grades.py
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from repository import repository, collection_name, ConflictError, VERSION_FIELD
+from archive import cold_archive
+
+FINAL_GRADES_FILE = "data/final_grades.json"
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+# THESIS_GRADE_POLICY=path/to/policy.json replaces any of the DEFAULT_POLICY keys
+GRADE_POLICY_ENV = "THESIS_GRADE_POLICY"
+DEFAULT_POLICY = {
+    "name": "default",
+    "points": {"A": 4, "B": 3, "C": 2, "F": 0},
+    # وزن نمره‌ی هر نقش در میانگین؛ نقش بدون وزن فقط نمایش داده می‌شود
+    "weights": {"internal": 1, "external": 1, "supervisor": 1},
+    "required": ["internal", "external"],
+    # (کمترین میانگین، برچسب) از بالا به پایین؛ کمتر از همه fail_label است
+    "boundaries": [[3.5, "A"], [2.5, "B"], [1.5, "C"]],
+    "fail_label": "F",
+    "fail_if_any_fails": True,
+}
+
+
+class GradePolicy:
+    """How the labels of a defense's graders combine into one final label.
+
+    Each grade gets a role: internal or external when it comes from the
+    defense's current reviewer of that kind, supervisor when it comes from
+    the supervising professor, other otherwise. Once every required role has
+    graded, the weighted mean of the points of the weighted roles is turned
+    back into a label through the boundaries. With fail_if_any_fails a
+    fail_label from any weighted role fails the defense.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**DEFAULT_POLICY, **(settings or {})}
+        self.name = self.settings["name"]
+
+    @classmethod
+    def from_env(cls) -> "GradePolicy":
+        path = os.environ.get(GRADE_POLICY_ENV)
+        if not path:
+            return cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring {GRADE_POLICY_ENV}={path!r}: {e}", file=sys.stderr)
+            return cls()
+
+    @staticmethod
+    def role(defense: dict, reviewer_id: str) -> str:
+        if reviewer_id == defense.get("internal_reviewer_id"):
+            return "internal"
+        if reviewer_id == defense.get("external_reviewer_id"):
+            return "external"
+        if reviewer_id == defense.get("professor_id"):
+            return "supervisor"
+        return "other"
+
+    def combine(self, labels: Dict[str, str]) -> Tuple[Optional[str], Optional[float]]:
+        """(final label, weighted mean points) of role -> label; (None, None) while incomplete"""
+        settings = self.settings
+        if any(role not in labels for role in settings["required"]):
+            return None, None
+        weights, points = settings["weights"], settings["points"]
+        counted = {role: label for role, label in labels.items() if weights.get(role) and label in points}
+        total = sum(weights[role] for role in counted)
+        if not total:
+            return None, None
+        score = sum(weights[role] * points[label] for role, label in counted.items()) / total
+        if settings["fail_if_any_fails"] and settings["fail_label"] in counted.values():
+            return settings["fail_label"], score
+        for minimum, label in settings["boundaries"]:
+            if score >= minimum:
+                return label, score
+        return settings["fail_label"], score
+
+
+class FinalGrades:
+    """One stored final-grade record per graded defense.
+
+    Records live in data/final_grades.json and hold the combined label,
+    the mean points and a copy of every grade with its role, so the grade
+    views read a single record per defense. They are recomputed by
+    record_change() whenever a defense request is written. A record keeps
+    the _version of the defense it was computed from and is only replaced
+    by one computed from a newer version, so two sessions grading the same
+    defense cannot leave the older result behind. rebuild() recomputes
+    everything (also after a policy change) and verify() reports drift;
+    neither runs on its own apart from the one-time build in
+    main.initialize_data_files().
+    """
+
+    def __init__(self, policy: Optional[GradePolicy] = None):
+        self.policy = policy or GradePolicy.from_env()
+
+    def compute(self, defense: Optional[dict]) -> Optional[dict]:
+        """Final-grade record of a defense, or None while it has no grades"""
+        grades = (defense or {}).get("grades") or {}
+        if not grades:
+            return None
+        components, labels = {}, {}
+        # نمره‌ی تازه‌تر هر نقش حساب می‌شود
+        for reviewer_id, grade in sorted(grades.items(), key=lambda item: item[1].get("grading_date") or ""):
+            role = self.policy.role(defense, reviewer_id)
+            components[reviewer_id] = {
+                "role": role,
+                "label": grade.get("label"),
+                "comments": grade.get("comments", ""),
+                "reviewer_type": grade.get("reviewer_type"),
+                "reviewer_name": grade.get("reviewer_name"),
+                "grading_date": grade.get("grading_date"),
+            }
+            labels[role] = grade.get("label")
+        label, score = self.policy.combine(labels)
+        awaiting = [role for role in self.policy.settings["required"] if role not in labels]
+        return {
+            "defense_id": defense.get("defense_id"),
+            "student_id": defense.get("student_id"),
+            "student_name": defense.get("student_name"),
+            "thesis_title": defense.get("thesis_title"),
+            "status": "Final" if label else "Incomplete",
+            "final_label": label,
+            "score": None if score is None else round(score, 2),
+            "awaiting": awaiting,
+            "policy": self.policy.name,
+            "grades": components,
+            "source_version": defense.get(VERSION_FIELD, 0),
+        }
+
+    def record_change(self, path: str, before: Optional[dict], after: Optional[dict]):
+        """Store the final grade of a defense request that changed from before to after"""
+        if collection_name(path) != collection_name(DEFENSE_REQUESTS_FILE) or after is None:
+            return
+        record = self.compute(after)
+        if record is None:
+            # نمره‌ها پاک شده‌اند؛ نتیجه‌ی قبلی نباید بماند
+            version = after.get(VERSION_FIELD, 0)
+            repository.remove_many(FINAL_GRADES_FILE, {
+                after.get("defense_id"): lambda stored: stored.get("source_version", 0) < version})
+            return
+        while True:
+            stored = repository.get(FINAL_GRADES_FILE, record["defense_id"])
+            if stored is not None and stored.get("source_version", 0) >= record["source_version"]:
+                return
+            expected = stored.get(VERSION_FIELD, 0) if stored is not None else 0
+            if repository.compare_and_swap(FINAL_GRADES_FILE, dict(record), expected):
+                return
+
+    def get(self, defense_id: str) -> Optional[dict]:
+        return repository.get(FINAL_GRADES_FILE, defense_id)
+
+    def for_student(self, student_id: str) -> List[dict]:
+        return repository.find(FINAL_GRADES_FILE, student_id=student_id)
+
+    def load(self) -> List[dict]:
+        return repository.load(FINAL_GRADES_FILE)
+
+    def rebuild(self, retries: int = 10) -> List[dict]:
+        """Recompute every final grade and store the ones that differ.
+
+        Like CapacityCounters.rebuild(), a stored record that another session
+        rewrote between reading its version and writing it restarts the
+        rebuild instead of being overwritten.
+        """
+        for attempt in range(retries):
+            versions = {r.get("defense_id"): r.get(VERSION_FIELD, 0) for r in repository.load(FINAL_GRADES_FILE)}
+            records = [r for r in map(self.compute, cold_archive.all_records(DEFENSE_REQUESTS_FILE)) if r]
+            computed = {r["defense_id"]: r for r in records}
+            stale = []
+
+            def unchanged(defense_id, stored):
+                if stored.get(VERSION_FIELD, 0) != versions[defense_id]:
+                    stale.append(defense_id)
+                    return False
+                return True
+
+            def setter(defense_id, record):
+                def apply(stored):
+                    if not unchanged(defense_id, stored) or all(stored.get(k) == v for k, v in record.items()):
+                        return False
+                    stored.clear()
+                    stored.update(record)
+                return apply
+
+            repository.update_many(FINAL_GRADES_FILE, {
+                defense_id: setter(defense_id, computed[defense_id]) for defense_id in versions if defense_id in computed
+            })
+            repository.remove_many(FINAL_GRADES_FILE, {
+                defense_id: functools.partial(unchanged, defense_id) for defense_id in versions if defense_id not in computed
+            })
+            missing = [dict(r) for r in records if r["defense_id"] not in versions]
+            added = repository.insert_many(FINAL_GRADES_FILE, missing) if missing else []
+            if not stale and len(added) == len(missing):
+                return records
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+        raise ConflictError("Final grades kept changing during the rebuild")
+
+    def verify(self) -> List[str]:
+        """Return a description of every stored final grade that differs from a rebuild"""
+        computed = {r["defense_id"]: r for r in map(self.compute, cold_archive.all_records(DEFENSE_REQUESTS_FILE)) if r}
+        stored = {r.get("defense_id"): r for r in repository.load(FINAL_GRADES_FILE)}
+        problems = []
+        for defense_id in sorted(set(computed) | set(stored), key=str):
+            expected, actual = computed.get(defense_id), stored.get(defense_id)
+            if expected is None:
+                problems.append(f"{defense_id}: stored but the defense has no grades")
+            elif actual is None:
+                problems.append(f"{defense_id}: missing (should be {expected['final_label'] or 'incomplete'})")
+            elif actual.get("final_label") != expected["final_label"]:
+                problems.append(f"{defense_id}: stored {actual.get('final_label') or 'incomplete'}, "
+                                f"actual {expected['final_label'] or 'incomplete'}")
+            else:
+                stale = [k for k, v in expected.items() if k != "source_version" and actual.get(k) != v]
+                if stale:
+                    problems.append(f"{defense_id}: stored {', '.join(stale)} out of date")
+        return problems
+
+
+final_grades = FinalGrades()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Final thesis grades: registrar report, verify or rebuild")
+    parser.add_argument("--student", help="only this student's defenses")
+    parser.add_argument("--verify", action="store_true", help="compare the stored grades with a recomputation")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every final grade (e.g. after a policy change)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"🔧 {len(final_grades.rebuild())} final grades rebuilt with policy '{final_grades.policy.name}'")
+    elif args.verify:
+        problems = final_grades.verify()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print("✅ Final grades are consistent")
+    else:
+        records = final_grades.for_student(args.student) if args.student else final_grades.load()
+        if not records:
+            print("📭 No graded defenses")
+        for r in sorted(records, key=lambda r: (r.get("student_id") or "", r.get("defense_id") or "")):
+            final = f"{r['final_label']} ({r['score']:.2f})" if r.get("final_label") else "incomplete"
+            print(f"🎓 {r.get('student_id')}  {r.get('student_name')}  {r.get('defense_id')}  {final}")
@@ -0,0 +1,134 @@
+# grading.py
+import csv
+from datetime import datetime
+from typing import Dict, List, Tuple
+from repository import repository
+from records import DefenseStatus, Grade
+from reviewer_recommender import reviewer_recommender
+from final_grades import final_grades
+
+GRADE_LABELS = ["A", "B", "C", "F"]
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+
+
+def submit_grades(entries: List[dict], assigned_ids, reviewer_id: str, reviewer_type: str,
+                  reviewer_name: str, path: str = DEFENSE_REQUESTS_FILE) -> Tuple[int, List[str]]:
+    """Validate grade entries and store them all in a single commit.
+
+    entries are dicts with defense_id, label and optional comments. Entries
+    for sessions outside assigned_ids, with an unknown label or repeating an
+    earlier defense_id are rejected; so are defenses that, inside the commit,
+    are no longer Approved or no longer have reviewer_id as a reviewer.
+    Returns (number of grades saved, error messages).
+    """
+    assigned_ids = set(assigned_ids)
+    errors, grades = [], {}
+    now = datetime.now().isoformat()
+    for entry in entries:
+        defense_id = (entry.get("defense_id") or "").strip()
+        label = (entry.get("label") or "").strip().upper()
+        if defense_id not in assigned_ids:
+            errors.append(f"{defense_id or '-'}: not assigned to you")
+        elif defense_id in grades:
+            errors.append(f"{defense_id}: graded more than once in this batch, only the first grade is used")
+        elif label not in GRADE_LABELS:
+            errors.append(f"{defense_id}: invalid grade label '{entry.get('label', '')}'")
+        else:
+            grades[defense_id] = Grade({
+                "label": label,
+                "comments": entry.get("comments", "") or "",
+                "grading_date": now,
+                "reviewer_type": reviewer_type,
+                "reviewer_name": reviewer_name
+            })
+
+    refused = {}
+
+    def add_grade(defense_id, grade):
+        def mutate(defense):
+            # داور ممکن است بعد از خواندن لیست عوض شده باشد
+            if reviewer_id not in (defense.get("internal_reviewer_id"), defense.get("external_reviewer_id")):
+                refused[defense_id] = "no longer assigned to you"
+                return False
+            if defense.get("status") != DefenseStatus.APPROVED.value:
+                refused[defense_id] = f"defense is {defense.get('status') or 'not approved'}"
+                return False
+            if "grades" not in defense:
+                defense["grades"] = {}
+            defense["grades"][reviewer_id] = grade
+        return mutate
+
+    changed = repository.update_many(path, {d: add_grade(d, g) for d, g in grades.items()}) if grades else {}
+    for before, after in changed.values():
+        reviewer_recommender.record_change(before, after)
+        final_grades.record_change(path, before, after)
+    for defense_id in grades:
+        if defense_id not in changed:
+            errors.append(f"{defense_id}: {refused.get(defense_id, 'defense request not found')}")
+    return len(changed), errors
+
+
+def read_grades_csv(file_path: str) -> List[dict]:
+    """Read defense_id,label,comments rows from a CSV file"""
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [{(k or "").strip(): (v or "").strip() for k, v in row.items()}
+                for row in csv.DictReader(f)]
+
+
+def batch_grade_menu(sessions: List[dict], reviewer_id: str, reviewer_type: str, reviewer_name: str):
+    """Interactive batch grading over the given assigned sessions"""
+    print("\n📦 Batch Grading")
+    if not sessions:
+        print("❌ No assigned defense sessions")
+        return
+
+    print("1. Enter grades one after another")
+    print("2. Load grades from a CSV file (defense_id,label,comments)")
+    mode = input("Select (1/2): ")
+
+    entries: List[dict] = []
+    if mode == "1":
+        for i, s in enumerate(sessions, 1):
+            status = "Graded" if reviewer_id in s.get("grades", {}) else "Pending"
+            print(f"{i}. {s.get('thesis_title')} - {s.get('student_name')} - {status}")
+        chosen: Dict[str, dict] = {}
+        while True:
+            raw = input("\nSession number (empty to finish): ").strip()
+            if not raw:
+                break
+            try:
+                index = int(raw) - 1
+                if not (0 <= index < len(sessions)):
+                    raise ValueError
+            except ValueError:
+                print("❌ Invalid selection")
+                continue
+            label = input(f"Grade ({'/'.join(GRADE_LABELS)}): ").strip().upper()
+            if label not in GRADE_LABELS:
+                print("❌ Invalid grade label")
+                continue
+            comments = input("Comments (optional): ")
+            chosen[sessions[index]["defense_id"]] = {
+                "defense_id": sessions[index]["defense_id"], "label": label, "comments": comments
+            }
+        entries = list(chosen.values())
+    elif mode == "2":
+        file_path = input("CSV file path: ").strip().strip('"').strip("'")
+        try:
+            entries = read_grades_csv(file_path)
+        except (OSError, csv.Error) as e:
+            print(f"❌ Could not read file: {e}")
+            return
+    else:
+        print("❌ Invalid selection")
+        return
+
+    if not entries:
+        print("🚫 No grades entered")
+        return
+
+    saved, errors = submit_grades(entries, [s["defense_id"] for s in sessions],
+                                  reviewer_id, reviewer_type, reviewer_name)
+    for error in errors:
+        print(f"❌ {error}")
+    print(f"✅ {saved} grade(s) saved")
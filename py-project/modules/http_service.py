@@ -0,0 +1,466 @@
+# http_service.py
+import argparse
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from user import User, UserType
+from repository import repository, ConflictError
+from student import StudentSystem, DefenseStatus
+from professor import ProfessorSystem
+from reviewer import ReviewerSystem
+from reviewer_assignment import ReviewerAssignmentEngine
+from capacity import capacity_counters
+from grading import submit_grades
+from upload_store import upload_store
+from thesis_search import thesis_search
+from course_catalog import course_catalog
+from reservations import seat_reservations
+from final_grades import final_grades
+from defense_schedule import ScheduleConflict
+from instrumentation import io_stats
+from records import encode_record
+
+SESSION_TTL_SECONDS = 8 * 3600
+MAX_JSON_BODY = 1024 * 1024
+MAX_SEARCH_RESULTS = 100
+MAX_UPLOAD_BODY = 512 * 1024 * 1024
+
+
+class ServiceError(Exception):
+    """A request that cannot be served; status is the HTTP status code.
+
+    body_consumed tells the server the request body was already read, so the
+    keep-alive connection can still be reused.
+    """
+
+    def __init__(self, status: int, message: str, body_consumed: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.body_consumed = body_consumed
+
+
+def _plain(message: str) -> str:
+    """Drop the leading icon of a console message"""
+    return message.split(" ", 1)[-1]
+
+
+class SessionStore:
+    """Bearer-token sessions kept in memory for the lifetime of the server"""
+
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, user_type: UserType, user_id: str) -> str:
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = {
+                "user_type": user_type,
+                "user_id": user_id,
+                "token": token,
+                "expires": time.monotonic() + self.ttl,
+                # file type -> sha256 -> upload result of files this session sent
+                "uploads": {}
+            }
+        return token
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session["expires"] < time.monotonic():
+                del self._sessions[token]
+                return None
+            session["expires"] = time.monotonic() + self.ttl
+            return session
+
+    def drop(self, token: str):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+class ThesisService:
+    """The operations of the console menus as JSON-in / JSON-out calls.
+
+    Every method works on the logged-in session and reuses the Student,
+    Professor and Reviewer systems, so the rules (seat taking, capacity
+    limits, status checks, grade validation) are the same as on the
+    terminal. All request threads share the process-wide repository.
+    """
+
+    def __init__(self):
+        self.sessions = SessionStore()
+
+    # ----------------- ورود -----------------
+    def login(self, body: dict) -> dict:
+        result = User.login(str(body.get("user_id", "")), str(body.get("password", "")))
+        if not result:
+            raise ServiceError(401, "Invalid user ID or password")
+        user_type, user_id = result
+        user = User._users_directory().get(user_type, user_id) or {}
+        return {
+            "token": self.sessions.create(user_type, user_id),
+            "user_id": user_id,
+            "user_type": user_type.value,
+            "name": user.get("name")
+        }
+
+    def logout(self, session: dict, body: dict) -> dict:
+        self.sessions.drop(session["token"])
+        return {"logged_out": True}
+
+    @staticmethod
+    def _require(session: dict, *user_types: UserType):
+        if session["user_type"] not in user_types:
+            raise ServiceError(403, "This action is not available for your account")
+
+    @staticmethod
+    def _student(session: dict) -> StudentSystem:
+        ThesisService._require(session, UserType.STUDENT)
+        return StudentSystem(session["user_id"], verbose=False)
+
+    @staticmethod
+    def _professor(session: dict) -> ProfessorSystem:
+        ThesisService._require(session, UserType.PROFESSOR)
+        return ProfessorSystem(session["user_id"], verbose=False)
+
+    # ----------------- دانشجو -----------------
+    def courses(self, session: dict) -> dict:
+        return {"courses": self._student(session)._available_courses()}
+
+    def thesis_requests(self, session: dict) -> dict:
+        if session["user_type"] == UserType.PROFESSOR:
+            professor = self._professor(session)
+            seat_reservations.expire()
+            return {"thesis_requests": repository.find(professor._thesis_requests_file,
+                                                       professor=professor.name)}
+        student = self._student(session)
+        return {"thesis_requests": student._thesis_history()}
+
+    def create_thesis_request(self, session: dict, body: dict) -> dict:
+        student = self._student(session)
+        course = course_catalog.available_course(student.major, body.get("course_id"))
+        if course is None:
+            raise ServiceError(404, "No available course with this ID for your major")
+        blocked = student._thesis_request_block(student._thesis_history())
+        if blocked:
+            raise ServiceError(409, _plain(blocked))
+        request = student._submit_thesis_request(course)
+        if request is None:
+            raise ServiceError(409, "This course has just been filled, please choose another one")
+        return {"thesis_request": request}
+
+    def join_waitlist(self, session: dict, body: dict) -> dict:
+        student = self._student(session)
+        full_courses = {c.get("course_id"): c for c in seat_reservations.full_courses(student.major)}
+        course = full_courses.get(body.get("course_id"))
+        if course is None:
+            raise ServiceError(404, "No full course with this ID for your major")
+        blocked = student._thesis_request_block(student._thesis_history())
+        if blocked:
+            raise ServiceError(409, _plain(blocked))
+        place = student._join_waitlist(course.get("course_id"))
+        if place is None:
+            raise ServiceError(409, "A seat has just been freed in this course, please request it")
+        return {"course_id": course.get("course_id"), "place": place}
+
+    def upload(self, session: dict, query: dict, stream, length: int) -> dict:
+        student = self._student(session)
+        file_type = query.get("kind", [""])[0]
+        filename = query.get("filename", [""])[0]
+        if file_type not in student._upload_kinds:
+            raise ServiceError(400, f"kind must be one of {', '.join(student._upload_kinds)}")
+        if length > MAX_UPLOAD_BODY:
+            raise ServiceError(413, "File is too large")
+        extension = os.path.splitext(filename)[1].lower()
+        stored = upload_store.put_stream(stream, extension, student._upload_kinds[file_type], length)
+        if not stored["valid"]:
+            raise ServiceError(422, "; ".join(stored["errors"]), body_consumed=True)
+        session["uploads"].setdefault(file_type, {})[stored["sha256"]] = stored
+        return {"upload": stored}
+
+    def defense_requests(self, session: dict) -> dict:
+        if session["user_type"] == UserType.PROFESSOR:
+            professor = self._professor(session)
+            return {"defense_requests": repository.find(professor._defense_requests_file,
+                                                        professor=professor.name)}
+        student = self._student(session)
+        return {"defense_requests": student._defense_history()}
+
+    def create_defense_request(self, session: dict, body: dict) -> dict:
+        student = self._student(session)
+        approved_thesis, blocked = student._defense_request_block()
+        if blocked:
+            raise ServiceError(409, _plain(blocked))
+
+        files = {}
+        for file_type in student._upload_kinds:
+            stored = session["uploads"].get(file_type, {}).get(body.get(file_type))
+            if stored is None:
+                raise ServiceError(400, f"{file_type} must be the sha256 of a file uploaded in this session")
+            files[file_type] = stored
+
+        keywords = body.get("keywords", "")
+        if isinstance(keywords, list):
+            keywords = ",".join(str(k) for k in keywords)
+        request = student._submit_defense_request(
+            approved_thesis, str(body.get("thesis_title", "")), str(body.get("abstract", "")),
+            keywords, files["thesis_pdf"], files["first_page_image"])
+        return {"defense_request": request}
+
+    def my_grades(self, session: dict) -> dict:
+        student = self._student(session)
+        return {"grades": [{"defense_id": d.get("defense_id"), "thesis_title": d.get("thesis_title"),
+                            "final_label": d.get("final_label"), "score": d.get("score"),
+                            "awaiting": d.get("awaiting"), "grades": d.get("grades", {})}
+                           for d in final_grades.for_student(student.user_id)]}
+
+    # ----------------- استاد -----------------
+    def _owned_request(self, professor: ProfessorSystem, path: str, key) -> dict:
+        request = repository.get(path, key)
+        if request is None or request.get("professor") != professor.name:
+            raise ServiceError(404, "No such request among yours")
+        return request
+
+    def decide_thesis_request(self, session: dict, request_id: str, body: dict) -> dict:
+        professor = self._professor(session)
+        self._owned_request(professor, professor._thesis_requests_file, request_id)
+        approve = bool(body.get("approve"))
+        if approve and professor._get_current_guidance_count() >= professor._max_guidance_capacity:
+            raise ServiceError(409, f"You have reached your maximum guidance capacity "
+                                    f"({professor._max_guidance_capacity} students)")
+        if not professor.decide_thesis_request(request_id, approve):
+            raise ServiceError(409, "This request has already been handled in another session")
+        return {"thesis_request": repository.get(professor._thesis_requests_file, request_id)}
+
+    def decide_defense_request(self, session: dict, defense_id: str, body: dict) -> dict:
+        professor = self._professor(session)
+        self._owned_request(professor, professor._defense_requests_file, defense_id)
+        if not professor.decide_defense_request(defense_id, bool(body.get("approve")),
+                                                str(body.get("rejection_reason", ""))):
+            raise ServiceError(409, "This defense request has already been handled in another session")
+        return {"defense_request": repository.get(professor._defense_requests_file, defense_id)}
+
+    def set_defense_details(self, session: dict, defense_id: str, body: dict) -> dict:
+        professor = self._professor(session)
+        defense = self._owned_request(professor, professor._defense_requests_file, defense_id)
+        if defense.get("status") != DefenseStatus.APPROVED.value:
+            raise ServiceError(409, "Only approved defenses can be scheduled")
+        internal = User._users_directory().get(UserType.PROFESSOR, body.get("internal_reviewer_id"))
+        guest = User._users_directory().get(UserType.GUEST_REVIEWER, body.get("external_reviewer_id"))
+        if internal is None or guest is None:
+            raise ServiceError(404, "Unknown internal or external reviewer")
+        try:
+            professor.store_defense_details(defense_id, str(body.get("defense_date", "")),
+                                            str(body.get("defense_location", "")), internal, guest)
+        except ScheduleConflict as e:
+            raise ServiceError(409, str(e))
+        return {"defense_request": repository.get(professor._defense_requests_file, defense_id)}
+
+    def assign_reviewers(self, session: dict, body: dict) -> dict:
+        """Assign reviewers to the caller's own pending defenses.
+
+        The department-wide run stays with the reviewer_assignment command.
+        """
+        professor = self._professor(session)
+        engine = ReviewerAssignmentEngine(ProfessorSystem._max_review_capacity)
+        assignments, unassigned = engine.plan([d for d in engine.pending_defenses()
+                                               if d.get("professor") == professor.name])
+        stored = 0 if body.get("dry_run") else engine.apply(assignments)
+        return {
+            "assignments": assignments,
+            "unassigned": [d.get("defense_id") for d in unassigned],
+            "stored": stored
+        }
+
+    def capacity(self, session: dict) -> dict:
+        professor = self._professor(session)
+        counters = capacity_counters.get(professor.user_id)
+        return {
+            "guidance": counters["guidance"],
+            "max_guidance": professor._max_guidance_capacity,
+            "review": counters["review"],
+            "max_review": professor._max_review_capacity
+        }
+
+    # ----------------- داوری -----------------
+    def _reviewer(self, session: dict):
+        """(assigned sessions, reviewer type, reviewer name) of the logged-in reviewer"""
+        self._require(session, UserType.PROFESSOR, UserType.GUEST_REVIEWER)
+        if session["user_type"] == UserType.PROFESSOR:
+            professor = ProfessorSystem(session["user_id"], verbose=False)
+            return professor._internal_review_sessions(), "internal", professor.name
+        reviewer = ReviewerSystem(session["user_id"], UserType.GUEST_REVIEWER, verbose=False)
+        return reviewer._assigned_defenses(), reviewer._reviewer_type(), reviewer.name
+
+    def search(self, session: dict, query: dict) -> dict:
+        text = query.get("q", [""])[0].strip()
+        if not text:
+            raise ServiceError(400, "q (the search text) is required")
+        options = {name: query[name][0] for name in ("status", "professor", "year") if query.get(name)}
+        limit = max(1, min(int(query.get("limit", ["10"])[0]), MAX_SEARCH_RESULTS))
+        return {"results": thesis_search.search(text, limit=limit, **options)}
+
+    def assigned_sessions(self, session: dict) -> dict:
+        sessions, _, _ = self._reviewer(session)
+        return {"sessions": sessions}
+
+    def grade(self, session: dict, body: dict) -> dict:
+        sessions, reviewer_type, name = self._reviewer(session)
+        entries = body.get("grades")
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ServiceError(400, "grades must be a list of {defense_id, label, comments}")
+        saved, errors = submit_grades(entries, [s["defense_id"] for s in sessions],
+                                      session["user_id"], reviewer_type, name)
+        return {"saved": saved, "errors": errors}
+
+
+# (method, path pattern, handler name, needs a session)
+ROUTES = [
+    ("POST", r"/login", "login", False),
+    ("POST", r"/logout", "logout", True),
+    ("GET", r"/courses", "courses", True),
+    ("GET", r"/thesis-requests", "thesis_requests", True),
+    ("POST", r"/thesis-requests", "create_thesis_request", True),
+    ("POST", r"/thesis-requests/(?P<request_id>[^/]+)/decision", "decide_thesis_request", True),
+    ("POST", r"/waitlist", "join_waitlist", True),
+    ("POST", r"/uploads", "upload", True),
+    ("GET", r"/defense-requests", "defense_requests", True),
+    ("POST", r"/defense-requests", "create_defense_request", True),
+    ("POST", r"/defense-requests/(?P<defense_id>[^/]+)/decision", "decide_defense_request", True),
+    ("POST", r"/defense-requests/(?P<defense_id>[^/]+)/details", "set_defense_details", True),
+    ("POST", r"/reviewer-assignments", "assign_reviewers", True),
+    ("GET", r"/capacity", "capacity", True),
+    ("GET", r"/search", "search", True),
+    ("GET", r"/reviews", "assigned_sessions", True),
+    ("POST", r"/grades", "grade", True),
+    ("GET", r"/grades", "my_grades", True),
+]
+# GET handlers that take the parsed query string
+QUERY_HANDLERS = {"search"}
+_COMPILED_ROUTES = [(m, re.compile(f"^{p}$"), h, a) for m, p, h, a in ROUTES]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Thin HTTP/1.1 layer: routing, JSON bodies and bearer tokens"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server_version = "ThesisService/1.0"
+    service: ThesisService = None
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body_read = length == 0
+        try:
+            for route_method, pattern, handler_name, needs_session in _COMPILED_ROUTES:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    break
+            else:
+                raise ServiceError(404, "Unknown endpoint")
+
+            args = list(match.groupdict().values())
+            if needs_session:
+                token = self.headers.get("Authorization", "").replace("Bearer ", "", 1).strip()
+                session = self.service.sessions.get(token)
+                if session is None:
+                    raise ServiceError(401, "Login required")
+                args.insert(0, session)
+
+            handler = getattr(self.service, handler_name)
+            with io_stats.action(f"http.{handler_name}"):
+                if handler_name == "upload":
+                    # فایل مستقیم از سوکت به انبار کپی می‌شود
+                    payload = handler(*args, parse_qs(url.query), self.rfile, length)
+                    body_read = True
+                else:
+                    if length > MAX_JSON_BODY:
+                        raise ServiceError(413, "Request body is too large")
+                    raw = self.rfile.read(length) if length else b""
+                    body_read = True
+                    if method == "POST":
+                        body = json.loads(raw.decode("utf-8") or "{}")
+                        if not isinstance(body, dict):
+                            raise ServiceError(400, "Request body must be a JSON object")
+                        args.append(body)
+                    elif handler_name in QUERY_HANDLERS:
+                        args.append(parse_qs(url.query))
+                    payload = handler(*args)
+            self._send(200, payload)
+        except ServiceError as e:
+            self._send(e.status, {"error": e.message}, close=not (body_read or e.body_consumed))
+        except ConflictError as e:
+            self._send(409, {"error": str(e)}, close=not body_read)
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send(400, {"error": str(e)}, close=not body_read)
+        except Exception:
+            # جزئیات فقط در لاگ سرور؛ کاربر پیام عمومی می‌گیرد
+            self.log_error("Internal error in %s %s\n%s", method, url.path, traceback.format_exc())
+            self._send(500, {"error": "Internal server error"}, close=True)
+
+    def _send(self, status: int, payload: dict, close: bool = False):
+        data = json.dumps(payload, ensure_ascii=False, default=encode_record).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if close:
+            # بدنه‌ی درخواست خوانده نشده، اتصال دیگر قابل استفاده نیست
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def log_error(self, format, *args):
+        # خطاها حتی با --quiet ثبت می‌شوند
+        super().log_message(format, *args)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8080, quiet: bool = False) -> ThreadingHTTPServer:
+    """Build a threaded server that shares one ThesisService between requests"""
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": ThesisService()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    return server
+
+
+if __name__ == "__main__":
+    from main import initialize_data_files
+
+    parser = argparse.ArgumentParser(description="Serve the thesis system as an HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args()
+
+    initialize_data_files()
+    io_stats.install_session_report()
+    server = create_server(args.host, args.port, args.quiet)
+    print(f"🌐 Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Shutting down...")
+    finally:
+        server.server_close()
@@ -0,0 +1,85 @@
+# ids.py
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# TR_20261017_061357_482_0003_5f1c2a
+#    date     time   ms  seq  node
+# Every part has a fixed width, so sorting the IDs as strings sorts them by
+# submission time. The time is UTC, so the order survives a daylight-saving
+# fall-back. The old second-resolution IDs (TR_20250912_203618) hold local
+# time; they are prefixes of the new layout and sort among the new IDs up to
+# the UTC offset.
+SEQUENCE_LIMIT = 10000
+_ID_PATTERN = re.compile(r"^[A-Za-z]+_(\d{8}_\d{6})(?:_(\d{3}))?")
+
+
+def format_id(prefix: str, when: datetime, sequence: int = 0, node: str = "000000") -> str:
+    """Build an ID for a given moment (used by the generator and by data generators).
+
+    A naive when is taken as local time, like datetime.now().
+    """
+    when = when.astimezone(timezone.utc)
+    return f"{prefix}_{when:%Y%m%d_%H%M%S}_{when.microsecond // 1000:03d}_{sequence:04d}_{node}"
+
+
+def id_time(identifier: str) -> Optional[datetime]:
+    """Submission time encoded in an ID (old or new layout) as naive local time, or None"""
+    match = _ID_PATTERN.match(identifier or "")
+    if not match:
+        return None
+    moment = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+    if match.group(2) is None:
+        return moment  # شناسه‌ی قدیمی به وقت محلی است
+    moment = moment.replace(microsecond=int(match.group(2)) * 1000, tzinfo=timezone.utc)
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def id_bounds(prefix: str, since: Optional[datetime] = None,
+              until: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str]]:
+    """[start, stop) key range of the IDs submitted in [since, until) (naive times are local)"""
+    start = f"{prefix}_{since.astimezone(timezone.utc):%Y%m%d_%H%M%S}" if since else None
+    stop = f"{prefix}_{until.astimezone(timezone.utc):%Y%m%d_%H%M%S}" if until else None
+    return start, stop
+
+
+class IdGenerator:
+    """Time-ordered IDs that do not collide within or across processes.
+
+    Inside a process a lock and a per-millisecond sequence keep IDs strictly
+    increasing, even when the clock stands still or steps back. Other
+    processes (several terminals, the HTTP service) differ in the random
+    node part, which is drawn again in a forked child.
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+        self.node = f"{secrets.randbits(24):06x}"
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            else:
+                # همان میلی‌ثانیه یا ساعتی که عقب رفته: ادامه از آخرین شناسه
+                self._sequence += 1
+                if self._sequence >= SEQUENCE_LIMIT:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            seconds, millis = divmod(self._last_ms, 1000)
+            moment = datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=millis * 1000)
+            return format_id(prefix, moment, self._sequence, self.node)
+
+
+id_generator = IdGenerator()
@@ -0,0 +1,128 @@
+# instrumentation.py
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# THESIS_IO_REPORT=1 prints the report when the program exits; any other
+# value is taken as a path and the JSON snapshot is written there instead
+REPORT_ENV = "THESIS_IO_REPORT"
+
+_FIELDS = ["loads", "cache_hits", "saves", "load_seconds", "save_seconds",
+           "bytes_read", "bytes_written", "parse_seconds", "serialize_seconds"]
+
+
+def _empty() -> Dict[str, float]:
+    return dict.fromkeys(_FIELDS, 0)
+
+
+class IOStats:
+    """Counts what the repository reads and writes, per file and per menu action.
+
+    The storage backends call record_load / record_cache_hit / record_save.
+    Menu loops wrap each selected option in action(name); I/O is charged to
+    the innermost action running on the current thread (or "-" outside any
+    action), and the action itself gets its run count and wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.files: Dict[str, Dict[str, float]] = {}
+            self.actions: Dict[str, Dict[str, float]] = {}
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_action(self) -> str:
+        stack = self._stack()
+        return stack[-1] if stack else "-"
+
+    @contextmanager
+    def action(self, name: str):
+        """Attribute the I/O done inside the block to the menu action name"""
+        stack = self._stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                entry = self.actions.setdefault(name, _empty())
+                entry["runs"] = entry.get("runs", 0) + 1
+                entry["seconds"] = entry.get("seconds", 0) + elapsed
+
+    def _add(self, path: str, **values):
+        name = os.path.basename(path)
+        action = self.current_action()
+        with self._lock:
+            for entry in (self.files.setdefault(name, _empty()), self.actions.setdefault(action, _empty())):
+                for field, value in values.items():
+                    entry[field] += value
+
+    def record_load(self, path: str, seconds: float, nbytes: int, parse_seconds: float):
+        self._add(path, loads=1, load_seconds=seconds, bytes_read=nbytes, parse_seconds=parse_seconds)
+
+    def record_cache_hit(self, path: str):
+        self._add(path, cache_hits=1)
+
+    def record_save(self, path: str, seconds: float, nbytes: int, serialize_seconds: float):
+        self._add(path, saves=1, save_seconds=seconds, bytes_written=nbytes,
+                  serialize_seconds=serialize_seconds)
+
+    def snapshot(self) -> dict:
+        """Copy of the counters, safe to keep or serialize"""
+        with self._lock:
+            return {"files": {k: dict(v) for k, v in self.files.items()},
+                    "actions": {k: dict(v) for k, v in self.actions.items()}}
+
+    def report(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for title, rows in [("File", snapshot["files"]), ("Action", snapshot["actions"])]:
+            lines.append(f"\n{title:<40}{'runs':>6}{'wall ms':>10}{'loads':>7}{'hits':>7}{'saves':>7}"
+                         f"{'read KB':>10}{'written KB':>12}{'parse ms':>10}{'ser. ms':>9}{'I/O ms':>9}")
+            for name, s in sorted(rows.items(), key=lambda kv: -(kv[1]["load_seconds"] + kv[1]["save_seconds"])):
+                runs = f"{s['runs']:>6}{s['seconds'] * 1000:>10.1f}" if "runs" in s else f"{'-':>6}{'-':>10}"
+                lines.append(f"{name[:39]:<40}{runs}{s['loads']:>7}{s['cache_hits']:>7}{s['saves']:>7}"
+                             f"{s['bytes_read'] / 1024:>10.1f}{s['bytes_written'] / 1024:>12.1f}"
+                             f"{s['parse_seconds'] * 1000:>10.1f}{s['serialize_seconds'] * 1000:>9.1f}"
+                             f"{(s['load_seconds'] + s['save_seconds']) * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def print_report(self):
+        print("\n📈 Data I/O during this session")
+        print(self.report())
+
+    def install_session_report(self, destination: Optional[str] = None):
+        """Emit the report at exit when THESIS_IO_REPORT (or destination) is set"""
+        destination = destination or os.environ.get(REPORT_ENV)
+        if not destination:
+            return
+        if destination == "1":
+            atexit.register(self.print_report)
+        else:
+            atexit.register(self._write_report, destination)
+
+    def _write_report(self, path: str):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=2)
+        except OSError as e:
+            print(f"❌ Could not write I/O report: {e}", file=sys.stderr)
+
+
+io_stats = IOStats()
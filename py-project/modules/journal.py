@@ -0,0 +1,287 @@
+# journal.py
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+from repository import JsonRepository, collection_name, record_key, synchronized
+from instrumentation import io_stats
+from records import decode_record, encode_record
+
+JOURNALED_COLLECTIONS = ("thesis_requests", "defense_requests")
+
+
+class JournaledJsonRepository(JsonRepository):
+    """JSON repository that records request mutations in an append-only log.
+
+    For the journaled collections every upsert() appends one JSON line to
+    <name>.journal.jsonl next to the snapshot file instead of rewriting the
+    whole snapshot. Loading replays the journal on top of the snapshot, and
+    only the newly appended bytes are read when the journal grows. compact()
+    folds the journal back into the snapshot; it also runs automatically once
+    the journal holds compact_threshold entries. Appends and compaction take
+    the same per-file commit lock, so no entry is lost while folding.
+
+    Removals (remove_many(), archiving) and whole-collection saves are
+    journaled as well: deleted keys get {"op": "delete"} lines and the
+    journal is folded right away, so a crash at any point replays to either
+    the old or the new collection.
+    """
+
+    def __init__(self, journaled=JOURNALED_COLLECTIONS, compact_threshold: int = 1000):
+        super().__init__()
+        self.journaled = set(journaled)
+        self.compact_threshold = compact_threshold
+        # path -> replay state of the snapshot + journal
+        self._journal_state: Dict[str, dict] = {}
+
+    @staticmethod
+    def journal_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".journal.jsonl"
+
+    def _is_journaled(self, path: str) -> bool:
+        return collection_name(path) in self.journaled
+
+    # ----------------- خواندن -----------------
+    @synchronized
+    def load(self, path: str, strict: bool = False) -> List[dict]:
+        if not self._is_journaled(path):
+            return super().load(path, strict)
+
+        key = os.path.abspath(path)
+        state = self._journal_state.get(key)
+        snapshot_sig = self._signature(path)
+        journal_sig = self._signature(self.journal_path(path))
+        if (state is None or state["snapshot"] != snapshot_sig
+                or self._signature(self.journal_path(path) + ".compacting") is not None
+                or (journal_sig is None and state["offset"] > 0)
+                or (journal_sig is not None and (journal_sig[2] != state["inode"]
+                                                 or journal_sig[1] < state["offset"]))):
+            state = self._full_replay(path, strict)
+            self._journal_state[key] = state
+        elif journal_sig is not None and journal_sig[1] > state["offset"]:
+            self._replay(path, self.journal_path(path), state, state["offset"], shared=True)
+        else:
+            io_stats.record_cache_hit(path)
+        return state["records"]
+
+    def _full_replay(self, path: str, strict: bool) -> dict:
+        super().invalidate(path)
+        snapshot = super().load(path, strict)
+        state = {
+            "snapshot": self._signature(path),
+            "records": list(snapshot),
+            "index": {},
+            "offset": 0,
+            "inode": None,
+            "entries": 0,
+        }
+        key_field = record_key(path)
+        state["index"] = {r.get(key_field): i for i, r in enumerate(state["records"])}
+
+        # ادامه‌ی فشرده‌سازی نیمه‌کاره
+        leftover = self.journal_path(path) + ".compacting"
+        if os.path.exists(leftover):
+            self._replay(path, leftover, state, 0, track=False)
+
+        journal = self.journal_path(path)
+        journal_sig = self._signature(journal)
+        if journal_sig is not None:
+            state["inode"] = journal_sig[2]
+            self._replay(path, journal, state, 0)
+        return state
+
+    def _replay(self, path: str, journal: str, state: dict, offset: int, track: bool = True,
+                shared: bool = False):
+        """Apply the complete journal lines found after offset.
+
+        With track unset the journal is replayed without moving the read
+        offset (used for a leftover .compacting file). With shared set the
+        records list has been handed out already; a line that replaces or
+        deletes one of its records then starts a new list, so callers holding
+        the old one see the change the same way as after a reload of a JSON
+        file.
+        """
+        start = time.perf_counter()
+        try:
+            with open(journal, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        parse_start = time.perf_counter()
+        end = data.rfind(b"\n") + 1
+        key_field, collection = record_key(path), collection_name(path)
+        records, index = state["records"], state["index"]
+        deleted = False
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            op = entry.get("op")
+            if op == "put":
+                record = decode_record(collection, entry["record"])
+                key = record.get(key_field)
+            elif op == "delete":
+                record, key = None, entry.get("key")
+            else:
+                continue
+            state["entries"] += 1
+            position = index.get(key)
+            if position is not None and shared:
+                records = state["records"] = list(records)
+                shared = False
+            if record is None:
+                # جای رکورد حذف‌شده تا آخر خواندن خالی می‌ماند تا موقعیت بقیه عوض نشود
+                if position is not None:
+                    records[position] = None
+                    del index[key]
+                    deleted = True
+            elif position is None:
+                index[key] = len(records)
+                records.append(record)
+            else:
+                records[position] = record
+        if deleted:
+            records = state["records"] = [r for r in records if r is not None]
+            state["index"] = {r.get(key_field): i for i, r in enumerate(records)}
+        finished = time.perf_counter()
+        io_stats.record_load(journal, finished - start, len(data), finished - parse_start)
+        if track:
+            state["offset"] = offset + end
+            sig = self._signature(journal)
+            state["inode"] = sig[2] if sig else None
+
+    # ----------------- نوشتن -----------------
+    def _append(self, path: str, entries: List[dict]) -> int:
+        journal = self.journal_path(path)
+        directory = os.path.dirname(journal)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        line = "".join(json.dumps(entry, ensure_ascii=False, default=encode_record) + "\n" for entry in entries).encode('utf-8')
+        serialized = time.perf_counter()
+        # یک write روی فایل O_APPEND تا خطوط دو پروسه در هم نروند
+        fd = os.open(journal, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        io_stats.record_save(journal, time.perf_counter() - start, len(line), serialized - start)
+        return len(line)
+
+    def _find_index(self, path: str, records: List[dict], key) -> Optional[int]:
+        if not self._is_journaled(path):
+            return super()._find_index(path, records, key)
+        return self._journal_state[os.path.abspath(path)]["index"].get(key)
+
+    def _cached_records(self, path: str) -> List[dict]:
+        if not self._is_journaled(path):
+            return super()._cached_records(path)
+        state = self._journal_state.get(os.path.abspath(path))
+        return state["records"] if state is not None else []
+
+    def _store_records(self, path: str, records: List[dict], items):
+        if not self._is_journaled(path):
+            return super()._store_records(path, records, items)
+        written = self._append(path, [{"op": "put", "record": record} for _, record in items])
+        state = self._journal_state.get(os.path.abspath(path))
+        journal_sig = self._signature(self.journal_path(path))
+        if state is None or state["records"] is not records or journal_sig is None \
+                or journal_sig[1] != state["offset"] + written:
+            self.load(path)  # اعمال خطوط جدید روی حافظه
+            return
+        # زیر قفل فایل همه‌ی خطوط تازه مال همین جلسه است؛ در جا اعمال می‌شوند
+        key_field = record_key(path)
+        for index, record in items:
+            if index is None:
+                state["index"][record.get(key_field)] = len(records)
+                records.append(record)
+            else:
+                records[index] = record
+            state["entries"] += 1
+        state["offset"] += written
+        state["inode"] = journal_sig[2]
+
+    def upsert(self, path: str, record: dict):
+        super().upsert(path, record)
+        self._maybe_compact(path)
+
+    def compare_and_swap(self, path: str, record: dict, expected_version: int) -> bool:
+        stored = super().compare_and_swap(path, record, expected_version)
+        self._maybe_compact(path)
+        return stored
+
+    def insert_many(self, path: str, records: List[dict]) -> List[dict]:
+        added = super().insert_many(path, records)
+        self._maybe_compact(path)
+        return added
+
+    def update_many(self, path: str, mutations):
+        changed = super().update_many(path, mutations)
+        self._maybe_compact(path)
+        return changed
+
+    def _write_all(self, path: str, records: List[dict]):
+        if not self._is_journaled(path):
+            return super()._write_all(path, records)
+        # تفاوت با حالت فعلی اول در ژورنال می‌رود، بعد مثل compact() تا می‌شود
+        key_field = record_key(path)
+        current = self._cached_records(path)
+        keys = {r.get(key_field) for r in records}
+        unchanged = {id(r) for r in current}
+        entries = [{"op": "delete", "key": r.get(key_field)} for r in current if r.get(key_field) not in keys]
+        entries += [{"op": "put", "record": r} for r in records if id(r) not in unchanged]
+        if entries:
+            self._append(path, entries)
+        self._fold(path)
+
+    def _maybe_compact(self, path: str):
+        state = self._journal_state.get(os.path.abspath(path))
+        if state is not None and state["entries"] >= self.compact_threshold:
+            self.compact(path)
+
+    @synchronized
+    def compact(self, path: str) -> int:
+        """Fold the journal of path into its snapshot; returns entries folded"""
+        if not self._is_journaled(path):
+            return 0
+        with self._commit_lock(path):
+            return self._fold(path)
+
+    def _fold(self, path: str) -> int:
+        """compact() with the commit lock of path already held"""
+        journal = self.journal_path(path)
+        compacting = journal + ".compacting"
+        if not os.path.exists(compacting):
+            try:
+                os.replace(journal, compacting)
+            except FileNotFoundError:
+                return 0
+
+        state = self._full_replay(path, strict=False)
+        self._atomic_write(path, state["records"])
+        os.remove(compacting)
+        self._journal_state.pop(os.path.abspath(path), None)
+        return state["entries"]
+
+    @synchronized
+    def invalidate(self, path: str = None):
+        super().invalidate(path)
+        if path is None:
+            self._journal_state.clear()
+        else:
+            self._journal_state.pop(os.path.abspath(path), None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold request journals back into their snapshots")
+    parser.add_argument("--data-dir", default="data", help="directory holding the JSON files")
+    args = parser.parse_args()
+    repo = JournaledJsonRepository()
+    for name in JOURNALED_COLLECTIONS:
+        path = os.path.join(args.data_dir, f"{name}.json")
+        print(f"🗜️ {name}: {repo.compact(path)} journal entries compacted")
@@ -3,6 +3,11 @@ from user import User, UserType
 import os
 import json
 from reviewer import ReviewerSystem
+from capacity import capacity_counters
+from final_grades import final_grades, FINAL_GRADES_FILE
+from repository import repository
+from instrumentation import io_stats
+from profiling import menu_action
 
 def initialize_data_files():
     """Create necessary data files if they don't exist"""
@@ -28,6 +33,12 @@ def initialize_data_files():
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump([], f, ensure_ascii=False, indent=2)
 
+    # شمارنده‌های ظرفیت و نمره‌های نهایی داده‌ی قدیمی یک بار از روی درخواست‌ها ساخته می‌شوند
+    if not repository.load(capacity_counters._counters_file):
+        capacity_counters.rebuild()
+    if not repository.load(FINAL_GRADES_FILE):
+        final_grades.rebuild()
+
 def show_main_menu():
     print("\n🎓 Thesis Management System")
     print("=" * 40)
@@ -56,7 +67,9 @@ def student_professor_login():
     user_id = input("User ID: ")
     password = input("Password: ")
     
-    result = User.login(user_id, password)
+    # فقط بررسی رمز اندازه گرفته می‌شود؛ جلسه‌ی بعد از ورود منوهای خودش را دارد
+    with menu_action("main", student_professor_login, "anonymous"):
+        result = User.login(user_id, password)
     
     if result:
         user_type, user_id = result
@@ -84,7 +97,8 @@ def reviewer_login():
     user_id = input("Reviewer ID: ")
     password = input("Password: ")
     
-    result = User.login(user_id, password)
+    with menu_action("main", reviewer_login, "anonymous"):
+        result = User.login(user_id, password)
     
     if result:
         user_type, user_id = result
@@ -167,6 +181,7 @@ def register_guest_reviewer():
 
 def main():
     initialize_data_files()
+    io_stats.install_session_report()
     
     while True:
         show_main_menu()
@@ -1,10 +1,16 @@
 # professor.py
 from user import User, UserType
-from student import RequestStatus, DefenseStatus
-import json
-import os
+from records import RequestStatus, DefenseStatus
+from repository import repository, ConflictError
+from capacity import capacity_counters
+from reservations import SEAT_RETURNED_FIELD, seat_reservations
+from final_grades import final_grades
+from reviewer_recommender import reviewer_recommender
+from defense_schedule import defense_schedule, parse_slot, ScheduleConflict, SLOT_FORMAT
+from profiling import menu_action
+from grading import GRADE_LABELS, submit_grades, batch_grade_menu
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, Dict, List, Optional
 
 class ProfessorSystem(User):
     _thesis_requests_file = "data/thesis_requests.json"
@@ -14,9 +20,8 @@ class ProfessorSystem(User):
     _max_guidance_capacity = 5
     _max_review_capacity = 10
 
-    def __init__(self, user_id: str):
-        users = self._load_users(UserType.PROFESSOR)
-        user_data = next((user for user in users if user["user_id"] == user_id), None)
+    def __init__(self, user_id: str, verbose: bool = True):
+        user_data = self._users_directory().get(UserType.PROFESSOR, user_id)
         
         if user_data:
             super().__init__(
@@ -27,7 +32,8 @@ class ProfessorSystem(User):
                 national_id=user_data.get("national_id"),
                 major=user_data.get("major")
             )
-            print(f"👨‍🏫 Professor System initialized for: {self.name}")
+            if verbose:
+                print(f"👨‍🏫 Professor System initialized for: {self.name}")
         else:
             raise ValueError(f"Professor with ID {user_id} not found")
     
@@ -42,24 +48,25 @@ class ProfessorSystem(User):
             print("3. Check Guidance Capacity")
             print("4. Check Review Capacity")
             print("5. Grade Defense Sessions")
-            print("6. Change Password")
-            print("7. Logout")
+            print("6. Batch Grade Defense Sessions")
+            print("7. Change Password")
+            print("8. Logout")
             
             choice = input("\nSelect option: ")
+            actions = {
+                "1": self.manage_thesis_requests,
+                "2": self.manage_defense_requests,
+                "3": self.check_guidance_capacity,
+                "4": self.check_review_capacity,
+                "5": self.grade_defense_sessions,
+                "6": self.batch_grade_sessions,
+                "7": self.change_password_menu
+            }
             
-            if choice == "1":
-                self.manage_thesis_requests()
-            elif choice == "2":
-                self.manage_defense_requests()
-            elif choice == "3":
-                self.check_guidance_capacity()
-            elif choice == "4":
-                self.check_review_capacity()
-            elif choice == "5":
-                self.grade_defense_sessions()
-            elif choice == "6":
-                self.change_password_menu()
-            elif choice == "7":
+            if choice in actions:
+                with menu_action("professor", actions[choice], self.user_type.value):
+                    actions[choice]()
+            elif choice == "8":
                 print("👋 Logging out...")
                 break
             else:
@@ -69,6 +76,7 @@ class ProfessorSystem(User):
         print(f"\n📋 Thesis Requests Management for Professor {self.name}")
         print("=" * 70)
         
+        seat_reservations.expire()
         thesis_requests = self._load_thesis_requests()
         pending_requests = [r for r in thesis_requests if r.get("professor") == self.name and r.get("status") == RequestStatus.PENDING.value]
         approved_requests = [r for r in thesis_requests if r.get("professor") == self.name and r.get("status") == RequestStatus.APPROVED.value]
@@ -120,25 +128,31 @@ class ProfessorSystem(User):
         
         choice = input("\nSelect action: ")
         
-        thesis_requests = self._load_thesis_requests()
-        
-        for req in thesis_requests:
-            if req.get("request_id") == request.get("request_id"):
-                if choice == "1":
-                    req["status"] = RequestStatus.APPROVED.value
-                    req["approval_date"] = datetime.now().isoformat()
-                    req["professor_id"] = self.user_id
-                    print("✅ Thesis request approved!")
-                elif choice == "2":
-                    req["status"] = RequestStatus.REJECTED.value
-                    req["rejection_date"] = datetime.now().isoformat()
-                    print("❌ Thesis request rejected!")
-                else:
-                    print("🚫 Action cancelled")
-                    return
-                break
+        if choice not in ["1", "2"]:
+            print("🚫 Action cancelled")
+            return
         
-        self._save_thesis_requests(thesis_requests)
+        if not self.decide_thesis_request(request["request_id"], approve=(choice == "1")):
+            print("❌ This request has already been handled in another session")
+            return
+        print("✅ Thesis request approved!" if choice == "1" else "❌ Thesis request rejected!")
+
+    def decide_thesis_request(self, request_id: str, approve: bool) -> bool:
+        """Approve or reject a pending thesis request; False if it is no longer pending"""
+        if approve:
+            changes = {
+                "status": RequestStatus.APPROVED.value,
+                "approval_date": datetime.now().isoformat(),
+                "professor_id": self.user_id
+            }
+        else:
+            changes = {
+                "status": RequestStatus.REJECTED.value,
+                "rejection_date": datetime.now().isoformat(),
+                SEAT_RETURNED_FIELD: False
+            }
+        return self._update_request(self._thesis_requests_file, request_id,
+                                    RequestStatus.PENDING.value, changes)
 
     def manage_defense_requests(self):
         print(f"\n🎓 Defense Requests Management for Professor {self.name}")
@@ -189,129 +203,174 @@ class ProfessorSystem(User):
         
         choice = input("\nSelect action: ")
         
-        defense_requests = self._load_defense_requests()
+        rejection_reason = ""
+        if choice == "2":
+            rejection_reason = input("Rejection reason: ")
+        elif choice == "3":
+            self._show_defense_details(request)
+            return
+        elif choice != "1":
+            print("🚫 Action cancelled")
+            return
         
-        for req in defense_requests:
-            if req.get("defense_id") == request.get("defense_id"):
-                if choice == "1":
-                    req["status"] = DefenseStatus.APPROVED.value
-                    req["approval_date"] = datetime.now().isoformat()
-                    req["approved_by"] = self.user_id
-                    print("✅ Defense request approved!")
-                    print("📅 Now you need to set defense date and select reviewers")
-                    self._set_defense_details(req)
-                elif choice == "2":
-                    req["status"] = DefenseStatus.REJECTED.value
-                    req["rejection_date"] = datetime.now().isoformat()
-                    req["rejected_by"] = self.user_id
-                    rejection_reason = input("Rejection reason: ")
-                    req["rejection_reason"] = rejection_reason
-                    print("❌ Defense request rejected!")
-                elif choice == "3":
-                    self._show_defense_details(req)
-                    return
-                else:
-                    print("🚫 Action cancelled")
-                    return
-                break
+        if not self.decide_defense_request(request["defense_id"], choice == "1", rejection_reason):
+            print("❌ This defense request has already been handled in another session")
+            return
         
-        self._save_defense_requests(defense_requests)
+        if choice == "1":
+            print("✅ Defense request approved!")
+            print("📅 Now you need to set defense date and select reviewers")
+            self._set_defense_details(request)
+        else:
+            print("❌ Defense request rejected!")
+
+    def decide_defense_request(self, defense_id: str, approve: bool, rejection_reason: str = "") -> bool:
+        """Approve or reject a defense under review; False if it was already handled"""
+        if approve:
+            changes = {
+                "status": DefenseStatus.APPROVED.value,
+                "approval_date": datetime.now().isoformat(),
+                "approved_by": self.user_id
+            }
+        else:
+            changes = {
+                "status": DefenseStatus.REJECTED.value,
+                "rejection_date": datetime.now().isoformat(),
+                "rejected_by": self.user_id,
+                "rejection_reason": rejection_reason
+            }
+        return self._update_request(self._defense_requests_file, defense_id,
+                                    DefenseStatus.UNDER_REVIEW.value, changes)
+
+    def store_defense_details(self, defense_id: str, defense_date: str, defense_location: str,
+                              professor: Dict, guest: Dict) -> bool:
+        """Save date, location and the chosen internal/external reviewers of a defense.
+
+        Raises ValueError for a malformed date and ScheduleConflict when the
+        room or one of the reviewers is already booked at that time.
+        """
+        start = parse_slot(defense_date)
+        reviewer_ids = [professor["user_id"], guest.get("user_id")]
+        internal_reviewer = {
+            "id": professor["user_id"],
+            "name": professor["name"]
+        }
+        external_reviewer = {
+            "id": guest.get("user_id"),
+            "name": guest.get("name"),
+            "affiliation": guest.get("affiliation", ""),
+            "email": guest.get("email", "")
+        }
+        details = {
+            "defense_date": start.strftime(SLOT_FORMAT),
+            "defense_location": defense_location,
+            "internal_reviewer": internal_reviewer,
+            "external_reviewer": external_reviewer,
+            "internal_reviewer_id": internal_reviewer["id"],
+            "external_reviewer_id": external_reviewer["id"],
+            "defense_setup_date": datetime.now().isoformat()
+        }
+        # تداخل زیر قفل فایل بررسی می‌شود تا دو جلسه‌ی همزمان یک نوبت را نگیرند
+        return self._update_request(
+            self._defense_requests_file, defense_id, None, details,
+            validate=lambda record: defense_schedule.check(defense_id, defense_date, defense_location, reviewer_ids))
 
     def _set_defense_details(self, request: Dict):
         """Set defense date and reviewers with full details"""
         print(f"\n📅 Setting Defense Details for: {request['thesis_title']}")
     
         defense_date = input("Defense date (YYYY-MM-DD HH:MM): ")
+        try:
+            parse_slot(defense_date)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
         defense_location = input("Defense location: ")
 
-        # انتخاب داور داخلی (از لیست اساتید)
+        # انتخاب داور داخلی (از لیست اساتید)، نزدیک‌ترین موضوع اول
         professors = User._load_users(UserType.PROFESSOR)
         if not professors:
             print("❌ No professors found in the system!")
             return
+        ranked_professors = reviewer_recommender.recommend(request, professors, self._max_review_capacity)
+        if not ranked_professors:
+            print("❌ No professor has free review capacity!")
+            return
 
-        print("\n👥 Internal reviewers (اساتید داخلی):")
-        for i, prof in enumerate(professors, 1):
-            print(f"{i}. {prof['name']} ({prof['user_id']})")
+        print("\n👥 Internal reviewers (اساتید داخلی), best topic match first:")
+        for i, r in enumerate(ranked_professors, 1):
+            prof = r["reviewer"]
+            print(f"{i}. {prof['name']} ({prof['user_id']}) - match {r['score']:.0%} "
+                  f"- Reviews: {r['reviews']}/{self._max_review_capacity}")
 
         try:
             internal_choice = int(input("Select internal reviewer number: ")) - 1
-            if internal_choice < 0 or internal_choice >= len(professors):
+            if internal_choice < 0 or internal_choice >= len(ranked_professors):
                 print("❌ Invalid selection!")
                 return
-            internal_reviewer = {
-                "id": professors[internal_choice]["user_id"],
-                "name": professors[internal_choice]["name"]
-            }
-
-            request["internal_reviewer_id"] = internal_reviewer["id"]
-            request["internal_reviewer"] = internal_reviewer["name"]
+            chosen_professor = ranked_professors[internal_choice]["reviewer"]
         except ValueError:
             print("❌ Please enter a valid number!")
             return
 
         # انتخاب داور خارجی (از guest_reviewers.json به صورت مستقیم)
-        guest_reviewers = []
-        try:
-            with open(self._guest_reviewers_file, 'r', encoding='utf-8') as gf:
-                guest_reviewers = json.load(gf)
-        except (FileNotFoundError, json.JSONDecodeError):
-            guest_reviewers = []
+        guest_reviewers = repository.load(self._guest_reviewers_file)
 
         if not guest_reviewers:
             print("❌ No guest reviewers available!")
             return
+        ranked_guests = reviewer_recommender.recommend(request, guest_reviewers, self._max_review_capacity)
+        if not ranked_guests:
+            print("❌ No guest reviewer has free review capacity!")
+            return
 
-        print("\n🌍 External reviewers:")
-        for i, guest in enumerate(guest_reviewers, 1):
-            print(f"{i}. {guest.get('name','-')} - {guest.get('affiliation','')} ({guest.get('user_id','-')})")
+        print("\n🌍 External reviewers, best topic match first:")
+        for i, r in enumerate(ranked_guests, 1):
+            guest = r["reviewer"]
+            print(f"{i}. {guest.get('name','-')} - {guest.get('affiliation','')} ({guest.get('user_id','-')}) "
+                  f"- match {r['score']:.0%}")
 
         try:
             external_choice = int(input("Select external reviewer number: ")) - 1
-            if external_choice < 0 or external_choice >= len(guest_reviewers):
+            if external_choice < 0 or external_choice >= len(ranked_guests):
                 print("❌ Invalid selection!")
                 return
-            chosen_guest = guest_reviewers[external_choice]
-            external_reviewer = {
-                "id": chosen_guest.get("user_id"),
-                "name": chosen_guest.get("name"),
-                "affiliation": chosen_guest.get("affiliation", ""),
-                "email": chosen_guest.get("email", "")
-            }
-
-            request["external_reviewer_id"] = external_reviewer["id"]
-            request["external_reviewer"] = external_reviewer["name"]
+            chosen_guest = ranked_guests[external_choice]["reviewer"]
         except ValueError:
             print("❌ Please enter a valid number!")
             return
 
         # ذخیره اطلاعات در درخواست مربوطه
-        defense_requests = self._load_defense_requests()
-        found = False
-        for req in defense_requests:
-            if req.get("defense_id") == request.get("defense_id"):
-                req.update({
-                    "defense_date": defense_date,
-                    "defense_location": defense_location,
-                    "internal_reviewer": internal_reviewer,
-                    "external_reviewer": external_reviewer,
-                    "internal_reviewer_id": internal_reviewer["id"],
-                    "external_reviewer_id": external_reviewer["id"],
-                    "defense_setup_date": datetime.now().isoformat()
-                })
-                found = True
-                break
-                
-        if not found:
-            print("❌ ERROR: Could not find matching defense request!")
-            return
-
         try:
-            self._save_defense_requests(defense_requests)
-            print("✅ Defense details set successfully!")
+            try:
+                stored = self.store_defense_details(request["defense_id"], defense_date, defense_location,
+                                                    chosen_professor, chosen_guest)
+            except ScheduleConflict as e:
+                print(f"❌ {e}")
+                if e.suggestion is None:
+                    return
+                suggestion = e.suggestion.strftime(SLOT_FORMAT)
+                if input(f"Book {suggestion} instead? (y/n): ").strip().lower() != "y":
+                    print("🚫 Defense details were not saved")
+                    return
+                stored = self.store_defense_details(request["defense_id"], suggestion, defense_location,
+                                                    chosen_professor, chosen_guest)
+            if stored:
+                print("✅ Defense details set successfully!")
+            else:
+                print("❌ ERROR: Could not find matching defense request!")
         except Exception as e:
             print(f"❌ ERROR saving defense requests: {e}")
 
+    @staticmethod
+    def _file_info(request: Dict, prefix: str) -> str:
+        size = request.get(f"{prefix}_size")
+        if size is None:
+            return ""
+        pages = request.get(f"{prefix}_pages")
+        shown = f"{size / (1024 * 1024):.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+        return f" ({shown}" + (f", {pages} pages)" if pages else ")")
+
     def _show_defense_details(self, request: Dict):
         print(f"\n📋 Defense Request Details:")
         print("=" * 50)
@@ -320,8 +379,10 @@ class ProfessorSystem(User):
         print(f"Thesis Title: {request.get('thesis_title')}")
         print(f"Abstract: {request.get('abstract')}")
         print(f"Keywords: {', '.join(request.get('keywords',[]))}")
-        print(f"PDF File: {request.get('pdf_path')}")
-        print(f"First Page: {request.get('first_page_path')}")
+        print(f"PDF File: {request.get('pdf_path')}{self._file_info(request, 'pdf')}")
+        print(f"First Page: {request.get('first_page_path')}{self._file_info(request, 'first_page')}")
+        if not request.get("upload_validation"):
+            print("⚠️ Files of this request were uploaded before validation was added")
         print(f"Status: {request.get('status')}")
         print(f"Request Date: {request.get('request_date')}")
 
@@ -371,19 +432,10 @@ class ProfessorSystem(User):
         print(f"Maximum capacity: {self._max_review_capacity}")
     
     def _get_current_guidance_count(self) -> int:
-        thesis_requests = self._load_thesis_requests()
-        guided_students = [r for r in thesis_requests 
-                          if r.get("professor_id") == self.user_id 
-                          and r.get("status") == RequestStatus.APPROVED.value]
-        return len(guided_students)
+        return capacity_counters.guidance_count(self.user_id)
     
     def _get_current_review_count(self) -> int:
-        defense_requests = self._load_defense_requests()
-        cnt = 0
-        for d in defense_requests:
-            if (d.get("internal_reviewer_id") == self.user_id) or (d.get("external_reviewer_id") == self.user_id):
-                cnt += 1
-        return cnt
+        return capacity_counters.review_count(self.user_id)
     
     def change_password_menu(self):
         print("\n🔄 Change Password")
@@ -395,41 +447,46 @@ class ProfessorSystem(User):
     
     # File management methods
     def _load_thesis_requests(self):
-        try:
-            with open(self._thesis_requests_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-    
-    def _save_thesis_requests(self, requests):
-        os.makedirs(os.path.dirname(self._thesis_requests_file), exist_ok=True)
-        with open(self._thesis_requests_file, 'w', encoding='utf-8') as f:
-            json.dump(requests, f, ensure_ascii=False, indent=2)
+        return repository.load(self._thesis_requests_file)
     
     def _load_defense_requests(self):
+        return repository.load(self._defense_requests_file)
+
+    def _update_request(self, path: str, key, expected_status, changes: Dict,
+                        validate: Optional[Callable[[Dict], None]] = None) -> bool:
+        """Apply changes to one request if it still has expected_status.
+
+        The change is made under the repository's commit lock, so validate,
+        when given, sees every other request as stored and may raise to
+        refuse it.
+        """
+        def apply(record):
+            if expected_status is not None and record.get("status") != expected_status:
+                return False
+            if validate is not None:
+                validate(record)
+            record.update(changes)
+
         try:
-            with open(self._defense_requests_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-    
-    def _save_defense_requests(self, requests):
-        os.makedirs(os.path.dirname(self._defense_requests_file), exist_ok=True)
-        with open(self._defense_requests_file, 'w', encoding='utf-8') as f:
-            json.dump(requests, f, ensure_ascii=False, indent=2)
+            changed = repository.update_many(path, {key: apply})
+        except ConflictError as e:
+            print(f"❌ {e}")
+            return False
+        if key not in changed:
+            return False
+        before, after = changed[key]
+        capacity_counters.record_change(path, before, after)
+        defense_schedule.record_change(path, before, after)
+        # صندلی درخواست ردشده به صف انتظار یا ظرفیت درس برمی‌گردد
+        seat_reservations.record_change(path, before, after)
+        final_grades.record_change(path, before, after)
+        return True
 
     def grade_defense_sessions(self):
         print(f"\n🎯 Grade Defense Sessions - Internal Reviewer {self.name}")
         print("=" * 60)
 
-        defense_requests = self._load_defense_requests()
-        my_sessions = []
-
-        for defense in defense_requests:
-            if (defense.get("internal_reviewer_id") == self.user_id or 
-                (defense.get("internal_reviewer") and 
-                 defense["internal_reviewer"].get("id") == self.user_id)):
-                my_sessions.append(defense)
+        my_sessions = self._internal_review_sessions()
 
         if not my_sessions:
             print("❌ No defense sessions assigned to you as internal reviewer")
@@ -453,6 +510,15 @@ class ProfessorSystem(User):
         except ValueError:
             print("❌ Please enter a valid number")
     
+    def _internal_review_sessions(self) -> List[Dict]:
+        return repository.find(self._defense_requests_file, internal_reviewer_id=self.user_id)
+
+    def batch_grade_sessions(self):
+        try:
+            batch_grade_menu(self._internal_review_sessions(), self.user_id, "internal", self.name)
+        except ConflictError as e:
+            print(f"❌ {e}, please try again")
+
     def _grade_session(self, session: Dict):
         print(f"\n📊 Grading: {session.get('thesis_title')}")
         print(f"Student: {session.get('student_name')}")
@@ -463,7 +529,7 @@ class ProfessorSystem(User):
             print(f"Keywords: {', '.join(session['keywords'])}")
 
         # انتخاب برچسب نمره
-        labels = ["A", "B", "C", "F"]
+        labels = GRADE_LABELS
         print("\nSelect grade label:")
         for i, lab in enumerate(labels, 1):
             print(f"{i}. {lab}")
@@ -481,21 +547,16 @@ class ProfessorSystem(User):
 
         comments = input("Comments (optional): ")
 
-        defense_requests = self._load_defense_requests()
-        for defense in defense_requests:
-            if defense.get("defense_id") == session.get("defense_id"):
-                if "grades" not in defense:
-                    defense["grades"] = {}
-                defense["grades"][self.user_id] = {
-                    "label": label,
-                    "comments": comments,
-                    "grading_date": datetime.now().isoformat(),
-                    "reviewer_type": "internal",
-                    "reviewer_name": self.name
-                }
-                break
-
-        self._save_defense_requests(defense_requests)
+        entry = {"defense_id": session.get("defense_id"), "label": label, "comments": comments}
+        try:
+            saved, errors = submit_grades([entry], [session.get("defense_id")], self.user_id,
+                                          "internal", self.name)
+        except ConflictError as e:
+            print(f"❌ {e}, please try again")
+            return
+        if not saved:
+            print(f"❌ {errors[0] if errors else 'Grade could not be saved'}")
+            return
         print("✅ Grade submitted successfully!")
 
     def view_assigned_reviews(self):
@@ -0,0 +1,180 @@
+# profiling.py
+import argparse
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from instrumentation import io_stats
+
+# THESIS_PROFILE=1 profiles every menu action, 0.05 about one run in twenty;
+# the .pstats files go to THESIS_PROFILE_DIR (default: profiles/)
+PROFILE_ENV = "THESIS_PROFILE"
+PROFILE_DIR_ENV = "THESIS_PROFILE_DIR"
+DEFAULT_DIR = "profiles"
+SEPARATOR = "__"
+
+
+def _rate_from_env() -> float:
+    value = os.environ.get(PROFILE_ENV, "")
+    try:
+        return min(1.0, max(0.0, float(value))) if value else 0.0
+    except ValueError:
+        print(f"⚠️ Ignoring {PROFILE_ENV}={value!r}: expected a sampling rate between 0 and 1", file=sys.stderr)
+        return 0.0
+
+
+class ActionProfiler:
+    """Runs a sampled fraction of menu actions under cProfile.
+
+    Each sampled run is dumped to <directory>/<user type>__<action>__<stamp>.pstats.
+    Actions may nest; while an inner action is profiled the outer profiler
+    is paused, so every file only holds the time spent in its own action.
+    """
+
+    def __init__(self, rate: Optional[float] = None, directory: Optional[str] = None, seed: Optional[int] = None):
+        self.rate = _rate_from_env() if rate is None else rate
+        self.directory = directory or os.environ.get(PROFILE_DIR_ENV) or DEFAULT_DIR
+        self._random = random.Random(seed)
+        self._counter = itertools.count(1)
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _sampled(self) -> bool:
+        return self.rate >= 1 or self._random.random() < self.rate
+
+    def dump_path(self, user_type: str, action: str) -> str:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{user_type}{SEPARATOR}{action}{SEPARATOR}{stamp}-{os.getpid()}-{next(self._counter)}.pstats"
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def profile(self, user_type: str, action: str):
+        """Profile the block if this run is sampled; a no-op when disabled"""
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stack()
+        outer = stack[-1] if stack else None
+        profile = cProfile.Profile() if self._sampled() else None
+        if outer is not None:
+            outer.disable()
+        stack.append(profile)
+        try:
+            if profile is not None:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+        finally:
+            stack.pop()
+            if profile is not None:
+                self._dump(profile, user_type, action)
+            if outer is not None:
+                outer.enable()
+
+    def _dump(self, profile: cProfile.Profile, user_type: str, action: str):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(self.dump_path(user_type, action))
+        except OSError as e:
+            print(f"❌ Could not write profile for {action}: {e}", file=sys.stderr)
+
+
+profiler = ActionProfiler()
+
+
+@contextmanager
+def menu_action(menu: str, action: Callable, user_type: str):
+    """Wrap one menu dispatch: I/O accounting plus (sampled) profiling"""
+    name = f"{menu}.{action.__name__}"
+    with io_stats.action(name), profiler.profile(user_type, name):
+        yield
+
+
+# ----------------- گزارش -----------------
+def _parse_name(filename: str) -> Optional[tuple]:
+    if not filename.endswith(".pstats"):
+        return None
+    parts = filename[:-len(".pstats")].split(SEPARATOR)
+    return (parts[0], parts[1]) if len(parts) == 3 else None
+
+
+def collect(directory: str = DEFAULT_DIR, action: Optional[str] = None,
+            user_type: Optional[str] = None) -> Dict[tuple, List[str]]:
+    """(user type, action) -> dump files, filtered by either part"""
+    groups: Dict[tuple, List[str]] = {}
+    for filename in sorted(os.listdir(directory)):
+        parsed = _parse_name(filename)
+        if parsed is None:
+            continue
+        if (user_type and parsed[0] != user_type) or (action and parsed[1] != action):
+            continue
+        groups.setdefault(parsed, []).append(os.path.join(directory, filename))
+    return groups
+
+
+def _print_top(stats: pstats.Stats, sort: str, top: int):
+    stats.files = []  # بدون فهرست طولانی فایل‌های ادغام‌شده
+    stats.sort_stats(sort).print_stats(top)
+
+
+def hotspot_report(directory: str = DEFAULT_DIR, top: int = 20, sort: str = "cumulative",
+                   action: Optional[str] = None, user_type: Optional[str] = None) -> str:
+    """Merge the matching dumps and list the top functions overall and per action"""
+    groups = collect(directory, action, user_type)
+    if not groups:
+        return f"No profiles found in {directory}"
+
+    out = io.StringIO()
+    out.write(f"{'User type':<18}{'Action':<45}{'runs':>6}{'total s':>10}\n")
+    per_group, merged = {}, pstats.Stats(stream=out)
+    for (group_user_type, group_action), paths in sorted(groups.items()):
+        stats = per_group[group_user_type, group_action] = pstats.Stats(*paths, stream=out).strip_dirs()
+        out.write(f"{group_user_type:<18}{group_action:<45}{len(paths):>6}{stats.total_tt:>10.3f}\n")
+        merged.add(stats)
+
+    out.write(f"\n🔥 Top {top} functions (sorted by {sort}) across {sum(map(len, groups.values()))} profiles\n")
+    _print_top(merged, sort, top)
+    if len(per_group) > 1:
+        for (group_user_type, group_action), stats in per_group.items():
+            out.write(f"\n🔎 {group_user_type} / {group_action}\n")
+            _print_top(stats, sort, min(top, 10))
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-action .pstats dumps into a hotspot report")
+    parser.add_argument("directory", nargs="?", default=os.environ.get(PROFILE_DIR_ENV) or DEFAULT_DIR)
+    parser.add_argument("--top", type=int, default=20, help="functions to list")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, ncalls, ...)")
+    parser.add_argument("--action", help="only this action, e.g. professor.manage_defense_requests")
+    parser.add_argument("--user-type", help="only this user type, e.g. professor")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"❌ Directory not found: {args.directory}")
+        sys.exit(1)
+    print(hotspot_report(args.directory, args.top, args.sort, args.action, args.user_type))
+
+
+if __name__ == "__main__":
+    main()
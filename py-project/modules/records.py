@@ -0,0 +1,292 @@
+# records.py
+import copy
+import gc
+import sys
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+from enum import Enum
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional
+
+
+class RequestStatus(Enum):
+    PENDING = "Pending Approval"
+    APPROVED = "Approved"
+    REJECTED = "Rejected"
+
+class DefenseStatus(Enum):
+    UNDER_REVIEW = "Under Review"
+    APPROVED = "Approved"
+    REJECTED = "Rejected"
+
+
+_MUTABLE = (dict, list, MutableMapping)
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record(MutableMapping):
+    """A stored record with one slot per known field.
+
+    Records still behave like the dicts the systems always used (get,
+    [], in, update, setdefault, ...), so existing code keeps working, but
+    each one costs a fixed slot array instead of a hash table. Fields the
+    class does not know about go to a small overflow dict and are kept on
+    the round trip. Values of SHARED fields (professor names, course ids,
+    reviewer ids) repeat across thousands of records and are interned, and
+    the status is replaced by the single string held by its enum member.
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS: tuple = ()
+    SHARED: tuple = ()
+    NORMALIZED: tuple = ()
+    STATUS: Optional[type] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._shared = frozenset(cls.SHARED)
+        cls._statuses = {m.value: m.value for m in cls.STATUS} if cls.STATUS else {}
+        cls._setters = {name: getattr(cls, name).__set__ for name in cls.FIELDS}
+        cls._values = attrgetter(*cls.FIELDS)
+
+    @classmethod
+    def _blank(cls) -> "Record":
+        # خانه‌های خالی _MISSING می‌گیرند تا خواندن همه‌ی فیلدها بدون استثنا باشد
+        record = cls.__new__(cls)
+        record._extra = None
+        for setter in cls._setters.values():
+            setter(record, _MISSING)
+        return record
+
+    def __init__(self, data: Optional[dict] = None, **fields):
+        self._extra = None
+        for setter in self._setters.values():
+            setter(self, _MISSING)
+        for source in (data or {}, fields):
+            for key, value in source.items():
+                self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Record":
+        # مسیر سریع __setitem__ برای بارگذاری هزاران رکورد
+        record = cls._blank()
+        setters, shared, normalized = cls._setters, cls._shared, cls.NORMALIZED
+        for key, value in data.items():
+            setter = setters.get(key)
+            if setter is None:
+                if record._extra is None:
+                    record._extra = {}
+                record._extra[key] = value
+                continue
+            if key in shared:
+                value = _intern(value)
+            elif key == "status":
+                value = cls._statuses.get(value, value)
+            elif key in normalized:
+                value = cls._normalize(key, value)
+            setter(record, value)
+        return record
+
+    @classmethod
+    def _normalize(cls, key: str, value):
+        """Convert nested values of the NORMALIZED fields on the way in"""
+        return value
+
+    def to_dict(self) -> dict:
+        """Plain dict copy of the record"""
+        return self._as_dict()
+
+    def _as_dict(self) -> dict:
+        data = {key: value for key, value in zip(self.FIELDS, self._values(self)) if value is not _MISSING}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    @property
+    def state(self) -> Optional[Enum]:
+        """The status as its enum member (None when missing or unknown)"""
+        status = self.get("status")
+        return self.STATUS(status) if self.STATUS and status in self._statuses else None
+
+    # ----------------- رابط dict -----------------
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return self._extra.get(key, default) if self._extra is not None else default
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            if key in self._shared:
+                value = _intern(value)
+            elif key == "status":
+                value = self._statuses.get(value, value)
+            elif key in self.NORMALIZED:
+                value = self._normalize(key, value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set and getattr(self, key) is not _MISSING:
+            setattr(self, key, _MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return getattr(self, key) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        return iter(self._as_dict())
+
+    def __len__(self):
+        return sum(value is not _MISSING for value in self._values(self)) + len(self._extra or ())
+
+    def items(self):
+        return self._as_dict().items()
+
+    def copy(self) -> "Record":
+        return copy.copy(self)
+
+    def __copy__(self):
+        clone = self.__class__.__new__(self.__class__)
+        clone._extra = dict(self._extra) if self._extra else None
+        for key, value in zip(self.FIELDS, self._values(self)):
+            clone._setters[key](clone, value)
+        return clone
+
+    def __deepcopy__(self, memo):
+        clone = self.__class__.__new__(self.__class__)
+        clone._extra = copy.deepcopy(self._extra, memo) if self._extra else None
+        for key, value in zip(self.FIELDS, self._values(self)):
+            # رشته‌ها و اعداد تغییرناپذیرند؛ فقط لیست/دیکشنری کپی می‌شود
+            clone._setters[key](clone, copy.deepcopy(value, memo) if isinstance(value, _MUTABLE) else value)
+        return clone
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+class ThesisRequest(Record):
+    FIELDS = ("request_id", "student_id", "student_name", "course_id", "course_title", "professor",
+              "request_date", "status", "major", "_version", "approval_date", "rejection_date",
+              "professor_id", "rejection_reason", "seat_returned")
+    SHARED = ("course_id", "course_title", "professor", "professor_id", "major")
+    STATUS = RequestStatus
+    __slots__ = FIELDS
+
+
+class Grade(Record):
+    FIELDS = ("label", "comments", "grading_date", "reviewer_type", "reviewer_name")
+    SHARED = ("label", "reviewer_type", "reviewer_name")
+    __slots__ = FIELDS
+
+
+class DefenseRequest(Record):
+    FIELDS = ("defense_id", "student_id", "student_name", "thesis_title", "abstract", "keywords",
+              "pdf_path", "pdf_sha256", "pdf_size", "pdf_pages", "first_page_path", "first_page_sha256",
+              "first_page_size", "upload_validation", "request_date", "status", "professor",
+              "professor_id", "course_id", "_version", "approval_date", "approved_by", "rejection_date", "rejected_by",
+              "rejection_reason", "defense_date", "defense_location", "internal_reviewer",
+              "external_reviewer", "internal_reviewer_id", "external_reviewer_id", "defense_setup_date",
+              "reviewers_assigned_date", "grades")
+    SHARED = ("professor", "professor_id", "course_id", "approved_by", "rejected_by", "defense_location",
+              "internal_reviewer_id", "external_reviewer_id")
+    NORMALIZED = ("internal_reviewer", "external_reviewer", "grades")
+    STATUS = DefenseStatus
+    __slots__ = FIELDS
+
+    @classmethod
+    def _normalize(cls, key: str, value):
+        if type(value) is not dict:
+            return value
+        if key == "grades":
+            return {_intern(reviewer_id): Grade.from_dict(grade) if type(grade) is dict else grade
+                    for reviewer_id, grade in value.items()}
+        # شناسه‌ی داور همان رشته‌ی internal_reviewer_id / external_reviewer_id می‌شود
+        return {k: _intern(v) for k, v in value.items()}
+
+    def to_dict(self) -> dict:
+        data = self._as_dict()
+        if isinstance(data.get("grades"), dict):
+            data["grades"] = {k: g.to_dict() if isinstance(g, Record) else g for k, g in data["grades"].items()}
+        return data
+
+
+class Course(Record):
+    FIELDS = ("course_id", "title", "professor", "year", "semester", "capacity", "major", "resources",
+              "sessions", "units", "_version", "waitlist", "returned_requests")
+    SHARED = ("professor", "year", "semester", "major")
+    __slots__ = FIELDS
+
+
+# مجموعه -> نوع رکورد؛ بقیه‌ی مجموعه‌ها دیکشنری می‌مانند
+RECORD_TYPES: Dict[str, type] = {
+    "thesis_requests": ThesisRequest,
+    "defense_requests": DefenseRequest,
+    "courses": Course,
+}
+
+
+@contextmanager
+def _gc_paused():
+    """Building tens of thousands of objects in a row would otherwise trigger
+    several useless full garbage collections over the whole cache"""
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def decode_record(collection: str, data):
+    """Typed record for a parsed record of collection (other data is returned as is)"""
+    record_type = RECORD_TYPES.get(collection)
+    if record_type is None or type(data) is not dict:
+        return data
+    return record_type.from_dict(data)
+
+
+def decode_records(collection: str, records: Iterable) -> List:
+    """decode_record over a whole parsed collection"""
+    record_type = RECORD_TYPES.get(collection)
+    if record_type is None or not isinstance(records, list):
+        return records
+    with _gc_paused():
+        return [record_type.from_dict(r) if type(r) is dict else r for r in records]
+
+
+def encode_records(records: Iterable) -> List:
+    """Plain dicts for a collection about to be written in one piece"""
+    with _gc_paused():
+        return [r.to_dict() if isinstance(r, Record) else r for r in records]
+
+
+def encode_record(value):
+    """json.dumps default= hook that writes records as plain objects"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
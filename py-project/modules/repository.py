@@ -0,0 +1,484 @@
+# repository.py
+import bisect
+import copy
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from instrumentation import io_stats
+from records import decode_records, encode_records
+
+# کلید یکتای رکوردها در هر مجموعه
+COLLECTION_KEYS = {
+    "students": "user_id",
+    "professors": "user_id",
+    "guest_reviewers": "user_id",
+    "thesis_requests": "request_id",
+    "defense_requests": "defense_id",
+    "courses": "course_id",
+    "capacity_counters": "professor_id",
+    "final_grades": "defense_id",
+}
+
+# شماره نسخه‌ی هر رکورد برای کنترل همزمانی خوش‌بینانه
+VERSION_FIELD = "_version"
+
+
+def collection_name(path: str) -> str:
+    """Collection name of a data file, e.g. data/courses.json -> courses"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def record_key(path: str) -> str:
+    """Name of the field that identifies a record in the file at path"""
+    return COLLECTION_KEYS.get(collection_name(path), "id")
+
+
+def synchronized(method):
+    """Run a repository method under the instance's thread lock.
+
+    The file and database locks keep separate processes apart; this keeps
+    the threads of one process (e.g. the HTTP service) from interleaving
+    inside the shared in-memory caches.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ConflictError(Exception):
+    """A record kept changing under us and could not be written"""
+
+
+class BaseRepository:
+    """Operations shared by every storage backend.
+
+    Backends provide load/save/find/get/upsert/compare_and_swap/insert_many/
+    update_many/remove_many/invalidate; update() builds the optimistic read-modify-write
+    loop on top of them. scan() is a plain filter-and-sort that backends with
+    an ordered key index replace.
+
+    Records returned by load/get/find/scan are read-only snapshots: a backend
+    may hand out its cached objects (JSON) or fresh copies (SQLite), so a
+    change made in place is neither guaranteed to stick nor to stay private.
+    Changes go through update()/update_many() or an upsert() of a copy.
+    """
+
+    def get(self, path: str, key) -> Optional[dict]:
+        """Return the record of path with the given key, or None"""
+        key_field = record_key(path)
+        return next((r for r in self.load(path) if r.get(key_field) == key), None)
+
+    def scan(self, path: str, start=None, stop=None) -> List[dict]:
+        """Records whose key lies in [start, stop) (None leaves that end open), in key order"""
+        key_field = record_key(path)
+        found = [r for r in self.load(path) if isinstance(r.get(key_field), str)
+                 and (start is None or r.get(key_field) >= start) and (stop is None or r.get(key_field) < stop)]
+        return sorted(found, key=lambda r: r.get(key_field))
+
+    def update(self, path: str, key, mutate: Callable[[dict], Optional[bool]],
+               retries: int = 10) -> Optional[dict]:
+        """Apply mutate to the latest copy of one record and store it.
+
+        mutate receives a private copy and may return False to abort. When
+        another session changed the same record in the meantime, only that
+        record is re-read and mutate runs again. Returns the stored record,
+        or None if the record is missing or mutate aborted.
+        """
+        for attempt in range(retries):
+            current = self.get(path, key)
+            if current is None:
+                return None
+            candidate = copy.deepcopy(current)
+            if mutate(candidate) is False:
+                return None
+            if self.compare_and_swap(path, candidate, current.get(VERSION_FIELD, 0)):
+                return candidate
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+        raise ConflictError(f"{collection_name(path)} record {key} is being changed by another session")
+
+    @staticmethod
+    def _merge_save(path: str, records: List[dict], read: Dict[object, int],
+                    current: List[dict]) -> Tuple[List[dict], List[object]]:
+        """Check a whole-collection save against the stored collection.
+
+        read maps the keys this session last read to their _version. Every
+        record that is already stored must still carry the stored _version
+        and gets the next one if it changed. A stored record missing from
+        records is only dropped when this session had read that very version,
+        so records other sessions added in the meantime survive a save of an
+        older list. Returns (collection to store, removed keys); raises
+        ConflictError when a record was changed or removed by another session.
+        """
+        key_field = record_key(path)
+        name = collection_name(path)
+        stored = {r.get(key_field): r for r in current}
+        listed, bumped = set(), []
+        for record in records:
+            key = record.get(key_field)
+            listed.add(key)
+            previous = stored.get(key)
+            if previous is None:
+                if key in read:
+                    raise ConflictError(f"{name} record {key} was removed by another session")
+            elif previous is not record:
+                version = previous.get(VERSION_FIELD, 0)
+                if record.get(VERSION_FIELD, 0) != version:
+                    raise ConflictError(f"{name} record {key} was changed by another session")
+                if record != previous:
+                    bumped.append((record, version + 1))
+        merged, removed = list(records), []
+        for key, record in stored.items():
+            if key in listed:
+                continue
+            if key not in read:
+                merged.append(record)  # رکورد جلسه‌ی دیگر که این جلسه ندیده است
+            elif read[key] != record.get(VERSION_FIELD, 0):
+                raise ConflictError(f"{name} record {key} was changed by another session")
+            else:
+                removed.append(key)
+        for record, version in bumped:
+            record[VERSION_FIELD] = version
+        return merged, removed
+
+
+class JsonRepository(BaseRepository):
+    """Shared access layer for the data/*.json collections.
+
+    Parsed collections are kept in memory and a file is only re-read when its
+    size or modification time changes, so the many loads done by a single menu
+    action cost one parse at most.
+
+    Single-record writes (upsert, compare_and_swap) hold a short per-file
+    commit lock, re-read the file if another session changed it, replace just
+    that record and write the file atomically via a rename. Several terminals
+    can therefore share one data directory without losing each other's work.
+    """
+
+    lock_timeout = 10.0
+    stale_lock_seconds = 30.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Tuple[tuple, list]] = {}
+        # path -> (records list, its length, key -> position) for O(1) get()
+        self._positions: Dict[str, Tuple[list, int, dict]] = {}
+        # path -> (records list, its length, sorted keys, their positions) for scan()
+        self._ordered: Dict[str, Tuple[list, int, list, list]] = {}
+
+    @staticmethod
+    def _signature(path: str) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @synchronized
+    def load(self, path: str, strict: bool = False) -> List[dict]:
+        """Return the records stored in path.
+
+        The returned list is the cached object itself and must not be changed
+        in place; write through upsert(), update() or save(). Missing or
+        invalid files give an empty list unless strict is set, in which case
+        the error is raised.
+        """
+        key = os.path.abspath(path)
+        signature = self._signature(path)
+        cached = self._cache.get(key)
+        if cached is not None and signature is not None and cached[0] == signature:
+            io_stats.record_cache_hit(path)
+            return cached[1]
+
+        start = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            parse_start = time.perf_counter()
+            records = decode_records(collection_name(path), json.loads(text))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._cache.pop(key, None)
+            if strict:
+                raise
+            return []
+
+        end = time.perf_counter()
+        io_stats.record_load(path, end - start, signature[1] if signature else len(text), end - parse_start)
+        self._cache[key] = (signature, records)
+        return records
+
+    @contextmanager
+    def _commit_lock(self, path: str):
+        """Short exclusive lock around a single commit to path"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_path = path + ".lock"
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    # قفل باقی‌مانده از یک جلسه‌ی کرش‌کرده
+                    if time.time() - os.path.getmtime(lock_path) > self.stale_lock_seconds:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise ConflictError(f"Timed out waiting for the lock on {path}")
+                time.sleep(0.002)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def _atomic_write(self, path: str, records: List[dict]):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        start = time.perf_counter()
+        text = json.dumps(encode_records(records), ensure_ascii=False, indent=2)
+        serialized = time.perf_counter()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, path)
+        io_stats.record_save(path, time.perf_counter() - start, size, serialized - start)
+
+    @synchronized
+    def save(self, path: str, records: List[dict]):
+        """Write the whole collection, checked against the stored copy.
+
+        Stale records raise ConflictError and records added by other sessions
+        are kept (see BaseRepository._merge_save).
+        """
+        key_field = record_key(path)
+        with self._commit_lock(path):
+            read = {r.get(key_field): r.get(VERSION_FIELD, 0) for r in self._cached_records(path)}
+            merged, _ = self._merge_save(path, records, read, self.load(path))
+            self._write_all(path, merged)
+
+    def _cached_records(self, path: str) -> List[dict]:
+        """The collection as this session last read or wrote it, without re-reading"""
+        cached = self._cache.get(os.path.abspath(path))
+        return cached[1] if cached is not None else []
+
+    @synchronized
+    def find(self, path: str, **criteria) -> List[dict]:
+        """Return the records of path whose fields equal the given values"""
+        return [r for r in self.load(path)
+                if all(r.get(field) == value for field, value in criteria.items())]
+
+    def upsert(self, path: str, record: dict):
+        """Store a single record, replacing the one with the same key"""
+        self._commit(path, record, None)
+
+    def compare_and_swap(self, path: str, record: dict, expected_version: int) -> bool:
+        """Store record only if the stored copy still has expected_version"""
+        return self._commit(path, record, expected_version)
+
+    @synchronized
+    def get(self, path: str, key) -> Optional[dict]:
+        records = self.load(path)
+        index = self._find_index(path, records, key)
+        return None if index is None else records[index]
+
+    def _find_index(self, path: str, records: List[dict], key) -> Optional[int]:
+        """Position of key in records, from an index rebuilt only when stale"""
+        key_field = record_key(path)
+        cache_key = os.path.abspath(path)
+        cached = self._positions.get(cache_key)
+        if cached is not None and cached[0] is records and cached[1] == len(records):
+            index = cached[2].get(key)
+            if index is None or records[index].get(key_field) == key:
+                return index
+        # لیست عوض شده یا در جا تغییر کرده؛ ایندکس را از نو بساز
+        positions = {}
+        for i, r in enumerate(records):
+            positions.setdefault(r.get(key_field), i)
+        self._positions[cache_key] = (records, len(records), positions)
+        return positions.get(key)
+
+    @synchronized
+    def scan(self, path: str, start=None, stop=None) -> List[dict]:
+        records = self.load(path)
+        key_field = record_key(path)
+        for attempt in range(2):
+            keys, positions = self._key_order(path, records, rebuild=attempt > 0)
+            low = 0 if start is None else bisect.bisect_left(keys, start)
+            high = len(keys) if stop is None else bisect.bisect_left(keys, stop)
+            found = [records[positions[i]] for i in range(low, high)]
+            # لیست ممکن است در جا عوض شده باشد (حذف و افزودن با همان طول)
+            if all(r.get(key_field) == keys[i] for i, r in zip(range(low, high), found)):
+                break
+        return found
+
+    def _key_order(self, path: str, records: List[dict], rebuild: bool = False) -> Tuple[list, list]:
+        """Sorted string keys of records and their positions, extended on appends"""
+        key_field = record_key(path)
+        cache_key = os.path.abspath(path)
+        cached = self._ordered.get(cache_key)
+        if not rebuild and cached is not None and cached[0] is records and cached[1] <= len(records):
+            keys, positions = cached[2], cached[3]
+            # شناسه‌های زمان‌دار معمولا آخر لیست می‌نشینند؛ insort تقریبا همیشه append است
+            for i in range(cached[1], len(records)):
+                key = records[i].get(key_field)
+                if isinstance(key, str):
+                    at = bisect.bisect_right(keys, key)
+                    keys.insert(at, key)
+                    positions.insert(at, i)
+        else:
+            pairs = sorted((r.get(key_field), i) for i, r in enumerate(records)
+                           if isinstance(r.get(key_field), str))
+            keys, positions = [k for k, _ in pairs], [i for _, i in pairs]
+        self._ordered[cache_key] = (records, len(records), keys, positions)
+        return keys, positions
+
+    @synchronized
+    def _commit(self, path: str, record: dict, expected_version: Optional[int]) -> bool:
+        with self._commit_lock(path):
+            records = self.load(path)
+            index = self._find_index(path, records, record.get(record_key(path)))
+            current_version = records[index].get(VERSION_FIELD, 0) if index is not None else 0
+            if expected_version is not None and current_version != expected_version:
+                return False
+            record[VERSION_FIELD] = current_version + 1
+            self._store_records(path, records, [(index, record)])
+        return True
+
+    @synchronized
+    def update_many(self, path: str, mutations: Dict[object, Callable[[dict], Optional[bool]]]
+                    ) -> Dict[object, Tuple[dict, dict]]:
+        """Apply several single-record mutations in one locked read-modify-write.
+
+        mutations maps record keys to functions like those given to update().
+        The file is read and written once. Returns {key: (before, after)} for
+        the records that were actually changed.
+        """
+        changed = {}
+        with self._commit_lock(path):
+            records = self.load(path)
+            items = []
+            for key, mutate in mutations.items():
+                index = self._find_index(path, records, key)
+                if index is None:
+                    continue
+                before = records[index]
+                candidate = copy.deepcopy(before)
+                if mutate(candidate) is False:
+                    continue
+                candidate[VERSION_FIELD] = before.get(VERSION_FIELD, 0) + 1
+                items.append((index, candidate))
+                changed[key] = (before, candidate)
+            if items:
+                self._store_records(path, records, items)
+        return changed
+
+    @synchronized
+    def insert_many(self, path: str, records: List[dict]) -> List[dict]:
+        """Add several new records in one locked read-modify-write.
+
+        Records whose key is already stored (e.g. added by another session
+        in the meantime) or repeated in records are skipped. Returns the
+        records that were added.
+        """
+        key_field = record_key(path)
+        added, keys = [], set()
+        with self._commit_lock(path):
+            stored = self.load(path)
+            for record in records:
+                key = record.get(key_field)
+                if key in keys or self._find_index(path, stored, key) is not None:
+                    continue
+                keys.add(key)
+                record[VERSION_FIELD] = 1
+                added.append(record)
+            if added:
+                self._store_records(path, stored, [(None, record) for record in added])
+        return added
+
+    @synchronized
+    def remove_many(self, path: str, checks: Dict[object, Callable[[dict], bool]]) -> Dict[object, dict]:
+        """Delete records in one locked read-modify-write.
+
+        checks maps record keys to functions that get the latest copy of the
+        record and return True to delete it. Returns {key: removed record}.
+        """
+        removed = {}
+        with self._commit_lock(path):
+            records = self.load(path)
+            key_field = record_key(path)
+            for key, check in checks.items():
+                index = self._find_index(path, records, key)
+                if index is not None and check(records[index]):
+                    removed[key] = records[index]
+            if removed:
+                kept = [r for r in records if r.get(key_field) not in removed]
+                self._write_all(path, kept)
+        return removed
+
+    def _write_all(self, path: str, records: List[dict]):
+        """Replace the whole collection with records (lock held)"""
+        self._atomic_write(path, records)
+        self._cache[os.path.abspath(path)] = (self._signature(path), records)
+        self._positions.pop(os.path.abspath(path), None)
+        self._ordered.pop(os.path.abspath(path), None)
+
+    def _store_records(self, path: str, records: List[dict], items: List[Tuple[Optional[int], dict]]):
+        """Write (index, record) pairs into the freshly loaded collection (lock held)"""
+        for index, record in items:
+            if index is None:
+                records.append(record)
+                cached = self._positions.get(os.path.abspath(path))
+                if cached is not None and cached[0] is records and cached[1] == len(records) - 1:
+                    cached[2].setdefault(record.get(record_key(path)), len(records) - 1)
+                    self._positions[os.path.abspath(path)] = (records, len(records), cached[2])
+            else:
+                records[index] = record
+        try:
+            self._atomic_write(path, records)
+        except Exception:
+            # کش نباید رکوردی را نگه دارد که روی دیسک نرفته است
+            self.invalidate(path)
+            raise
+        self._cache[os.path.abspath(path)] = (self._signature(path), records)
+
+    @synchronized
+    def invalidate(self, path: str = None):
+        """Drop the cached copy of path (or of every file)"""
+        if path is None:
+            self._cache.clear()
+            self._positions.clear()
+            self._ordered.clear()
+        else:
+            self._cache.pop(os.path.abspath(path), None)
+            self._positions.pop(os.path.abspath(path), None)
+            self._ordered.pop(os.path.abspath(path), None)
+
+
+def _create_repository():
+    """Pick the storage backend from the THESIS_STORAGE environment variable"""
+    backend = os.environ.get("THESIS_STORAGE", "json").lower()
+    if backend == "sqlite":
+        from sqlite_repository import SqliteRepository
+        return SqliteRepository(os.environ.get("THESIS_DB_PATH", "data/thesis.db"))
+    if backend == "journal":
+        from journal import JournaledJsonRepository
+        return JournaledJsonRepository()
+    return JsonRepository()
+
+
+repository = _create_repository()
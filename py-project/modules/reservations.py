@@ -0,0 +1,299 @@
+# reservations.py
+import argparse
+import functools
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from repository import repository, collection_name
+from records import RequestStatus, ThesisRequest
+from ids import id_generator
+from course_catalog import PositionIndex, course_catalog, request_history
+from archive import cold_archive
+
+COURSES_FILE = "data/courses.json"
+THESIS_REQUESTS_FILE = "data/thesis_requests.json"
+# درخواستی که استاد تا این مدت به آن رسیدگی نکند صندلی‌اش را از دست می‌دهد
+RESERVATION_TTL_DAYS = 7
+EXPIRED_REASON = "Seat reservation expired"
+# روی درخواست ردشده: False تا وقتی صندلی‌اش به درس برنگشته است
+SEAT_RETURNED_FIELD = "seat_returned"
+
+
+def pending_request(student_id: str, student_name: str, major: str, course: dict) -> ThesisRequest:
+    """A new pending thesis request holding a seat of course"""
+    return ThesisRequest({
+        "request_id": id_generator.next_id("TR"),
+        "student_id": student_id,
+        "student_name": student_name,
+        "course_id": course.get("course_id"),
+        "course_title": course.get("title"),
+        "professor": course.get("professor"),
+        "request_date": datetime.now().isoformat(),
+        "status": RequestStatus.PENDING.value,
+        "major": major
+    })
+
+
+class SeatReservations(PositionIndex):
+    """Course seats held by pending thesis requests, and the course waitlists.
+
+    A pending request holds one seat of its course (the seat is taken from
+    the course capacity when the request is stored). The seat is kept when
+    the request is approved and given back when it is rejected or when it
+    expires RESERVATION_TTL_DAYS after request_date. Expiry times of the
+    pending requests sit in a heap, so expire() only looks at the requests
+    that are due.
+
+    A full course keeps a FIFO waitlist in its own record. A seat that is
+    given back goes to the first waiting student who can still take it, in
+    the same course update; only when nobody is waiting does the capacity
+    grow again. All seats freed together (e.g. by one expire()) are given
+    back with a single update_many of the courses, and a seat whose
+    promoted request cannot be stored returns to the course.
+
+    Rejecting a request and giving its seat back are two writes to two
+    files. The rejection stores seat_returned=False on the request, the
+    course update lists the request in its returned_requests, and only then
+    is the request marked seat_returned=True (which lets the course forget
+    it again). Requests left at False by an error or a crash are given back
+    by the next expire(); the course's list makes that retry count each
+    seat once. A crash between taking a seat and storing the new request
+    (StudentSystem._submit_thesis_request) still loses that seat.
+    """
+
+    def __init__(self, path: str = THESIS_REQUESTS_FILE, ttl_days: int = RESERVATION_TTL_DAYS):
+        super().__init__(path)
+        self.ttl = timedelta(days=ttl_days)
+        self._clear()
+
+    def _clear(self):
+        self._expiry: List[Tuple[datetime, int]] = []  # (expires at, position) of pending requests
+        self._owed: Set[str] = set()  # rejected requests whose seat has not been given back
+
+    def _expires_at(self, request: dict) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(request.get("request_date")) + self.ttl
+        except (TypeError, ValueError):
+            return None
+
+    def _index(self, position: int, request: dict):
+        if request.get("status") == RequestStatus.PENDING.value:
+            expires_at = self._expires_at(request)
+            if expires_at is not None:
+                heapq.heappush(self._expiry, (expires_at, position))
+        elif self._seat_owed(request):
+            self._owed.add(request.get("request_id"))
+
+    @staticmethod
+    def _seat_owed(request: Optional[dict]) -> bool:
+        return (request is not None and request.get("status") == RequestStatus.REJECTED.value
+                and request.get(SEAT_RETURNED_FIELD) is False)
+
+    # ----------------- انقضا -----------------
+    def expire(self, now: Optional[datetime] = None) -> List[dict]:
+        """Reject the pending requests whose reservation ran out and pass their seats on.
+
+        Seats of earlier rejections that were never given back are retried
+        in the same course update.
+        """
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            records = self._current()
+            while self._expiry and self._expiry[0][0] <= now:
+                _, position = heapq.heappop(self._expiry)
+                request = records[position]
+                expires_at = self._expires_at(request)
+                if request.get("status") == RequestStatus.PENDING.value and expires_at and expires_at <= now:
+                    due.append(request.get("request_id"))
+            owed = list(self._owed)
+        if not due and not owed:
+            return []
+
+        def mark_expired(request):
+            if request.get("status") != RequestStatus.PENDING.value:
+                return False
+            request.update({"status": RequestStatus.REJECTED.value, "rejection_date": now.isoformat(),
+                            "rejection_reason": EXPIRED_REASON, SEAT_RETURNED_FIELD: False})
+
+        changed = repository.update_many(self.path, {request_id: mark_expired for request_id in due}) if due else {}
+        expired = [after for _, after in changed.values()]
+        retried = [r for r in map(functools.partial(repository.get, self.path), owed) if self._seat_owed(r)]
+        with self._lock:
+            self._owed.difference_update(owed)
+        seats: Dict[str, List[str]] = {}
+        for request in expired + retried:
+            seats.setdefault(request.get("course_id"), []).append(request.get("request_id"))
+        self.release_many(seats)
+        return expired
+
+    def record_change(self, path: str, before: Optional[dict], after: Optional[dict]) -> Optional[ThesisRequest]:
+        """Give back the seat of a thesis request that left Pending for Rejected"""
+        if collection_name(path) != collection_name(self.path) or not before or not after:
+            return None
+        if (before.get("status") == RequestStatus.PENDING.value
+                and after.get("status") == RequestStatus.REJECTED.value):
+            return self.release(after.get("course_id"), after.get("request_id"))
+        return None
+
+    # ----------------- صف انتظار -----------------
+    @staticmethod
+    def _can_take_seat(student_id: str) -> bool:
+        """Whether a waiting student may still get a seat (no pending or approved thesis)"""
+        taken = (RequestStatus.PENDING.value, RequestStatus.APPROVED.value)
+        if any(r.get("status") in taken for r in request_history.history(student_id)):
+            return False
+        return RequestStatus.APPROVED.value not in cold_archive.statuses(THESIS_REQUESTS_FILE, student_id)
+
+    def release(self, course_id: str, request_id: Optional[str] = None) -> Optional[ThesisRequest]:
+        """Give one seat of course back (the seat of request_id, when it is known).
+
+        Returns the request of the promoted student, if any.
+        """
+        promoted = self.release_many({course_id: [request_id]})
+        return promoted[0] if promoted else None
+
+    def _seat_returned(self, request_id: str) -> bool:
+        request = repository.get(self.path, request_id)
+        return request is None or request.get(SEAT_RETURNED_FIELD) is True
+
+    def release_many(self, seats: Dict[str, List[Optional[str]]]) -> List[ThesisRequest]:
+        """Give seats back to several courses in one course update.
+
+        seats maps a course_id to the ids of the rejected requests whose
+        seats go back (None for a seat without a stored request). A request
+        the course has already taken back is skipped. Returns the pending
+        requests filed for the promoted students.
+        """
+        if not seats:
+            return []
+        promoted: Dict[str, List[dict]] = {}
+        taken = set()  # دانشجویی که در صف دو درس است فقط یک صندلی می‌گیرد
+
+        def give_back(course_id, request_ids):
+            def apply(course):
+                # درخواستی که علامت خورده دیگر لازم نیست در درس بماند
+                returned = [r for r in course.get("returned_requests") or [] if not self._seat_returned(r)]
+                owed = [r for r in request_ids if r is None or (r not in returned and not self._seat_returned(r))]
+                count = len(owed)
+                if not count and len(returned) == len(course.get("returned_requests") or []):
+                    return False
+                chosen = promoted[course_id] = []
+                waitlist = list(course.get("waitlist") or [])
+                while waitlist and len(chosen) < count:
+                    entry = waitlist.pop(0)
+                    if entry.get("student_id") not in taken and self._can_take_seat(entry.get("student_id")):
+                        chosen.append(entry)
+                        taken.add(entry.get("student_id"))
+                course["waitlist"] = waitlist
+                course["capacity"] = course.get("capacity", 0) + count - len(chosen)
+                course["returned_requests"] = returned + [r for r in owed if r is not None]
+            return apply
+
+        request_ids = [r for ids in seats.values() for r in ids if r is not None]
+        try:
+            changed = repository.update_many(COURSES_FILE, {course_id: give_back(course_id, ids)
+                                                            for course_id, ids in seats.items() if course_id})
+            promotions = self._promote(changed, promoted)
+        except Exception:
+            # expire() بعدا دوباره امتحان می‌کند
+            with self._lock:
+                self._owed.update(request_ids)
+            raise
+
+        def mark_returned(request):
+            if request.get(SEAT_RETURNED_FIELD) is True:
+                return False
+            request[SEAT_RETURNED_FIELD] = True
+
+        if request_ids:
+            repository.update_many(self.path, {request_id: mark_returned for request_id in request_ids})
+        return promotions
+
+    def _promote(self, changed: Dict[str, tuple], promoted: Dict[str, List[dict]]) -> List[ThesisRequest]:
+        """File pending requests for the students a course update took off the waitlists"""
+        requests = []
+        for course_id, (_, course) in changed.items():
+            course_catalog.course_changed(course_id)
+            # صندلی مستقیم به درخواست تازه‌ی نفر اول صف می‌رسد
+            requests.extend((entry, pending_request(entry["student_id"], entry.get("student_name"),
+                                                    entry.get("major"), course))
+                            for entry in promoted.get(course_id, ()))
+        if not requests:
+            return []
+        stored = []
+        try:
+            stored = repository.insert_many(self.path, [request for _, request in requests])
+        finally:
+            if len(stored) < len(requests):
+                added = {r.get("request_id") for r in stored}
+                self._undo_promotions([(entry, request) for entry, request in requests
+                                       if request.get("request_id") not in added])
+        return stored
+
+    def _undo_promotions(self, failed: List[Tuple[dict, ThesisRequest]]):
+        """Return the seats of promotions whose request was not stored, students back at the queue head"""
+        by_course: Dict[str, List[dict]] = {}
+        for entry, request in failed:
+            by_course.setdefault(request.get("course_id"), []).append(entry)
+
+        def restore(entries):
+            def apply(course):
+                course["capacity"] = course.get("capacity", 0) + len(entries)
+                course["waitlist"] = entries + list(course.get("waitlist") or [])
+            return apply
+
+        repository.update_many(COURSES_FILE, {course_id: restore(entries)
+                                              for course_id, entries in by_course.items()})
+        for course_id in by_course:
+            course_catalog.course_changed(course_id)
+
+    def join_waitlist(self, course_id: str, student_id: str, student_name: str, major: str) -> Optional[int]:
+        """Queue a student for a full course; returns their 1-based place, None if the course has seats"""
+        place = []
+
+        def enqueue(course):
+            place.clear()
+            if course.get("capacity", 0) > 0:
+                return False
+            waitlist = list(course.get("waitlist") or [])
+            for i, entry in enumerate(waitlist, 1):
+                if entry.get("student_id") == student_id:
+                    place.append(i)
+                    return False
+            waitlist.append({"student_id": student_id, "student_name": student_name, "major": major,
+                             "joined_date": datetime.now().isoformat()})
+            course["waitlist"] = waitlist
+            place.append(len(waitlist))
+
+        repository.update(COURSES_FILE, course_id, enqueue)
+        return place[0] if place else None
+
+    def waitlist(self, course_id: str) -> List[dict]:
+        course = course_catalog.get(course_id)
+        return list(course.get("waitlist") or []) if course else []
+
+    def full_courses(self, major: str) -> List[dict]:
+        """Courses of major without free seats, which a student can wait for"""
+        return [c for c in course_catalog.find(major=major) if c.get("capacity", 0) <= 0]
+
+
+seat_reservations = SeatReservations()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expire old seat reservations or show a course waitlist")
+    parser.add_argument("--course", help="course_id whose waitlist to show")
+    args = parser.parse_args()
+
+    if args.course:
+        waiting = seat_reservations.waitlist(args.course)
+        if not waiting:
+            print("📭 Nobody is waiting for this course")
+        for place, entry in enumerate(waiting, 1):
+            print(f"{place}. {entry.get('student_name')} ({entry.get('student_id')}) since {entry.get('joined_date')}")
+    else:
+        expired = seat_reservations.expire()
+        print(f"⏳ {len(expired)} pending requests expired")
+        for request in expired:
+            print(f"   {request.get('request_id')}  {request.get('student_name')} - {request.get('course_title')}")
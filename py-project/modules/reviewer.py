@@ -1,19 +1,18 @@
 # reviewer.py
 from user import User, UserType
-import json
-import os
-from datetime import datetime
+from repository import repository, ConflictError
+from grading import GRADE_LABELS, submit_grades, batch_grade_menu
+from profiling import menu_action
 
 class ReviewerSystem(User):
     _defense_requests_file = "data/defense_requests.json"
     _guest_reviewers_file = "data/guest_reviewers.json"
 
-    def __init__(self, user_id: str, user_type: UserType):
+    def __init__(self, user_id: str, user_type: UserType, verbose: bool = True):
         self.is_guest = (user_type == UserType.GUEST_REVIEWER)
 
         if self.is_guest:
-            users = self._load_guest_reviewers()
-            user_data = next((u for u in users if u.get("user_id") == user_id), None)
+            user_data = self._users_directory().get(UserType.GUEST_REVIEWER, user_id)
             if not user_data:
                 raise ValueError("Guest reviewer not found")
             super().__init__(
@@ -24,8 +23,7 @@ class ReviewerSystem(User):
             )
         else:
             # Internal reviewer (از لیست استادها)
-            users = self._load_users(UserType.PROFESSOR)
-            user_data = next((u for u in users if u.get("user_id") == user_id), None)
+            user_data = self._users_directory().get(UserType.PROFESSOR, user_id)
             if not user_data:
                 raise ValueError("Internal reviewer not found (must be professor)")
             super().__init__(
@@ -35,54 +33,44 @@ class ReviewerSystem(User):
                 user_type=UserType.REVIEWER
             )
 
-        print(f"🧾 Reviewer System initialized for: {self.name} (guest={self.is_guest})")
+        if verbose:
+            print(f"🧾 Reviewer System initialized for: {self.name} (guest={self.is_guest})")
 
     def run(self):
         while True:
             print("\n1. View Assigned Defense Sessions")
             print("2. Grade a Defense Session")
-            print("3. Logout")
+            print("3. Batch Grade Sessions")
+            print("4. Logout")
             choice = input("Select option: ")
-            if choice == "1":
-                self.view_assigned_defenses()
-            elif choice == "2":
-                self.grade_defense_session()
-            elif choice == "3":
+            actions = {
+                "1": self.view_assigned_defenses,
+                "2": self.grade_defense_session,
+                "3": self.batch_grade_sessions
+            }
+            if choice in actions:
+                with menu_action("reviewer", actions[choice], self.user_type.value):
+                    actions[choice]()
+            elif choice == "4":
                 break
             else:
                 print("❌ Invalid selection")
 
     # ----------------- فایل‌ها -----------------
     def _load_defense_requests(self):
-        try:
-            with open(self._defense_requests_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-
-    def _save_defense_requests(self, requests):
-        os.makedirs(os.path.dirname(self._defense_requests_file), exist_ok=True)
-        with open(self._defense_requests_file, 'w', encoding='utf-8') as f:
-            json.dump(requests, f, ensure_ascii=False, indent=2)
+        return repository.load(self._defense_requests_file)
 
     def _load_guest_reviewers(self):
-        try:
-            with open(self._guest_reviewers_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return repository.load(self._guest_reviewers_file)
 
     # ----------------- امکانات -----------------
+    def _assigned_defenses(self):
+        if self.is_guest:
+            return repository.find(self._defense_requests_file, external_reviewer_id=self.user_id)
+        return repository.find(self._defense_requests_file, internal_reviewer_id=self.user_id)
+
     def view_assigned_defenses(self):
-        defenses = self._load_defense_requests()
-        assigned = []
-        for d in defenses:
-            if self.is_guest:
-                if d.get("external_reviewer_id") == self.user_id:
-                    assigned.append(d)
-            else:
-                if d.get("internal_reviewer_id") == self.user_id:
-                    assigned.append(d)
+        assigned = self._assigned_defenses()
 
         print(f"\n📋 Assigned defenses for {self.name} (count={len(assigned)})")
         for i, a in enumerate(assigned,1):
@@ -94,15 +82,7 @@ class ReviewerSystem(User):
             print(f"   Status: {status}")
 
     def grade_defense_session(self):
-        defenses = self._load_defense_requests()
-        assigned = []
-        for d in defenses:
-            if self.is_guest:
-                if d.get("external_reviewer_id") == self.user_id:
-                    assigned.append(d)
-            else:
-                if d.get("internal_reviewer_id") == self.user_id:
-                    assigned.append(d)
+        assigned = self._assigned_defenses()
 
         if not assigned:
             print("❌ No assigned defense sessions")
@@ -126,7 +106,7 @@ class ReviewerSystem(User):
             return
 
         # لیبل‌های نمره
-        labels = ["A", "B", "C", "F"]
+        labels = GRADE_LABELS
         print("\nSelect grade label:")
         for i, lab in enumerate(labels,1):
             print(f"{i}. {lab}")
@@ -143,20 +123,24 @@ class ReviewerSystem(User):
 
         comments = input("Comments (optional): ")
 
-        # ذخیره نمره
-        defenses = self._load_defense_requests()
-        for d in defenses:
-            if d.get("defense_id") == session.get("defense_id"):
-                if "grades" not in d:
-                    d["grades"] = {}
-                d["grades"][self.user_id] = {
-                    "label": label,
-                    "comments": comments,
-                    "grading_date": datetime.now().isoformat(),
-                    "reviewer_type": "guest" if self.is_guest else "internal",
-                    "reviewer_name": self.name
-                }
-                break
-
-        self._save_defense_requests(defenses)
+        # ذخیره نمره (فقط همین رکورد نوشته می‌شود)
+        entry = {"defense_id": session.get("defense_id"), "label": label, "comments": comments}
+        try:
+            saved, errors = submit_grades([entry], [session.get("defense_id")], self.user_id,
+                                          self._reviewer_type(), self.name)
+        except ConflictError as e:
+            print(f"❌ {e}, please try again")
+            return
+        if not saved:
+            print(f"❌ {errors[0] if errors else 'Grade could not be saved'}")
+            return
         print("✅ Grade saved successfully!")
+
+    def batch_grade_sessions(self):
+        try:
+            batch_grade_menu(self._assigned_defenses(), self.user_id, self._reviewer_type(), self.name)
+        except ConflictError as e:
+            print(f"❌ {e}, please try again")
+
+    def _reviewer_type(self) -> str:
+        return "guest" if self.is_guest else "internal"
@@ -0,0 +1,187 @@
+# reviewer_assignment.py
+import argparse
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from repository import repository
+from user import User, UserType
+from records import DefenseStatus
+from capacity import capacity_counters
+from defense_schedule import defense_schedule, parse_slot, DEFENSE_MINUTES
+from final_grades import final_grades
+
+
+class ReviewerAssignmentEngine:
+    """Assigns reviewers to approved defenses while keeping loads balanced.
+
+    Internal reviewers (professors) and external reviewers (guest reviewers)
+    each sit in a min-heap keyed by their current review load. Every defense
+    takes the least-loaded eligible reviewer from each heap, so the maximum
+    load grows as slowly as possible. The supervising professor is never
+    picked, and nobody is given more than max_review_capacity reviews.
+    Defenses that already have a date only get reviewers who are free at
+    that time, both in the stored schedule and in the plan being built.
+    """
+
+    _defense_requests_file = "data/defense_requests.json"
+
+    def __init__(self, max_review_capacity: int = 10):
+        self.max_review_capacity = max_review_capacity
+
+    @staticmethod
+    def pending_defenses() -> List[dict]:
+        """Approved defenses that still miss an internal or external reviewer"""
+        defenses = repository.find(ReviewerAssignmentEngine._defense_requests_file,
+                                   status=DefenseStatus.APPROVED.value)
+        pending = [d for d in defenses
+                   if not d.get("internal_reviewer_id") or not d.get("external_reviewer_id")]
+        return sorted(pending, key=lambda d: d.get("request_date", ""))
+
+    @staticmethod
+    def _heap(reviewers: List[dict]) -> List[Tuple[int, str]]:
+        heap = [(capacity_counters.review_count(r["user_id"]), r["user_id"]) for r in reviewers]
+        heapq.heapify(heap)
+        return heap
+
+    def _pick(self, heap: List[Tuple[int, str]], excluded: Set[str], busy=None) -> Optional[str]:
+        """Pop the least-loaded reviewer not in excluded (nor busy) and charge one review"""
+        skipped, chosen = [], None
+        while heap:
+            load, reviewer_id = heapq.heappop(heap)
+            if load >= self.max_review_capacity:
+                skipped.append((load, reviewer_id))
+                break
+            if reviewer_id in excluded or (busy is not None and busy(reviewer_id)):
+                skipped.append((load, reviewer_id))
+                continue
+            chosen = reviewer_id
+            heapq.heappush(heap, (load + 1, reviewer_id))
+            break
+        for item in skipped:
+            heapq.heappush(heap, item)
+        return chosen
+
+    def plan(self, defenses: List[dict] = None) -> Tuple[List[dict], List[dict]]:
+        """Compute assignments without writing anything.
+
+        Returns (assignments, unassigned); each assignment holds defense_id
+        and the chosen internal/external reviewer ids.
+        """
+        if defenses is None:
+            defenses = self.pending_defenses()
+        internal_heap = self._heap(User._load_users(UserType.PROFESSOR))
+        external_heap = self._heap(User._load_users(UserType.GUEST_REVIEWER))
+
+        assignments, unassigned = [], []
+        planned: Dict[str, List] = {}  # reviewer_id -> starts of the defenses planned for them
+        for defense in defenses:
+            supervisors = {defense.get("professor_id"), defense.get("approved_by")} - {None}
+            busy = self._busy(defense, planned)
+            internal_id = defense.get("internal_reviewer_id") or self._pick(internal_heap, supervisors, busy)
+            external_id = defense.get("external_reviewer_id") or self._pick(external_heap, supervisors, busy)
+            if internal_id and external_id:
+                if busy is not None:
+                    start = parse_slot(defense["defense_date"])
+                    for reviewer_id in (internal_id, external_id):
+                        planned.setdefault(reviewer_id, []).append(start)
+                assignments.append({
+                    "defense_id": defense["defense_id"],
+                    "internal_reviewer_id": internal_id,
+                    "external_reviewer_id": external_id
+                })
+            else:
+                # نوبت رزروشده را پس بده
+                for heap, reviewer_id, existing in [(internal_heap, internal_id, defense.get("internal_reviewer_id")),
+                                                    (external_heap, external_id, defense.get("external_reviewer_id"))]:
+                    if reviewer_id and not existing:
+                        self._release(heap, reviewer_id)
+                unassigned.append(defense)
+        return assignments, unassigned
+
+    @staticmethod
+    def _busy(defense: dict, planned: Dict[str, List]):
+        """Predicate telling whether a reviewer is taken at the defense's date (None without a date)"""
+        try:
+            start = parse_slot(defense.get("defense_date"))
+        except ValueError:
+            return None
+        length = timedelta(minutes=DEFENSE_MINUTES)
+
+        def busy(reviewer_id: str) -> bool:
+            if any(abs(other - start) < length for other in planned.get(reviewer_id, ())):
+                return True
+            return bool(defense_schedule.conflicts(start, None, [reviewer_id], exclude=defense.get("defense_id")))
+        return busy
+
+    @staticmethod
+    def _release(heap: List[Tuple[int, str]], reviewer_id: str):
+        for i, (load, rid) in enumerate(heap):
+            if rid == reviewer_id:
+                heap[i] = (load - 1, rid)
+                heapq.heapify(heap)
+                return
+
+    def apply(self, assignments: List[dict]) -> int:
+        """Write all assignments in one commit; returns how many were stored.
+
+        A dated defense whose new reviewer got booked elsewhere at that time
+        since plan() ran is checked again under the commit lock and skipped.
+        """
+        professors = {u["user_id"]: u for u in User._load_users(UserType.PROFESSOR)}
+        guests = {u["user_id"]: u for u in User._load_users(UserType.GUEST_REVIEWER)}
+        now = datetime.now().isoformat()
+
+        def assign(assignment):
+            internal = professors.get(assignment["internal_reviewer_id"], {})
+            guest = guests.get(assignment["external_reviewer_id"], {})
+
+            def mutate(defense):
+                if defense.get("status") != DefenseStatus.APPROVED.value:
+                    return False
+                reviewer_ids = [assignment[field] for field in ("internal_reviewer_id", "external_reviewer_id")
+                                if not defense.get(field)]
+                try:
+                    start = parse_slot(defense.get("defense_date"))
+                except ValueError:
+                    start = None
+                if start is not None and defense_schedule.conflicts(start, None, reviewer_ids,
+                                                                    exclude=defense.get("defense_id")):
+                    return False
+                if not defense.get("internal_reviewer_id"):
+                    defense["internal_reviewer_id"] = assignment["internal_reviewer_id"]
+                    defense["internal_reviewer"] = {"id": internal.get("user_id"), "name": internal.get("name")}
+                if not defense.get("external_reviewer_id"):
+                    defense["external_reviewer_id"] = assignment["external_reviewer_id"]
+                    defense["external_reviewer"] = {
+                        "id": guest.get("user_id"),
+                        "name": guest.get("name"),
+                        "affiliation": guest.get("affiliation", ""),
+                        "email": guest.get("email", "")
+                    }
+                defense["reviewers_assigned_date"] = now
+            return mutate
+
+        changed = repository.update_many(self._defense_requests_file,
+                                         {a["defense_id"]: assign(a) for a in assignments})
+        for before, after in changed.values():
+            capacity_counters.record_change(self._defense_requests_file, before, after)
+            defense_schedule.record_change(self._defense_requests_file, before, after)
+            final_grades.record_change(self._defense_requests_file, before, after)
+        return len(changed)
+
+
+if __name__ == "__main__":
+    from professor import ProfessorSystem
+
+    parser = argparse.ArgumentParser(description="Assign reviewers to all approved defenses")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without saving it")
+    args = parser.parse_args()
+
+    engine = ReviewerAssignmentEngine(ProfessorSystem._max_review_capacity)
+    assignments, unassigned = engine.plan()
+    for a in assignments:
+        print(f"✅ {a['defense_id']}: internal {a['internal_reviewer_id']}, external {a['external_reviewer_id']}")
+    for d in unassigned:
+        print(f"❌ {d.get('defense_id')}: no reviewer with free capacity")
+    if not args.dry_run:
+        print(f"💾 {engine.apply(assignments)} defenses updated")
@@ -0,0 +1,230 @@
+# reviewer_recommender.py
+import argparse
+import math
+import threading
+from typing import Dict, List, Optional, Set
+from repository import repository
+from capacity import capacity_counters
+from thesis_search import field_counts, term_counts
+from archive import cold_archive
+
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+
+# وقتی تعداد پایان‌نامه‌ها ۱۰٪ بیشتر شد، idf دوباره حساب می‌شود
+IDF_REFRESH_RATIO = 0.1
+
+
+def _expertise(record: Optional[dict]) -> Set[str]:
+    """Reviewers whose profile a defense belongs to: its supervisor and everyone who graded it"""
+    if record is None:
+        return set()
+    reviewers = set(record.get("grades") or ())
+    if record.get("professor_id"):
+        reviewers.add(record["professor_id"])
+    return reviewers
+
+
+class ReviewerRecommender:
+    """Ranks reviewers for a defense by how close their past theses are to it.
+
+    Every reviewer has a TF-IDF vector built from the title, abstract and
+    keywords of the theses they supervised or graded. Vectors are kept
+    ready for scoring (term -> reviewer -> weight, plus each reviewer's
+    squared norm) and change one thesis at a time through record_change and
+    refresh, so a new grade only touches the terms of the graded thesis in
+    the grader's vector. IDF weights are a snapshot of the corpus that is
+    taken again once it has grown by IDF_REFRESH_RATIO; only then are all
+    vectors reweighted.
+    """
+
+    def __init__(self, path: str = DEFENSE_REQUESTS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._source = None
+        self._source_len = 0
+        self._documents: Dict[str, Dict[str, float]] = {}  # defense_id -> term counts
+        self._document_frequency: Dict[str, int] = {}
+        self._pairs: Dict[str, Set[str]] = {}  # defense_id -> reviewers holding it in their vector
+        self._profiles: Dict[str, Dict[str, float]] = {}  # reviewer_id -> summed term counts
+        self._weights: Dict[str, Dict[str, float]] = {}  # term -> reviewer_id -> tf-idf weight
+        self._squares: Dict[str, float] = {}  # reviewer_id -> squared vector norm
+        self._idf: Dict[str, float] = {}
+        self._idf_size = 0
+
+    # ----------------- نگهداری بردارها -----------------
+    def _add_document(self, record: dict) -> Optional[Dict[str, float]]:
+        defense_id = record.get("defense_id")
+        counts = self._documents.get(defense_id)
+        if counts is None and defense_id:
+            counts = self._documents[defense_id] = field_counts(record)
+            for term in counts:
+                self._document_frequency[term] = self._document_frequency.get(term, 0) + 1
+        return counts
+
+    def _remove_document(self, defense_id: str):
+        for reviewer_id in self._pairs.pop(defense_id, set()):
+            self._move(reviewer_id, self._documents[defense_id], -1)
+        for term in self._documents.pop(defense_id, {}):
+            self._document_frequency[term] -= 1
+            if not self._document_frequency[term]:
+                del self._document_frequency[term]
+
+    def _move(self, reviewer_id: str, counts: Dict[str, float], sign: int):
+        """Add (sign=1) or take away (sign=-1) one thesis from a reviewer's vector"""
+        profile = self._profiles.setdefault(reviewer_id, {})
+        square = self._squares.get(reviewer_id, 0.0)
+        for term, count in counts.items():
+            value = profile.get(term, 0.0) + sign * count
+            weights = self._weights.get(term)
+            if weights is None:
+                weights = self._weights[term] = {}
+            old = weights.get(reviewer_id, 0.0)
+            if value > 1e-9:
+                profile[term] = value
+                weight = weights[reviewer_id] = self._weight(term, value)
+            else:
+                weight = 0.0
+                profile.pop(term, None)
+                weights.pop(reviewer_id, None)
+                if not weights:
+                    del self._weights[term]
+            square += weight * weight - old * old
+        self._squares[reviewer_id] = max(square, 0.0)
+
+    def _sync(self, record: dict):
+        """Make the vectors hold record exactly for its current supervisor and graders"""
+        counts = self._add_document(record)
+        if counts is None:
+            return
+        held = self._pairs.setdefault(record["defense_id"], set())
+        wanted = _expertise(record)
+        for reviewer_id in wanted - held:
+            self._move(reviewer_id, counts, 1)
+        for reviewer_id in held - wanted:
+            self._move(reviewer_id, counts, -1)
+        held.clear()
+        held.update(wanted)
+
+    def record_change(self, before: Optional[dict], after: Optional[dict]):
+        """Update the vectors for a defense request that changed from before to after"""
+        with self._lock:
+            if after is not None:
+                self._sync(after)
+            elif before is not None and before.get("defense_id") in self._documents:
+                self._remove_document(before["defense_id"])
+
+    def refresh(self):
+        """Bring the vectors up to date with the stored defense requests"""
+        with self._lock:
+            records = repository.load(self.path)
+            if records is self._source and len(records) >= self._source_len:
+                # نمره‌های همین پردازه قبلاً از record_change رسیده‌اند
+                changed = records[self._source_len:]
+            elif self._source is None:
+                # سابقه‌ی داوری دفاع‌های بایگانی‌شده هم جزو تخصص استاد است
+                changed = list(cold_archive.all_records(self.path))
+            else:
+                # دفاع فقط با بایگانی از فایل اصلی بیرون می‌رود، پس سندهای غایب می‌مانند
+                changed = records
+            for record in changed:
+                self._add_document(record)
+            self._source, self._source_len = records, len(records)
+
+            size = len(self._documents)
+            if not self._idf or abs(size - self._idf_size) > IDF_REFRESH_RATIO * self._idf_size:
+                self._reweigh(size)
+            for record in changed:
+                self._sync(record)
+
+    def _reweigh(self, size: int):
+        """Take a new IDF snapshot and recompute every vector with it"""
+        self._idf_size = size
+        self._idf = {term: math.log((1 + size) / (1 + df)) + 1
+                     for term, df in self._document_frequency.items()}
+        self._weights, self._squares = {}, {}
+        for reviewer_id, profile in self._profiles.items():
+            square = 0.0
+            for term, count in profile.items():
+                weight = self._weight(term, count)
+                self._weights.setdefault(term, {})[reviewer_id] = weight
+                square += weight * weight
+            self._squares[reviewer_id] = square
+
+    # ----------------- شباهت -----------------
+    def _weight(self, term: str, count: float) -> float:
+        idf = self._idf.get(term)
+        if idf is None:
+            # واژه‌ای که بعد از آخرین عکس‌برداری آمده: نادرترین حالت
+            idf = math.log(1 + self._idf_size) + 1
+        return (1 + math.log(count)) * idf if count >= 1 else count * idf
+
+    def similarities(self, counts: Dict[str, float]) -> Dict[str, float]:
+        """Cosine similarity of every reviewer sharing a term with counts"""
+        with self._lock:
+            self.refresh()
+            query = {term: self._weight(term, count) for term, count in counts.items() if term in self._weights}
+            query_norm = math.sqrt(sum(w * w for w in query.values()))
+            if not query_norm:
+                return {}
+            dots: Dict[str, float] = {}
+            for term, weight in query.items():
+                for reviewer_id, reviewer_weight in self._weights[term].items():
+                    dots[reviewer_id] = dots.get(reviewer_id, 0.0) + weight * reviewer_weight
+            squares = self._squares
+            return {reviewer_id: dot / (query_norm * math.sqrt(squares[reviewer_id]))
+                    for reviewer_id, dot in dots.items() if squares.get(reviewer_id)}
+
+    def recommend(self, defense: dict, candidates: List[dict], max_reviews: int,
+                  limit: Optional[int] = None) -> List[dict]:
+        """Candidates with free review capacity, closest topic first.
+
+        Each result holds the candidate's user record, its similarity score
+        (0..1) and current review count. The defense's supervisor is never
+        recommended.
+        """
+        scores = self.similarities(field_counts(defense))
+        excluded = {defense.get("professor_id"), defense.get("approved_by")} - {None}
+        counts = capacity_counters.review_counts()
+        ranked = []
+        for candidate in candidates:
+            reviewer_id = candidate.get("user_id")
+            if reviewer_id in excluded:
+                continue
+            reviews = counts.get(reviewer_id, 0)
+            if reviews >= max_reviews:
+                continue
+            ranked.append({"reviewer": candidate, "score": scores.get(reviewer_id, 0.0), "reviews": reviews})
+        ranked.sort(key=lambda r: (-r["score"], r["reviews"], r["reviewer"].get("name") or ""))
+        return ranked[:limit] if limit else ranked
+
+    def search(self, text: str, limit: int = 10) -> List[tuple]:
+        """(reviewer_id, score) pairs for free text, best first"""
+        scores = self.similarities(term_counts(text))
+        return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+
+reviewer_recommender = ReviewerRecommender()
+
+
+if __name__ == "__main__":
+    from user import User, UserType
+    from professor import ProfessorSystem
+
+    parser = argparse.ArgumentParser(description="Suggest reviewers for a defense request")
+    parser.add_argument("defense_id")
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    defense = repository.get(DEFENSE_REQUESTS_FILE, args.defense_id)
+    if defense is None:
+        raise SystemExit(f"❌ Defense request {args.defense_id} not found")
+    for title, user_type in [("👥 Internal reviewers", UserType.PROFESSOR),
+                             ("🌍 External reviewers", UserType.GUEST_REVIEWER)]:
+        print(f"\n{title} for: {defense.get('thesis_title')}")
+        ranked = reviewer_recommender.recommend(defense, User._load_users(user_type),
+                                                ProfessorSystem._max_review_capacity, args.limit)
+        if not ranked:
+            print("❌ No reviewer with free capacity")
+        for i, r in enumerate(ranked, 1):
+            print(f"{i}. {r['reviewer'].get('name', '-')} ({r['reviewer'].get('user_id', '-')}) "
+                  f"- match {r['score']:.0%} - Reviews: {r['reviews']}/{ProfessorSystem._max_review_capacity}")
@@ -0,0 +1,375 @@
+# sqlite_repository.py
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from repository import (COLLECTION_KEYS, VERSION_FIELD, BaseRepository, JsonRepository,
+                        collection_name, record_key, synchronized)
+from instrumentation import io_stats
+from records import decode_record, encode_record
+
+# ستون‌هایی که برای جستجو ایندکس می‌شوند
+INDEXED_COLUMNS = ["student_id", "professor_id", "status",
+                   "internal_reviewer_id", "external_reviewer_id"]
+
+
+class SqliteRepository(BaseRepository):
+    """SQLite backend with the same interface as JsonRepository.
+
+    Every collection is a table holding one JSON document per row, plus the
+    commonly filtered fields as indexed columns. save() only writes the rows
+    that differ from what is stored, so grading one defense touches one row
+    instead of rewriting the whole history. Single-record writes bump the
+    record's version inside one transaction, and compare_and_swap() only
+    updates the row while it still has the expected version.
+    """
+
+    def __init__(self, db_path: str = "data/thesis.db"):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        # one connection is shared by all threads, so its transactions must not interleave
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # collection -> (data_version, records, serialized record per key)
+        self._cache: Dict[str, Tuple[int, list, Dict[str, str]]] = {}
+        self._tables = set()
+        for name in COLLECTION_KEYS:
+            self._ensure_table(name)
+
+    def _ensure_table(self, name: str):
+        if name in self._tables:
+            return
+        columns = ", ".join(f"{c} TEXT" for c in INDEXED_COLUMNS)
+        with self._conn:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                f'(record_key TEXT PRIMARY KEY, {columns}, data TEXT NOT NULL)')
+            for column in INDEXED_COLUMNS:
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{name}_{column}" ON "{name}" ({column})')
+        self._tables.add(name)
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @staticmethod
+    def _row(key: str, record: dict, text: str) -> tuple:
+        values = [record.get(c) for c in INDEXED_COLUMNS]
+        return (key, *[None if v is None else str(v) for v in values], text)
+
+    @synchronized
+    def load(self, path: str, strict: bool = False) -> List[dict]:
+        """Return the records of the collection behind path (cached)"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        version = self._data_version()
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == version:
+            io_stats.record_cache_hit(path)
+            return cached[1]
+
+        start = time.perf_counter()
+        rows = self._conn.execute(f'SELECT record_key, data FROM "{name}" ORDER BY rowid').fetchall()
+        parse_start = time.perf_counter()
+        records, serialized = [], {}
+        for key, text in rows:
+            records.append(decode_record(name, json.loads(text)))
+            serialized[key] = text
+        end = time.perf_counter()
+        io_stats.record_load(path, end - start, sum(len(text) for text in serialized.values()), end - parse_start)
+        self._cache[name] = (version, records, serialized)
+        return records
+
+    @synchronized
+    def save(self, path: str, records: List[dict]):
+        """Write only the records that were added, changed or removed.
+
+        Runs in one transaction against the rows as they are now: stale
+        records raise ConflictError, and only rows this session had read are
+        deleted (see BaseRepository._merge_save).
+        """
+        name = collection_name(path)
+        key_field = record_key(path)
+        cached = self._cache.get(name)
+        read = {r.get(key_field): r.get(VERSION_FIELD, 0) for r in cached[1]} if cached else {}
+
+        start = time.perf_counter()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            merged, removed = self._merge_save(path, records, read, self.load(path))
+            stored = self._cache[name][2]  # متن ردیف‌ها همان‌طور که الان در پایگاه داده است
+            texts, changed = {}, []
+            for record in merged:
+                key = str(record.get(key_field))
+                text = json.dumps(record, ensure_ascii=False, default=encode_record)
+                texts[key] = text
+                if stored.get(key) != text:
+                    changed.append(self._row(key, record, text))
+            serialized = time.perf_counter()
+            if changed:
+                self._conn.executemany(self._upsert_sql(name), changed)
+            if removed:
+                self._conn.executemany(f'DELETE FROM "{name}" WHERE record_key = ?',
+                                       [(str(key),) for key in removed])
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        io_stats.record_save(path, time.perf_counter() - start, sum(len(row[-1]) for row in changed),
+                             serialized - start)
+        self._cache[name] = (self._data_version(), merged, texts)
+
+    @staticmethod
+    def _upsert_sql(name: str) -> str:
+        columns = ", ".join(INDEXED_COLUMNS)
+        placeholders = ", ".join("?" for _ in range(len(INDEXED_COLUMNS) + 2))
+        updates = ", ".join(f"{c}=excluded.{c}" for c in INDEXED_COLUMNS + ["data"])
+        return (f'INSERT INTO "{name}" (record_key, {columns}, data) VALUES ({placeholders}) '
+                f'ON CONFLICT(record_key) DO UPDATE SET {updates}')
+
+    @synchronized
+    def find(self, path: str, **criteria) -> List[dict]:
+        """Return matching records, using the indexed columns where possible.
+
+        Results are fresh copies, but like every read they are read-only
+        snapshots (see BaseRepository); write changes with update().
+        """
+        name = collection_name(path)
+        self._ensure_table(name)
+        indexed = {k: v for k, v in criteria.items() if k in INDEXED_COLUMNS}
+        where = " AND ".join(f"{k} = ?" for k in indexed) or "1"
+        params = [None if v is None else str(v) for v in indexed.values()]
+        start = time.perf_counter()
+        rows = self._conn.execute(f'SELECT data FROM "{name}" WHERE {where} ORDER BY rowid', params).fetchall()
+        parse_start = time.perf_counter()
+        result = []
+        for (text,) in rows:
+            record = decode_record(name, json.loads(text))
+            if all(record.get(k) == v for k, v in criteria.items()):
+                result.append(record)
+        end = time.perf_counter()
+        io_stats.record_load(path, end - start, sum(len(text) for (text,) in rows), end - parse_start)
+        return result
+
+    @synchronized
+    def scan(self, path: str, start=None, stop=None) -> List[dict]:
+        """Key range read through the primary key index"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        bounds, params = [], []
+        if start is not None:
+            bounds.append("record_key >= ?")
+            params.append(str(start))
+        if stop is not None:
+            bounds.append("record_key < ?")
+            params.append(str(stop))
+        where = " AND ".join(bounds) or "1"
+        start_time = time.perf_counter()
+        rows = self._conn.execute(
+            f'SELECT data FROM "{name}" WHERE {where} ORDER BY record_key', params).fetchall()
+        parse_start = time.perf_counter()
+        result = [decode_record(name, json.loads(text)) for (text,) in rows]
+        end = time.perf_counter()
+        io_stats.record_load(path, end - start_time, sum(len(text) for (text,) in rows), end - parse_start)
+        return result
+
+    @synchronized
+    def get(self, path: str, key) -> Optional[dict]:
+        """Read one record straight from its row"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        start = time.perf_counter()
+        row = self._conn.execute(
+            f'SELECT data FROM "{name}" WHERE record_key = ?', (str(key),)).fetchone()
+        parse_start = time.perf_counter()
+        record = decode_record(name, json.loads(row[0])) if row else None
+        end = time.perf_counter()
+        io_stats.record_load(path, end - start, len(row[0]) if row else 0, end - parse_start)
+        return record
+
+    def upsert(self, path: str, record: dict):
+        """Write a single record as one row"""
+        self._commit(path, record, None)
+
+    def compare_and_swap(self, path: str, record: dict, expected_version: int) -> bool:
+        """Write record only if its row still has expected_version"""
+        return self._commit(path, record, expected_version)
+
+    @synchronized
+    def _commit(self, path: str, record: dict, expected_version: Optional[int]) -> bool:
+        name = collection_name(path)
+        self._ensure_table(name)
+        key = str(record.get(record_key(path)))
+        start = time.perf_counter()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                f'SELECT json_extract(data, \'$.{VERSION_FIELD}\') FROM "{name}" WHERE record_key = ?',
+                (key,)).fetchone()
+            current_version = (row[0] or 0) if row else 0
+            if expected_version is not None and current_version != expected_version:
+                self._conn.rollback()
+                return False
+            record[VERSION_FIELD] = current_version + 1
+            serialize_start = time.perf_counter()
+            text = json.dumps(record, ensure_ascii=False, default=encode_record)
+            serialize_seconds = time.perf_counter() - serialize_start
+            self._conn.execute(self._upsert_sql(name), self._row(key, record, text))
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        io_stats.record_save(path, time.perf_counter() - start, len(text), serialize_seconds)
+
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == self._data_version():
+            records, serialized = cached[1], cached[2]
+            key_field = record_key(path)
+            for i, existing in enumerate(records):
+                if str(existing.get(key_field)) == key:
+                    records[i] = record
+                    break
+            else:
+                records.append(record)
+            serialized[key] = text
+        return True
+
+    @synchronized
+    def insert_many(self, path: str, records: List[dict]) -> List[dict]:
+        """Insert the records whose key has no row yet, inside one transaction"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        key_field = record_key(path)
+        added, keys = [], set()
+        written = 0
+        start = time.perf_counter()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                key = str(record.get(key_field))
+                if key in keys or self._conn.execute(
+                        f'SELECT 1 FROM "{name}" WHERE record_key = ?', (key,)).fetchone():
+                    continue
+                keys.add(key)
+                record[VERSION_FIELD] = 1
+                text = json.dumps(record, ensure_ascii=False, default=encode_record)
+                self._conn.execute(self._upsert_sql(name), self._row(key, record, text))
+                added.append(record)
+                written += len(text)
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        io_stats.record_save(path, time.perf_counter() - start, written, 0)
+        if added:
+            self._cache.pop(name, None)
+        return added
+
+    @synchronized
+    def update_many(self, path: str, mutations) -> Dict[object, Tuple[dict, dict]]:
+        """Apply several single-record mutations inside one transaction"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        changed = {}
+        written = 0
+        start = time.perf_counter()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, mutate in mutations.items():
+                row = self._conn.execute(
+                    f'SELECT data FROM "{name}" WHERE record_key = ?', (str(key),)).fetchone()
+                if row is None:
+                    continue
+                before = decode_record(name, json.loads(row[0]))
+                candidate = decode_record(name, json.loads(row[0]))
+                if mutate(candidate) is False:
+                    continue
+                candidate[VERSION_FIELD] = before.get(VERSION_FIELD, 0) + 1
+                text = json.dumps(candidate, ensure_ascii=False, default=encode_record)
+                self._conn.execute(self._upsert_sql(name), self._row(str(key), candidate, text))
+                changed[key] = (before, candidate)
+                written += len(text)
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        io_stats.record_save(path, time.perf_counter() - start, written, 0)
+        if changed:
+            self._cache.pop(name, None)
+        return changed
+
+    @synchronized
+    def remove_many(self, path: str, checks) -> Dict[object, dict]:
+        """Delete the records whose check passes, inside one transaction"""
+        name = collection_name(path)
+        self._ensure_table(name)
+        removed = {}
+        start = time.perf_counter()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, check in checks.items():
+                row = self._conn.execute(
+                    f'SELECT data FROM "{name}" WHERE record_key = ?', (str(key),)).fetchone()
+                if row is None:
+                    continue
+                record = decode_record(name, json.loads(row[0]))
+                if check(record):
+                    self._conn.execute(f'DELETE FROM "{name}" WHERE record_key = ?', (str(key),))
+                    removed[key] = record
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        io_stats.record_save(path, time.perf_counter() - start, 0, 0)
+        if removed:
+            self._cache.pop(name, None)
+        return removed
+
+    @synchronized
+    def invalidate(self, path: str = None):
+        if path is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(collection_name(path), None)
+
+
+def migrate_json_to_sqlite(db_path: str = "data/thesis.db", data_dir: str = "data",
+                           overwrite: bool = False) -> Dict[str, int]:
+    """One-shot import of the data/*.json files into the SQLite database.
+
+    Collections that already have rows are skipped unless overwrite is set.
+    Returns the number of records imported per collection.
+    """
+    json_repo = JsonRepository()
+    sqlite_repo = SqliteRepository(db_path)
+    imported = {}
+    for name in COLLECTION_KEYS:
+        json_path = os.path.join(data_dir, f"{name}.json")
+        existing = sqlite_repo.load(json_path)
+        if existing and not overwrite:
+            print(f"⏭️ {name}: already has {len(existing)} records, skipped")
+            continue
+        if existing:
+            sqlite_repo.save(json_path, [])  # ردیف‌های قبلی پاک می‌شوند تا با نسخه‌هایشان تداخل نکنند
+        records = json_repo.load(json_path)
+        sqlite_repo.save(json_path, records)
+        imported[name] = len(records)
+        print(f"✅ {name}: {len(records)} records imported")
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the JSON data files into SQLite")
+    parser.add_argument("--db", default="data/thesis.db", help="SQLite database path")
+    parser.add_argument("--data-dir", default="data", help="directory holding the JSON files")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="replace collections that already have rows")
+    args = parser.parse_args()
+    migrate_json_to_sqlite(args.db, args.data_dir, args.overwrite)
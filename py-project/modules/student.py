@@ -1,30 +1,28 @@
 # student.py
 from user import User, UserType
+from repository import repository, record_key, ConflictError
+from upload_store import upload_store
+from profiling import menu_action
+from ids import id_generator
+from thesis_search import thesis_search
+from course_catalog import course_catalog, request_history
+from archive import cold_archive
+from reservations import seat_reservations, pending_request
+from final_grades import final_grades
+from records import RequestStatus, DefenseStatus, DefenseRequest
 import json
 from datetime import datetime, timedelta
-from enum import Enum
 from pathlib import Path
 from werkzeug.utils import secure_filename
 import os
 
-class RequestStatus(Enum):
-    PENDING = "Pending Approval"
-    APPROVED = "Approved"
-    REJECTED = "Rejected"
-
-class DefenseStatus(Enum):
-    UNDER_REVIEW = "Under Review"
-    APPROVED = "Approved"
-    REJECTED = "Rejected"
-
 class StudentSystem(User):
     _thesis_requests_file = "data/thesis_requests.json"
     _defense_requests_file = "data/defense_requests.json"
     _courses_file = "data/courses.json"
     
-    def __init__(self, user_id: str):
-        users = self._load_users(UserType.STUDENT)
-        user_data = next((user for user in users if user["user_id"] == user_id), None)
+    def __init__(self, user_id: str, verbose: bool = True):
+        user_data = self._users_directory().get(UserType.STUDENT, user_id)
         
         if user_data:
             super().__init__(
@@ -35,7 +33,8 @@ class StudentSystem(User):
                 national_id=user_data.get("national_id"),
                 major=user_data.get("major")
             )
-            print(f"🎓 Student System initialized for: {self.name}")
+            if verbose:
+                print(f"🎓 Student System initialized for: {self.name}")
         else:
             raise ValueError(f"Student with ID {user_id} not found")
     
@@ -54,19 +53,18 @@ class StudentSystem(User):
             print("7. Logout")
             
             choice = input("\nSelect option: ")
+            actions = {
+                "1": self.request_thesis_course,
+                "2": self.view_thesis_status,
+                "3": self.request_defense,
+                "4": self.view_defense_status,
+                "5": self.view_my_grade,
+                "6": self.change_password_menu
+            }
             
-            if choice == "1":
-                self.request_thesis_course()
-            elif choice == "2":
-                self.view_thesis_status()
-            elif choice == "3":
-                self.request_defense()
-            elif choice == "4":
-                self.view_defense_status()
-            elif choice == "5":
-                self.view_my_grade()
-            elif choice == "6":
-                self.change_password_menu()
+            if choice in actions:
+                with menu_action("student", actions[choice], self.user_type.value):
+                    actions[choice]()
             elif choice == "7":
                 print("👋 Logging out...")
                 break
@@ -76,23 +74,17 @@ class StudentSystem(User):
     def request_thesis_course(self):
         print("\n📝 Available Thesis Courses:")
     
-        courses = self._load_courses()
-        available_courses = [c for c in courses if c.get("capacity",0) > 0 
-                             and c.get("major","").lower() == (self.major or "").lower()]
+        available_courses = self._available_courses()
     
         if not available_courses:
             print("❌ No available courses for your major")
+            self._offer_waitlist()
             return
     
-        existing_requests = self._load_thesis_requests()
-        student_requests = [r for r in existing_requests if r.get("student_id") == self.user_id]
-    
-        if any(r.get("status") == RequestStatus.PENDING.value for r in student_requests):
-            print("❌ You already have a pending request")
-            return
-    
-        if any(r.get("status") == RequestStatus.APPROVED.value for r in student_requests):
-            print("✅ You already have an approved thesis course")
+        student_requests = self._thesis_history()
+        blocked = self._thesis_request_block(student_requests)
+        if blocked:
+            print(blocked)
             return
     
         rejected_requests = [r for r in student_requests if r.get("status") == RequestStatus.REJECTED.value]
@@ -105,99 +97,197 @@ class StudentSystem(User):
         try:
             choice = int(input("\nSelect course number: ")) - 1
             if 0 <= choice < len(available_courses):
-                selected_course = available_courses[choice]
-                thesis_request = {
-                    "request_id": f"TR_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    "student_id": self.user_id,
-                    "student_name": self.name,
-                    "course_id": selected_course.get("course_id"),
-                    "course_title": selected_course.get("title"),
-                    "professor": selected_course.get("professor"),
-                    "request_date": datetime.now().isoformat(),
-                    "status": RequestStatus.PENDING.value,
-                    "major": self.major
-                }
-            
-                existing_requests.append(thesis_request)
-                self._save_thesis_requests(existing_requests)
-            
-                for course in courses:
-                    if course.get("course_id") == selected_course.get("course_id"):
-                        course["capacity"] = course.get("capacity",0) - 1
-                        break
-                self._save_courses(courses)
+                if not self._submit_thesis_request(available_courses[choice]):
+                    print("❌ This course has just been filled, please choose another one")
+                    self._offer_waitlist()
+                    return
             
                 print("✅ Thesis request submitted successfully!")
         except ValueError:
             print("❌ Please enter a valid number")
+        except ConflictError as e:
+            print(f"❌ {e}, please try again")
 
-    def request_defense(self):
-        print("\n🎓 Thesis Defense Request")
-    
-        thesis_requests = self._load_thesis_requests()
-        approved_thesis = next((t for t in thesis_requests 
-                            if t.get("student_id") == self.user_id 
-                            and t.get("status") == RequestStatus.APPROVED.value), None)
-    
-        if not approved_thesis:
-            print("❌ You need an approved thesis course first")
+    def _thesis_history(self, status: str = None) -> list:
+        """The student's thesis requests, archived ones included"""
+        current = request_history.history(self.user_id, status)
+        return current + self._archived(self._thesis_requests_file, current, status=status)
+
+    def _defense_history(self, **criteria) -> list:
+        """The student's defense requests, archived ones included"""
+        current = repository.find(self._defense_requests_file, student_id=self.user_id, **criteria)
+        return current + self._archived(self._defense_requests_file, current, **criteria)
+
+    def _archived(self, path: str, current: list, **criteria) -> list:
+        # رکوردی که هم در فایل اصلی و هم در بایگانی است (اجرای قطع‌شده) یک بار نشان داده می‌شود
+        key_field = record_key(path)
+        keys = {r.get(key_field) for r in current}
+        criteria = {field: value for field, value in criteria.items() if value is not None}
+        return [r for r in cold_archive.find(path, student_id=self.user_id, **criteria)
+                if r.get(key_field) not in keys]
+
+    def _available_courses(self) -> list:
+        """Courses of the student's major that still have free seats"""
+        if not self._load_courses():
+            return []
+        # صندلی درخواست‌های منقضی‌شده قبل از نمایش آزاد می‌شود
+        seat_reservations.expire()
+        return course_catalog.available(self.major)
+
+    def _offer_waitlist(self):
+        """Let the student queue for a full course of their major"""
+        full_courses = seat_reservations.full_courses(self.major)
+        if not full_courses or self._thesis_request_block(self._thesis_history()):
             return
-    
-        approval_date = datetime.fromisoformat(approved_thesis.get("approval_date", datetime.now().isoformat()))
-        if datetime.now() < approval_date + timedelta(minutes=3):
-            print("❌ You need to wait 3 minutes after thesis approval")
+
+        print("\n⏳ Full courses you can wait for:")
+        for i, course in enumerate(full_courses, 1):
+            print(f"{i}. {course.get('title')} - Professor: {course.get('professor')} - "
+                  f"Waiting: {len(course.get('waitlist') or [])}")
+        try:
+            choice = int(input("\nSelect course number to join its waitlist (0 to skip): ")) - 1
+        except ValueError:
+            print("❌ Please enter a valid number")
             return
+        if not 0 <= choice < len(full_courses):
+            return
+        place = self._join_waitlist(full_courses[choice].get("course_id"))
+        if place is None:
+            print("✅ A seat has just been freed in this course, please request it")
+        else:
+            print(f"✅ You are number {place} on the waitlist; a request is filed for you when a seat frees up")
+
+    def _join_waitlist(self, course_id) -> int:
+        return seat_reservations.join_waitlist(course_id, self.user_id, self.name, self.major)
+
+    @staticmethod
+    def _thesis_request_block(student_requests: list):
+        """Message explaining why a new thesis request is not allowed, or None"""
+        if any(r.get("status") == RequestStatus.PENDING.value for r in student_requests):
+            return "❌ You already have a pending request"
+        if any(r.get("status") == RequestStatus.APPROVED.value for r in student_requests):
+            return "✅ You already have an approved thesis course"
+        return None
+
+    def _submit_thesis_request(self, course: dict):
+        """Take a seat in course and store a pending request; None if it is full"""
+        thesis_request = pending_request(self.user_id, self.name, self.major, course)
+
+        # رزرو صندلی قبل از ثبت درخواست تا ظرفیت منفی نشود
+        if not self._take_course_seat(course.get("course_id")):
+            return None
+
+        try:
+            self._save_thesis_request(thesis_request)
+        except Exception:
+            # درخواست ثبت نشد؛ صندلی نباید از دست برود
+            seat_reservations.release(course.get("course_id"))
+            raise
+        return thesis_request
+
+    def _take_course_seat(self, course_id) -> bool:
+        """Atomically decrement a course's capacity; False if it is full"""
+        def take_seat(course):
+            if course.get("capacity", 0) <= 0:
+                return False
+            course["capacity"] = course.get("capacity", 0) - 1
+
+        if repository.update(self._courses_file, course_id, take_seat) is None:
+            return False
+        course_catalog.course_changed(course_id)
+        return True
+
+    def request_defense(self):
+        print("\n🎓 Thesis Defense Request")
     
-        defense_requests = self._load_defense_requests()
-        existing_defenses = [d for d in defense_requests if d.get("student_id") == self.user_id]
-    
-        if any(d.get("status") in [DefenseStatus.UNDER_REVIEW.value, DefenseStatus.APPROVED.value] for d in existing_defenses):
-            print("❌ You already have a defense request in process")
+        approved_thesis, blocked = self._defense_request_block()
+        if blocked:
+            print(blocked)
             return
     
-        rejected_defenses = [d for d in existing_defenses if d.get("status") == DefenseStatus.REJECTED.value]
+        rejected_defenses = repository.find(self._defense_requests_file, student_id=self.user_id,
+                                            status=DefenseStatus.REJECTED.value)
         if rejected_defenses:
             print("⚠️ Your previous defense request was rejected. You can submit a new request.")
     
+        # فایل‌ها در پس‌زمینه کپی و بررسی می‌شوند تا دانشجو فرم را ادامه دهد
+        print("\n📁 File Upload:")
+        pdf_upload = self._upload_file("thesis_pdf")
+        first_page_upload = self._upload_file("first_page_image") if pdf_upload else None
+
+        if not pdf_upload or not first_page_upload:
+            print("❌ File upload failed")
+            return
+
         print("\nPlease provide defense information:")
         thesis_title = input("Thesis Title: ")
         abstract = input("Abstract: ")
         keywords = input("Keywords (comma-separated): ")
 
-        print("\n📁 File Upload:")
-        pdf_path = self._upload_file("thesis_pdf")
-        first_page_path = self._upload_file("first_page_image")
+        pdf_file = self._wait_for_upload("thesis_pdf", pdf_upload)
+        first_page_file = self._wait_for_upload("first_page_image", first_page_upload)
 
-        if not pdf_path or not first_page_path:
+        if not pdf_file or not first_page_file:
             print("❌ File upload failed")
             return
     
-        defense_request = {
-            "defense_id": f"DR_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        self._submit_defense_request(approved_thesis, thesis_title, abstract, keywords,
+                                     pdf_file, first_page_file)
+    
+        print("✅ Defense request submitted successfully!")
+
+    def _defense_request_block(self):
+        """(approved thesis request, None) or (None, message why a defense can't be requested)"""
+        approved_thesis = next(iter(self._thesis_history(RequestStatus.APPROVED.value)), None)
+    
+        if not approved_thesis:
+            return None, "❌ You need an approved thesis course first"
+    
+        approval_date = datetime.fromisoformat(approved_thesis.get("approval_date", datetime.now().isoformat()))
+        if datetime.now() < approval_date + timedelta(minutes=3):
+            return None, "❌ You need to wait 3 minutes after thesis approval"
+    
+        existing_defenses = self._defense_history()
+        if any(d.get("status") in [DefenseStatus.UNDER_REVIEW.value, DefenseStatus.APPROVED.value] for d in existing_defenses):
+            return None, "❌ You already have a defense request in process"
+        return approved_thesis, None
+
+    def _submit_defense_request(self, approved_thesis: dict, thesis_title: str, abstract: str,
+                                keywords: str, pdf_file: dict, first_page_file: dict) -> dict:
+        """Store a defense request for files already placed in the upload store"""
+        defense_request = DefenseRequest({
+            "defense_id": id_generator.next_id("DR"),
             "student_id": self.user_id,
             "student_name": self.name,
             "thesis_title": thesis_title,
             "abstract": abstract,
             "keywords": [k.strip() for k in keywords.split(",") if k.strip()],
-            "pdf_path": pdf_path,
-            "first_page_path": first_page_path,
+            "pdf_path": pdf_file["path"],
+            "pdf_sha256": pdf_file["sha256"],
+            "pdf_size": pdf_file["size"],
+            "pdf_pages": pdf_file["pages"],
+            "first_page_path": first_page_file["path"],
+            "first_page_sha256": first_page_file["sha256"],
+            "first_page_size": first_page_file["size"],
+            "upload_validation": {
+                "thesis_pdf": self._validation_summary(pdf_file),
+                "first_page_image": self._validation_summary(first_page_file)
+            },
             "request_date": datetime.now().isoformat(),
             "status": DefenseStatus.UNDER_REVIEW.value,
             "professor": approved_thesis.get("professor"),
             "professor_id": approved_thesis.get("professor_id"),
             "course_id": approved_thesis.get("course_id")
-        }
-    
-        defense_requests.append(defense_request)
-        self._save_defense_requests(defense_requests)
+        })
     
-        print("✅ Defense request submitted successfully!")
+        self._save_defense_request(defense_request)
+        thesis_search.add(defense_request)
+        return defense_request
 
     def view_thesis_status(self):
         print("\n📊 Thesis Request Status:")
         
-        thesis_requests = self._load_thesis_requests()
-        student_requests = [r for r in thesis_requests if r.get("student_id") == self.user_id]
+        student_requests = self._thesis_history()
         
         if not student_requests:
             print("❌ No thesis requests found")
@@ -208,13 +298,14 @@ class StudentSystem(User):
             print(f"Course: {request.get('course_title')}")
             print(f"Professor: {request.get('professor')}")
             print(f"Status: {request.get('status')}")
+            if request.get("rejection_reason"):
+                print(f"Reason: {request.get('rejection_reason')}")
             print(f"Request Date: {request.get('request_date')}")
 
     def view_defense_status(self):
         print("\n📊 Defense Request Status:")
         
-        defense_requests = self._load_defense_requests()
-        student_requests = [r for r in defense_requests if r.get("student_id") == self.user_id]
+        student_requests = self._defense_history()
         
         if not student_requests:
             print("❌ No defense requests found")
@@ -231,23 +322,19 @@ class StudentSystem(User):
     def view_my_grade(self):
         """Show the grade assigned to the student (if any)"""
         print("\n📌 My Defense Grade")
-        defense_requests = self._load_defense_requests()
-        my_defenses = [d for d in defense_requests if d.get("student_id") == self.user_id and d.get("status") == DefenseStatus.APPROVED.value]
+        my_grades = final_grades.for_student(self.user_id)
         
-        if not my_defenses:
+        if not my_grades:
             print("❌ No approved defense found or not graded yet")
             return
         
-        for d in my_defenses:
+        for d in my_grades:
             print(f"\nDefense ID: {d.get('defense_id')}")
             print(f"Thesis: {d.get('thesis_title')}")
-            grades = d.get("grades", {})
-            if not grades:
-                print("⏰ No grades submitted yet")
-                continue
+            print(self._final_grade_line(d))
 
             # نمایش تمامی نمرات دریافتی از داوران
-            for reviewer_id, info in grades.items():
+            for reviewer_id, info in d.get("grades", {}).items():
                 print(f"\nReviewer: {info.get('reviewer_name','-')} ({reviewer_id})")
                 print(f"Type: {info.get('reviewer_type','-')}")
                 print(f"Grade: {info.get('label','-')}")
@@ -255,6 +342,13 @@ class StudentSystem(User):
                     print(f"Comments: {info.get('comments')}")
                 print(f"Grading Date: {info.get('grading_date','-')}")
 
+    @staticmethod
+    def _final_grade_line(record: dict) -> str:
+        """Final grade of a stored final-grade record, or what it still waits for"""
+        if record.get("final_label"):
+            return f"🏁 Final Grade: {record['final_label']} ({record.get('score', 0):.2f})"
+        return f"⏳ Final grade pending: waiting for {', '.join(record.get('awaiting') or ['grades'])} reviewer"
+
     def change_password_menu(self):
         print("\n🔄 Change Password")
         old_password = input("Current password: ")
@@ -265,44 +359,32 @@ class StudentSystem(User):
 
     # File management methods
     def _load_thesis_requests(self):
-        try:
-            with open(self._thesis_requests_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return repository.load(self._thesis_requests_file)
 
-    def _save_thesis_requests(self, requests):
-        os.makedirs(os.path.dirname(self._thesis_requests_file), exist_ok=True)
-        with open(self._thesis_requests_file, 'w', encoding='utf-8') as f:
-            json.dump(requests, f, ensure_ascii=False, indent=2)
+    def _save_thesis_request(self, request):
+        repository.upsert(self._thesis_requests_file, request)
 
     def _load_defense_requests(self):
-        try:
-            with open(self._defense_requests_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return repository.load(self._defense_requests_file)
 
-    def _save_defense_requests(self, requests):
-        os.makedirs(os.path.dirname(self._defense_requests_file), exist_ok=True)
-        with open(self._defense_requests_file, 'w', encoding='utf-8') as f:
-            json.dump(requests, f, ensure_ascii=False, indent=2)
+    def _save_defense_request(self, request):
+        repository.upsert(self._defense_requests_file, request)
 
     def _load_courses(self):
         try:
-            with open(self._courses_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return repository.load(self._courses_file, strict=True)
         except (FileNotFoundError, json.JSONDecodeError):
             print("❌ courses.json file not found or invalid format")
             print("Please create a courses.json file in data folder")
             return []
-    
-    def _save_courses(self, courses):
-        os.makedirs(os.path.dirname(self._courses_file), exist_ok=True)
-        with open(self._courses_file, 'w', encoding='utf-8') as f:
-            json.dump(courses, f, ensure_ascii=False, indent=2)
 
-    def _upload_file(self, file_type: str, max_attempts: int = 3) -> str:
+    _upload_kinds = {
+        "thesis_pdf": ["pdf"],
+        "first_page_image": ["pdf", "jpeg", "png"]
+    }
+
+    def _upload_file(self, file_type: str, max_attempts: int = 3):
+        """Ask for a file and start copying it; returns (filename, Future) or None"""
         attempt = 0
 
         while attempt < max_attempts:
@@ -316,7 +398,7 @@ class StudentSystem(User):
         
                 file_path = file_path.strip().strip('"').strip("'").strip('&').strip()
         
-                if not os.path.exists(file_path):
+                if not os.path.isfile(file_path):
                     print("❌ File not found! Please check the path.")
                     attempt += 1
                     continue
@@ -331,38 +413,11 @@ class StudentSystem(User):
                     print("❌ Only PDF, JPG, JPEG, PNG files are allowed for first page!")
                     attempt += 1
                     continue
-                    
-                upload_dir = Path("uploads/theses")
-                upload_dir.mkdir(parents=True, exist_ok=True)
-        
-                original_filename = os.path.basename(file_path)
-                secure_name = secure_filename(original_filename)
-                filename_base = secure_name.rsplit('.', 1)[0] if '.' in secure_name else secure_name
-
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-
-                destination_path = None
-                for counter in range(10):
-                    if counter == 0:
-                        new_filename = f"{self.user_id}_{filename_base}_{timestamp}{file_ext}"
-                    else:
-                        new_filename = f"{self.user_id}_{filename_base}_{timestamp}_{counter}{file_ext}"
-                
-                    current_path = upload_dir / new_filename
-                    if not current_path.exists():
-                        destination_path = current_path
-                        break
-            
-                if destination_path is None:
-                    print("❌ Could not create unique filename")
-                    attempt += 1
-                    continue
-        
-                import shutil
-                shutil.copy2(file_path, destination_path)
-        
-                print(f"✅ {file_type} uploaded successfully: {new_filename}")
-                return str(destination_path)
+
+                filename = secure_filename(os.path.basename(file_path))
+                future = upload_store.submit(file_path, file_ext, self._upload_kinds.get(file_type))
+                print(f"⏳ {file_type} is being uploaded in the background: {filename}")
+                return filename, future
         
             except Exception as e:
                 print(f"❌ Error uploading file: {e}")
@@ -372,31 +427,53 @@ class StudentSystem(User):
         print(f"❌ Failed to upload {file_type} after {max_attempts} attempts")
         return None
 
+    def _wait_for_upload(self, file_type: str, upload) -> dict:
+        """Wait for a background upload; returns the stored file info or None"""
+        filename, future = upload
+        try:
+            stored = future.result()
+        except Exception as e:
+            print(f"❌ Error uploading {file_type}: {e}")
+            return None
+
+        if not stored["valid"]:
+            print(f"❌ {file_type} ({filename}) was rejected:")
+            for error in stored["errors"]:
+                print(f"   - {error}")
+            return None
+
+        pages = f", {stored['pages']} pages" if stored["pages"] else ""
+        if stored["deduplicated"]:
+            print(f"✅ {file_type} already stored, reusing it: {filename} ({stored['size']} bytes{pages})")
+        else:
+            print(f"✅ {file_type} uploaded successfully: {filename} ({stored['size']} bytes{pages})")
+        return stored
+
+    @staticmethod
+    def _validation_summary(stored: dict) -> dict:
+        return {
+            "valid": stored["valid"],
+            "kind": stored["kind"],
+            "errors": stored["errors"],
+            "validated_date": datetime.now().isoformat()
+        }
+
     def student_grade(self):
         """Show the grade assigned to the student (if any)"""
         print("\n📌 My Defense Grade")
-        defense_requests = self._load_defense_requests()
-        my_defenses = [
-            d for d in defense_requests
-            if d.get("student_id") == self.user_id
-            and d.get("status") == DefenseStatus.APPROVED.value
-            ]
-
-        if not my_defenses:
+        my_grades = final_grades.for_student(self.user_id)
+
+        if not my_grades:
             print("❌ No approved defense found or not graded yet")
             return
 
-        for d in my_defenses:
+        for d in my_grades:
             print(f"\n🎓 Defense ID: {d.get('defense_id')}")
             print(f"Thesis: {d.get('thesis_title')}")
-            grades = d.get("grades", {})
+            print(self._final_grade_line(d))
 
-            if not grades:
-                print("⏰ No grades submitted yet")
-                continue
-                
             print("📊 Received Grades:")
-            for reviewer_id, info in grades.items():
+            for reviewer_id, info in d.get("grades", {}).items():
                 reviewer_name = info.get('reviewer_name', 'Unknown')
                 reviewer_type = info.get('reviewer_type', '-')
                 grade_label = info.get('label', '-')
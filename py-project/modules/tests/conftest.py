@@ -0,0 +1,23 @@
+# conftest.py
+import os
+import sys
+
+import pytest
+
+# ماژول‌ها در پوشه‌ی بالایی و بدون بسته‌بندی هستند
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# مخزن سراسری ماژول‌ها JSON است؛ SQLite هنگام import به پایگاه داده‌ی واقعی وصل می‌شد
+os.environ.pop("THESIS_STORAGE", None)
+os.environ.pop("THESIS_DB_PATH", None)
+
+from repository import repository  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run the test inside an empty working directory with a data/ folder"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    repository.invalidate()
+    yield tmp_path
+    repository.invalidate()
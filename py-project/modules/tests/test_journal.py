@@ -0,0 +1,142 @@
+# test_journal.py
+import json
+import os
+
+import pytest
+
+from journal import JournaledJsonRepository
+
+REQUESTS = "data/thesis_requests.json"
+JOURNAL = "data/thesis_requests.journal.jsonl"
+
+
+@pytest.fixture
+def journaled(data_dir):
+    """A journaled repository that never compacts on its own"""
+    return JournaledJsonRepository(compact_threshold=10 ** 9)
+
+
+def request_record(request_id, **fields):
+    return {"request_id": request_id, "status": "Pending Approval", **fields}
+
+
+def journal_ops():
+    with open(JOURNAL, encoding="utf-8") as f:
+        return [json.loads(line)["op"] for line in f]
+
+
+def keys(records):
+    return [r["request_id"] for r in records]
+
+
+def test_upsert_appends_to_the_journal_only(journaled):
+    journaled.save(REQUESTS, [request_record("TR_1")])
+    with open(REQUESTS, encoding="utf-8") as f:
+        snapshot = f.read()
+
+    journaled.upsert(REQUESTS, request_record("TR_2"))
+    journaled.upsert(REQUESTS, request_record("TR_1", status="Approved"))
+
+    with open(REQUESTS, encoding="utf-8") as f:
+        assert f.read() == snapshot
+    assert journal_ops() == ["put", "put"]
+    replayed = JournaledJsonRepository().load(REQUESTS)
+    assert keys(replayed) == ["TR_1", "TR_2"]
+    assert replayed[0]["status"] == "Approved"
+
+
+def test_load_reads_lines_appended_by_another_session(journaled):
+    journaled.save(REQUESTS, [request_record("TR_1")])
+    handed_out = journaled.load(REQUESTS)
+
+    JournaledJsonRepository().upsert(REQUESTS, request_record("TR_1", status="Approved"))
+
+    assert journaled.load(REQUESTS)[0]["status"] == "Approved"
+    # لیستی که قبلا داده شده عوض نمی‌شود تا ایندکس‌های روی آن دوباره ساخته شوند
+    assert handed_out[0]["status"] == "Pending Approval"
+
+
+def test_compact_folds_the_journal_into_the_snapshot(journaled):
+    journaled.save(REQUESTS, [request_record("TR_1")])
+    journaled.upsert(REQUESTS, request_record("TR_2"))
+    journaled.upsert(REQUESTS, request_record("TR_2", status="Approved"))
+
+    assert journaled.compact(REQUESTS) == 2
+    assert not os.path.exists(JOURNAL)
+    with open(REQUESTS, encoding="utf-8") as f:
+        assert [r["status"] for r in json.load(f)] == ["Pending Approval", "Approved"]
+    assert journaled.compact(REQUESTS) == 0
+
+
+def test_compaction_runs_once_the_threshold_is_reached(data_dir):
+    repo = JournaledJsonRepository(compact_threshold=3)
+    for i in range(3):
+        repo.upsert(REQUESTS, request_record(f"TR_{i}"))
+    assert not os.path.exists(JOURNAL)
+    assert keys(JournaledJsonRepository().load(REQUESTS)) == ["TR_0", "TR_1", "TR_2"]
+
+
+def test_interrupted_compaction_is_replayed_and_finished(journaled):
+    journaled.save(REQUESTS, [request_record("TR_1")])
+    journaled.upsert(REQUESTS, request_record("TR_2"))
+    # کرش بعد از تغییر نام ژورنال و پیش از نوشتن snapshot
+    os.replace(JOURNAL, JOURNAL + ".compacting")
+    journaled.upsert(REQUESTS, request_record("TR_3"))
+
+    assert keys(JournaledJsonRepository().load(REQUESTS)) == ["TR_1", "TR_2", "TR_3"]
+    journaled.compact(REQUESTS)
+    assert not os.path.exists(JOURNAL + ".compacting")
+    assert keys(JournaledJsonRepository().load(REQUESTS)) == ["TR_1", "TR_2", "TR_3"]
+
+
+def test_records_dropped_by_a_save_are_journaled_before_the_snapshot_changes(journaled, monkeypatch):
+    journaled.save(REQUESTS, [request_record(f"TR_{i}") for i in range(4)])
+    journaled.upsert(REQUESTS, request_record("TR_1", status="Rejected"))
+    # کرش درست بعد از نوشتن خطوط حذف، پیش از تا کردن ژورنال
+    monkeypatch.setattr(journaled, "_fold", lambda path: 0)
+
+    records = journaled.load(REQUESTS)
+    journaled.save(REQUESTS, [records[0], records[2]])
+
+    assert journal_ops()[-2:] == ["delete", "delete"]
+    reopened = JournaledJsonRepository()
+    assert keys(reopened.load(REQUESTS)) == ["TR_0", "TR_2"]
+    assert reopened.find(REQUESTS, request_id="TR_1") == []
+
+
+def test_a_record_put_again_after_its_delete_comes_back(journaled, monkeypatch):
+    journaled.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    monkeypatch.setattr(journaled, "_fold", lambda path: 0)
+    journaled.save(REQUESTS, journaled.load(REQUESTS)[1:])
+    journaled.upsert(REQUESTS, request_record("TR_1", status="Approved"))
+
+    replayed = JournaledJsonRepository().load(REQUESTS)
+    assert keys(replayed) == ["TR_2", "TR_1"]
+    assert replayed[1]["status"] == "Approved"
+
+
+def test_removals_are_journaled_before_the_snapshot_changes(journaled, monkeypatch):
+    journaled.save(REQUESTS, [request_record(f"TR_{i}") for i in range(4)])
+    journaled.update(REQUESTS, "TR_1", lambda r: r.update(status="Rejected"))
+    # کرش درست بعد از نوشتن خطوط حذف، پیش از تا کردن ژورنال
+    monkeypatch.setattr(journaled, "_fold", lambda path: 0)
+
+    removed = journaled.remove_many(REQUESTS, {"TR_1": lambda r: True, "TR_3": lambda r: True})
+
+    assert set(removed) == {"TR_1", "TR_3"}
+    assert journal_ops()[-2:] == ["delete", "delete"]
+    reopened = JournaledJsonRepository()
+    assert keys(reopened.load(REQUESTS)) == ["TR_0", "TR_2"]
+    assert reopened.get(REQUESTS, "TR_2")["request_id"] == "TR_2"
+    assert reopened.get(REQUESTS, "TR_1") is None
+
+
+def test_remove_many_folds_the_journal(journaled):
+    journaled.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    journaled.upsert(REQUESTS, request_record("TR_3"))
+
+    journaled.remove_many(REQUESTS, {"TR_2": lambda r: True})
+
+    assert not os.path.exists(JOURNAL)
+    with open(REQUESTS, encoding="utf-8") as f:
+        assert keys(json.load(f)) == ["TR_1", "TR_3"]
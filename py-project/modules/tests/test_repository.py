@@ -0,0 +1,169 @@
+# test_repository.py
+import copy
+
+import pytest
+
+from repository import JsonRepository, ConflictError, VERSION_FIELD
+from journal import JournaledJsonRepository
+from sqlite_repository import SqliteRepository
+
+REQUESTS = "data/thesis_requests.json"
+
+
+@pytest.fixture(params=["json", "journal", "sqlite"])
+def open_session(request, data_dir):
+    """Factory of independent sessions (like two terminals) over one data directory"""
+    def open_session():
+        if request.param == "sqlite":
+            return SqliteRepository("data/thesis.db")
+        if request.param == "journal":
+            return JournaledJsonRepository()
+        return JsonRepository()
+    return open_session
+
+
+def request_record(request_id, **fields):
+    return {"request_id": request_id, "student_id": "S1", "status": "Pending Approval", **fields}
+
+
+def editable(session, path=REQUESTS):
+    """What a menu does before a whole-collection save: private copies of the loaded records"""
+    return [copy.deepcopy(r) for r in session.load(path)]
+
+
+def test_save_bumps_the_version_of_changed_records_only(open_session):
+    first = open_session()
+    first.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    records = editable(first)
+    records[0]["status"] = "Approved"
+    first.save(REQUESTS, records)
+
+    stored = {r["request_id"]: r for r in open_session().load(REQUESTS)}
+    assert stored["TR_1"]["status"] == "Approved"
+    assert stored["TR_1"].get(VERSION_FIELD, 0) == stored["TR_2"].get(VERSION_FIELD, 0) + 1
+
+
+def test_save_rejects_a_record_changed_by_another_session(open_session):
+    first, second = open_session(), open_session()
+    first.save(REQUESTS, [request_record("TR_1")])
+    records = editable(first)
+
+    second.update(REQUESTS, "TR_1", lambda r: r.update(status="Approved"))
+    records[0]["status"] = "Rejected"
+    with pytest.raises(ConflictError):
+        first.save(REQUESTS, records)
+    assert open_session().get(REQUESTS, "TR_1")["status"] == "Approved"
+
+
+def test_save_rejects_dropping_a_record_changed_by_another_session(open_session):
+    first, second = open_session(), open_session()
+    first.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    records = editable(first)
+
+    second.update(REQUESTS, "TR_2", lambda r: r.update(status="Approved"))
+    with pytest.raises(ConflictError):
+        first.save(REQUESTS, records[:1])
+    assert open_session().get(REQUESTS, "TR_2") is not None
+
+
+def test_save_keeps_records_added_by_another_session(open_session):
+    first, second = open_session(), open_session()
+    first.save(REQUESTS, [request_record("TR_1")])
+    records = editable(first)
+
+    second.upsert(REQUESTS, request_record("TR_2"))
+    records[0]["status"] = "Approved"
+    first.save(REQUESTS, records)
+
+    stored = {r["request_id"]: r["status"] for r in open_session().load(REQUESTS)}
+    assert stored == {"TR_1": "Approved", "TR_2": "Pending Approval"}
+
+
+def test_save_removes_records_only_this_session_read(open_session):
+    first = open_session()
+    first.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    first.save(REQUESTS, editable(first)[:1])
+    assert [r["request_id"] for r in open_session().load(REQUESTS)] == ["TR_1"]
+
+
+def test_compare_and_swap_only_replaces_the_expected_version(open_session):
+    first, second = open_session(), open_session()
+    first.upsert(REQUESTS, request_record("TR_1"))
+    version = first.get(REQUESTS, "TR_1")[VERSION_FIELD]
+
+    assert second.compare_and_swap(REQUESTS, request_record("TR_1", status="Approved"), version)
+    assert not first.compare_and_swap(REQUESTS, request_record("TR_1", status="Rejected"), version)
+
+    stored = open_session().get(REQUESTS, "TR_1")
+    assert stored["status"] == "Approved"
+    assert stored[VERSION_FIELD] == version + 1
+
+
+def test_compare_and_swap_with_version_zero_only_creates(open_session):
+    session = open_session()
+    assert session.compare_and_swap(REQUESTS, request_record("TR_1"), 0)
+    assert not open_session().compare_and_swap(REQUESTS, request_record("TR_1", status="Approved"), 0)
+    assert session.get(REQUESTS, "TR_1")["status"] == "Pending Approval"
+
+
+def test_update_retries_on_the_latest_copy(open_session):
+    first, second = open_session(), open_session()
+    first.upsert(REQUESTS, request_record("TR_1", grades=[]))
+    calls = []
+
+    def add_grade(record):
+        if not calls:
+            # جلسه‌ی دیگر درست بین خواندن و نوشتن همین رکورد را عوض می‌کند
+            second.update(REQUESTS, "TR_1", lambda r: r.update(grades=r["grades"] + ["other"]))
+        calls.append(1)
+        record["grades"] = record["grades"] + ["mine"]
+
+    first.update(REQUESTS, "TR_1", add_grade)
+    assert len(calls) == 2
+    assert open_session().get(REQUESTS, "TR_1")["grades"] == ["other", "mine"]
+
+
+def test_update_many_skips_aborted_mutations(open_session):
+    session = open_session()
+    session.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    before = {r["request_id"]: r.get(VERSION_FIELD, 0) for r in session.load(REQUESTS)}
+
+    changed = session.update_many(REQUESTS, {
+        "TR_1": lambda r: r.update(status="Approved"),
+        "TR_2": lambda r: False,
+        "TR_9": lambda r: r.update(status="Approved"),
+    })
+
+    assert set(changed) == {"TR_1"}
+    stored = {r["request_id"]: r for r in open_session().load(REQUESTS)}
+    assert stored["TR_1"][VERSION_FIELD] == before["TR_1"] + 1
+    assert stored["TR_2"].get(VERSION_FIELD, 0) == before["TR_2"]
+    assert "TR_9" not in stored
+
+
+def test_insert_many_skips_keys_added_by_another_session(open_session):
+    first, second = open_session(), open_session()
+    first.save(REQUESTS, [request_record("TR_1")])
+    first.load(REQUESTS)
+
+    second.upsert(REQUESTS, request_record("TR_2", student_id="S2"))
+    added = first.insert_many(REQUESTS, [request_record("TR_2"), request_record("TR_3"), request_record("TR_3")])
+
+    assert [r["request_id"] for r in added] == ["TR_3"]
+    stored = {r["request_id"]: r for r in open_session().load(REQUESTS)}
+    assert sorted(stored) == ["TR_1", "TR_2", "TR_3"]
+    assert stored["TR_2"]["student_id"] == "S2"
+    assert stored["TR_3"][VERSION_FIELD] == 1
+
+
+def test_remove_many_checks_the_latest_copy(open_session):
+    first, second = open_session(), open_session()
+    first.save(REQUESTS, [request_record("TR_1"), request_record("TR_2")])
+    first.load(REQUESTS)
+
+    second.update(REQUESTS, "TR_2", lambda r: r.update(status="Approved"))
+    pending = lambda r: r.get("status") == "Pending Approval"
+    removed = first.remove_many(REQUESTS, {"TR_1": pending, "TR_2": pending})
+
+    assert set(removed) == {"TR_1"}
+    assert [r["request_id"] for r in open_session().load(REQUESTS)] == ["TR_2"]
@@ -0,0 +1,151 @@
+# test_reservations.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from repository import repository
+from reservations import COURSES_FILE, THESIS_REQUESTS_FILE, SEAT_RETURNED_FIELD, seat_reservations
+
+OLD = (datetime.now() - timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def courses(data_dir):
+    """Two full courses, C0 with one student waiting"""
+    repository.insert_many(COURSES_FILE, [
+        {"course_id": "C0", "title": "T0", "professor": "Dr P", "major": "CS", "capacity": 0,
+         "waitlist": [{"student_id": "W0", "student_name": "w", "major": "CS"}]},
+        {"course_id": "C1", "title": "T1", "professor": "Dr P", "major": "CS", "capacity": 0},
+    ])
+
+
+def add_pending(*requests):
+    repository.insert_many(THESIS_REQUESTS_FILE, [
+        {"request_id": request_id, "student_id": f"S{request_id}", "course_id": course_id,
+         "status": "Pending Approval", "request_date": OLD}
+        for request_id, course_id in requests])
+
+
+def course(course_id):
+    return repository.get(COURSES_FILE, course_id)
+
+
+def request(request_id):
+    return repository.get(THESIS_REQUESTS_FILE, request_id)
+
+
+def count_course_writes(monkeypatch):
+    writes = []
+    update_many = repository.update_many
+
+    def counting(path, mutations):
+        if path == COURSES_FILE:
+            writes.append(sorted(mutations))
+        return update_many(path, mutations)
+    monkeypatch.setattr(repository, "update_many", counting)
+    return writes
+
+
+def fail_course_updates(monkeypatch):
+    update_many = repository.update_many
+
+    def failing(path, mutations):
+        if path == COURSES_FILE:
+            raise OSError("disk full")
+        return update_many(path, mutations)
+    monkeypatch.setattr(repository, "update_many", failing)
+
+
+def test_expire_promotes_the_waitlist_and_returns_the_rest(courses, monkeypatch):
+    add_pending(("TR_1", "C0"), ("TR_2", "C0"), ("TR_3", "C1"))
+    writes = count_course_writes(monkeypatch)
+
+    expired = seat_reservations.expire()
+
+    assert sorted(r["request_id"] for r in expired) == ["TR_1", "TR_2", "TR_3"]
+    assert writes == [["C0", "C1"]]
+    assert (course("C0")["capacity"], course("C0")["waitlist"]) == (1, [])
+    assert course("C1")["capacity"] == 1
+    promoted = repository.find(THESIS_REQUESTS_FILE, student_id="W0")
+    assert [r["status"] for r in promoted] == ["Pending Approval"]
+    for request_id in ("TR_1", "TR_2", "TR_3"):
+        assert request(request_id)["status"] == "Rejected"
+        assert request(request_id)[SEAT_RETURNED_FIELD] is True
+
+
+def test_expire_without_due_requests_writes_nothing(courses, monkeypatch):
+    repository.insert_many(THESIS_REQUESTS_FILE, [{"request_id": "TR_1", "student_id": "S1", "course_id": "C1",
+                                                  "status": "Pending Approval",
+                                                  "request_date": datetime.now().isoformat()}])
+    writes = count_course_writes(monkeypatch)
+    assert seat_reservations.expire() == []
+    assert writes == []
+
+
+def test_rejection_gives_the_seat_back(courses):
+    add_pending(("TR_1", "C1"))
+    changed = repository.update_many(THESIS_REQUESTS_FILE, {"TR_1": lambda r: r.update(
+        status="Rejected", **{SEAT_RETURNED_FIELD: False})})
+    before, after = changed["TR_1"]
+
+    seat_reservations.record_change(THESIS_REQUESTS_FILE, before, after)
+
+    assert course("C1")["capacity"] == 1
+    assert request("TR_1")[SEAT_RETURNED_FIELD] is True
+
+
+def test_a_failed_course_update_is_retried_by_the_next_expire(courses, monkeypatch):
+    add_pending(("TR_1", "C1"))
+    with monkeypatch.context() as patch:
+        fail_course_updates(patch)
+        with pytest.raises(OSError):
+            seat_reservations.expire()
+    assert request("TR_1")["status"] == "Rejected"
+    assert course("C1")["capacity"] == 0
+
+    assert seat_reservations.expire() == []
+    assert course("C1")["capacity"] == 1
+    assert request("TR_1")[SEAT_RETURNED_FIELD] is True
+    seat_reservations.expire()
+    assert course("C1")["capacity"] == 1
+
+
+def test_a_seat_is_returned_once_when_marking_the_request_failed(courses, monkeypatch):
+    add_pending(("TR_1", "C1"))
+    update_many = repository.update_many
+
+    def failing_mark(path, mutations):
+        if path == THESIS_REQUESTS_FILE and any(m.__name__ == "mark_returned" for m in mutations.values()):
+            raise OSError("crash")
+        return update_many(path, mutations)
+    with monkeypatch.context() as patch:
+        patch.setattr(repository, "update_many", failing_mark)
+        with pytest.raises(OSError):
+            seat_reservations.expire()
+    assert course("C1")["capacity"] == 1
+    assert request("TR_1")[SEAT_RETURNED_FIELD] is False
+
+    # جلسه‌ی تازه درخواست را از روی فایل پیدا می‌کند
+    repository.invalidate()
+    seat_reservations.expire()
+    assert course("C1")["capacity"] == 1
+    assert request("TR_1")[SEAT_RETURNED_FIELD] is True
+
+
+def test_a_promotion_that_cannot_be_stored_is_undone(courses, monkeypatch):
+    def failing_insert(path, records):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr(repository, "insert_many", failing_insert)
+        with pytest.raises(OSError):
+            seat_reservations.release("C0")
+
+    assert course("C0")["capacity"] == 1
+    assert [entry["student_id"] for entry in course("C0")["waitlist"]] == ["W0"]
+
+
+def test_join_waitlist_only_queues_for_full_courses(courses):
+    assert seat_reservations.join_waitlist("C0", "W1", "v", "CS") == 2
+    assert seat_reservations.join_waitlist("C0", "W1", "v", "CS") == 2
+    repository.update(COURSES_FILE, "C1", lambda c: c.update(capacity=1))
+    assert seat_reservations.join_waitlist("C1", "W1", "v", "CS") is None
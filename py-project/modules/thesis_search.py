@@ -0,0 +1,305 @@
+# thesis_search.py
+import argparse
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+from repository import repository
+
+DEFENSE_REQUESTS_FILE = "data/defense_requests.json"
+
+# وزن هر فیلد در شمارش تکرار واژه (BM25F ساده)
+FIELD_WEIGHTS = {"thesis_title": 3.0, "keywords": 2.0, "abstract": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_PERSIAN_TABLE = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و",
+    "‌": " ",  # نیم‌فاصله: «پایان‌نامه‌ها» -> «پایان نامه ها»
+    "ـ": None,  # کشیده
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # ارقام فارسی
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # ارقام عربی
+})
+_TOKEN = re.compile(r"\w+")
+# اعراب عربی/فارسی و نشانه‌های ترکیبی لاتین (é -> e بعد از NFKD)
+_COMBINING = re.compile("[\u0300-\u036f\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from in into is it its of on or that the this to with using via
+و در به از که این آن با را برای یک تا ها های است می شود
+""".split())
+
+
+def normalize(text: str) -> str:
+    """Case-fold and unify Persian/Arabic letters, digits and diacritics"""
+    text = text or ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text.translate(_PERSIAN_TABLE))
+    return _COMBINING.sub("", text).casefold()
+
+
+def _stem(token: str) -> str:
+    # فقط جمع انگلیسی؛ پسوندهای فارسی با نیم‌فاصله جدا شده‌اند
+    if not token.isascii() or len(token) <= 3:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "xes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(normalize(text)) if t not in STOPWORDS]
+
+
+_STEMS: Dict[str, str] = {}
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    """tokenize() as term -> count; stems each distinct word once"""
+    counts: Dict[str, int] = {}
+    for word, count in Counter(_TOKEN.findall(normalize(text))).items():
+        if word not in STOPWORDS:
+            term = _STEMS.get(word)
+            if term is None:
+                term = _STEMS[word] = _stem(word)
+            counts[term] = counts.get(term, 0) + count
+    return counts
+
+
+def field_counts(record: dict) -> Dict[str, float]:
+    """Term counts of a defense request's title, abstract and keywords, weighted by FIELD_WEIGHTS"""
+    frequencies: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = record.get(field)
+        text = " ".join(value) if isinstance(value, list) else value
+        for term, count in term_counts(text or "").items():
+            frequencies[term] = frequencies.get(term, 0.0) + count * weight
+    return frequencies
+
+
+class ThesisSearchIndex:
+    """In-memory inverted index over defense request titles, abstracts and keywords.
+
+    Submitted requests are added as they are stored (add); refresh() picks up
+    what other sessions wrote: records appended to the cached collection are
+    indexed on their own, and only a reloaded collection is diffed by ID.
+    Title, abstract and keywords never change after submission, so the status
+    filter is checked on the live record of each hit instead of the index.
+    """
+
+    def __init__(self, path: str = DEFENSE_REQUESTS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._source = None
+        self._source_len = 0
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._docs: Dict[str, int] = {}  # defense_id -> doc number
+        self._ids: List[Optional[str]] = []
+        self._positions: List[int] = []  # doc -> index in the loaded collection
+        self._terms: List[tuple] = []
+        self._lengths: List[float] = []
+        self._professors: List[str] = []
+        self._years: List[str] = []
+        self._norms: Optional[List[float]] = None
+        self._total_length = 0.0
+        self._generation = 0
+        self._impact_cache: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ----------------- ساخت ایندکس -----------------
+    def add(self, record: dict, position: int = -1):
+        """Index (or re-index) one defense request"""
+        with self._lock:
+            defense_id = record.get("defense_id")
+            if not defense_id:
+                return
+            if defense_id in self._docs:
+                self._remove(defense_id)
+            frequencies = field_counts(record)
+            doc = len(self._ids)
+            self._docs[defense_id] = doc
+            self._ids.append(defense_id)
+            self._positions.append(position)
+            self._terms.append(tuple(frequencies))
+            length = sum(frequencies.values())
+            self._lengths.append(length)
+            self._total_length += length
+            self._professors.append(record.get("professor") or "")
+            self._years.append((record.get("request_date") or "")[:4])
+            postings = self._postings
+            for term, frequency in frequencies.items():
+                term_postings = postings.get(term)
+                if term_postings is None:
+                    postings[term] = {doc: frequency}
+                else:
+                    term_postings[doc] = frequency
+            self._norms = None
+            self._generation += 1
+
+    def _remove(self, defense_id: str):
+        doc = self._docs.pop(defense_id)
+        for term in self._terms[doc]:
+            postings = self._postings[term]
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths[doc]
+        self._ids[doc], self._terms[doc], self._lengths[doc] = None, (), 0.0
+        self._norms = None
+        self._generation += 1
+
+    def refresh(self):
+        """Bring the index up to date with the stored defense requests"""
+        with self._lock:
+            records = repository.load(self.path)
+            if records is self._source and len(records) >= self._source_len:
+                for position in range(self._source_len, len(records)):
+                    self._sync(records[position], position)
+            else:
+                current = {r.get("defense_id"): i for i, r in enumerate(records) if r.get("defense_id")}
+                for defense_id in [d for d in self._docs if d not in current]:
+                    self._remove(defense_id)
+                for defense_id, position in current.items():
+                    self._sync(records[position], position)
+            self._source, self._source_len = records, len(records)
+
+    def _sync(self, record: dict, position: int):
+        doc = self._docs.get(record.get("defense_id"))
+        if doc is None:
+            self.add(record, position)
+        else:
+            self._positions[doc] = position
+
+    def _record(self, doc: int) -> Optional[dict]:
+        """Live record of doc from the loaded collection"""
+        position = self._positions[doc]
+        if 0 <= position < len(self._source) and self._source[position].get("defense_id") == self._ids[doc]:
+            return self._source[position]
+        return repository.get(self.path, self._ids[doc])
+
+    def rebuild(self):
+        with self._lock:
+            self._clear()
+            self.refresh()
+
+    # ----------------- جستجو -----------------
+    def _doc_norms(self) -> List[float]:
+        if self._norms is None:
+            average = self._total_length / len(self._docs) if self._docs else 1.0
+            self._norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / (average or 1.0))
+                           for length in self._lengths]
+        return self._norms
+
+    def _impacts(self, term: str) -> Optional[tuple]:
+        """(postings sorted by BM25 contribution, doc -> contribution) for term.
+
+        Cached until the next change to the index; idf and length norms move
+        with every added document.
+        """
+        cached = self._impact_cache.get(term)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1], cached[2]
+        postings = self._postings.get(term)
+        if not postings:
+            return None
+        norms = self._doc_norms()
+        idf = math.log(1 + (len(self._docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+        contributions = {doc: idf * frequency * (BM25_K1 + 1) / (frequency + norms[doc])
+                         for doc, frequency in postings.items()}
+        ordered = sorted(contributions.items(), key=lambda item: -item[1])
+        self._impact_cache[term] = (self._generation, ordered, contributions)
+        return ordered, contributions
+
+    def search(self, query: str, status: Optional[str] = None, professor: Optional[str] = None,
+               year=None, limit: int = 10) -> List[dict]:
+        """Top `limit` BM25 matches for query, optionally filtered.
+
+        Uses the threshold algorithm over impact-ordered postings: lists are
+        walked in parallel from their best entries, each new document is
+        scored in full by lookups, and the walk stops as soon as no unseen
+        document could still enter the top results. Common terms therefore
+        cost about `limit` steps instead of their whole postings list.
+        """
+        if limit <= 0:
+            return []
+        professor = professor.strip().casefold() if professor else None
+        year = str(year) if year else None
+        with self._lock:
+            self.refresh()
+            lists = [impacts for impacts in map(self._impacts, set(tokenize(query))) if impacts]
+            top, seen, depth = [], set(), 0
+            while lists:
+                threshold, advanced = 0.0, False
+                for ordered, _ in lists:
+                    if depth >= len(ordered):
+                        continue
+                    advanced = True
+                    doc, contribution = ordered[depth]
+                    threshold += contribution
+                    if doc in seen:
+                        continue
+                    seen.add(doc)
+                    if professor and self._professors[doc].casefold() != professor:
+                        continue
+                    if year and self._years[doc] != year:
+                        continue
+                    if status:
+                        record = self._record(doc)
+                        if record is None or record.get("status") != status:
+                            continue
+                    entry = (sum(contributions.get(doc, 0.0) for _, contributions in lists), -doc)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+                if not advanced or (len(top) >= limit and top[0][0] >= threshold):
+                    break
+                depth += 1
+
+            hits = [(score, self._record(-negative_doc)) for score, negative_doc in sorted(top, reverse=True)]
+
+        return [{
+            "defense_id": record.get("defense_id"),
+            "score": round(score, 4),
+            "thesis_title": record.get("thesis_title"),
+            "student_name": record.get("student_name"),
+            "professor": record.get("professor"),
+            "status": record.get("status"),
+            "year": (record.get("request_date") or "")[:4],
+            "keywords": record.get("keywords", []),
+        } for score, record in hits if record is not None]
+
+
+thesis_search = ThesisSearchIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search defense requests by title, abstract and keywords")
+    parser.add_argument("query")
+    parser.add_argument("--status", help='e.g. "Approved"')
+    parser.add_argument("--professor", help="supervising professor's name")
+    parser.add_argument("--year", help="year the defense was requested")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    results = thesis_search.search(args.query, args.status, args.professor, args.year, args.limit)
+    if not results:
+        print("❌ No matching theses")
+    for rank, hit in enumerate(results, 1):
+        print(f"{rank}. [{hit['score']:.2f}] {hit['thesis_title']} — {hit['student_name']} "
+              f"({hit['professor']}, {hit['year']}, {hit['status']})")
+        print(f"   {hit['defense_id']}  keywords: {', '.join(hit['keywords'])}")
@@ -0,0 +1,170 @@
+# upload_store.py
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional
+
+CHUNK_SIZE = 1024 * 1024
+# %PDF- may appear a little after the start and %%EOF a little before the end
+HEADER_WINDOW = 1024
+TRAILER_WINDOW = 1024
+
+MAGIC_BYTES = {
+    "jpeg": b"\xff\xd8\xff",
+    "png": b"\x89PNG\r\n\x1a\n",
+}
+KIND_EXTENSIONS = {
+    "pdf": {".pdf"},
+    "jpeg": {".jpg", ".jpeg"},
+    "png": {".png"},
+}
+_PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+class FileValidator:
+    """Checks a file incrementally while it is being copied.
+
+    feed() is called with consecutive chunks and only the first and last
+    kilobyte plus a small overlap are kept, so memory use does not depend on
+    the file size. The page count is the number of uncompressed /Type /Page
+    objects; PDFs that keep their pages in compressed object streams report
+    no page count instead of failing.
+    """
+
+    def __init__(self, extension: str, allowed_kinds: Optional[Iterable[str]] = None):
+        self.extension = extension.lower()
+        self.allowed_kinds = set(allowed_kinds) if allowed_kinds else set(KIND_EXTENSIONS)
+        self.head = b""
+        self.tail = b""
+        self.size = 0
+        self.pages = 0
+        self._counted_upto = 0
+
+    def feed(self, chunk: bytes):
+        if len(self.head) < HEADER_WINDOW:
+            self.head += chunk[:HEADER_WINDOW - len(self.head)]
+        buffer = self.tail + chunk
+        self._count_pages(buffer, self.size - len(self.tail), final=False)
+        self.size += len(chunk)
+        self.tail = buffer[-TRAILER_WINDOW:]
+
+    def _count_pages(self, buffer: bytes, base: int, final: bool):
+        for match in _PAGE_OBJECT.finditer(buffer):
+            # بدون بایت بعدی نمی‌توان /Page را از /Pages تشخیص داد
+            if base + match.end() > self._counted_upto and (final or match.end() < len(buffer)):
+                self.pages += 1
+        self._counted_upto = base + len(buffer) - (0 if final else 1)
+
+    def _detect_kind(self) -> Optional[str]:
+        if b"%PDF-" in self.head:
+            return "pdf"
+        for kind, magic in MAGIC_BYTES.items():
+            if self.head.startswith(magic):
+                return kind
+        return None
+
+    def result(self) -> Dict:
+        self._count_pages(self.tail, self.size - len(self.tail), final=True)
+        kind = self._detect_kind()
+        errors = []
+        if self.size == 0:
+            errors.append("file is empty")
+        elif kind is None:
+            errors.append("unrecognised file content")
+        else:
+            if kind not in self.allowed_kinds:
+                errors.append(f"{kind.upper()} files are not allowed here")
+            if self.extension not in KIND_EXTENSIONS[kind]:
+                errors.append(f"content is {kind.upper()} but the extension is {self.extension or 'missing'}")
+            if kind == "pdf" and b"%%EOF" not in self.tail:
+                errors.append("PDF is truncated (no %%EOF trailer)")
+            if kind == "jpeg" and b"\xff\xd9" not in self.tail:
+                errors.append("JPEG is truncated (no end-of-image marker)")
+            if kind == "png" and b"IEND" not in self.tail:
+                errors.append("PNG is truncated (no IEND chunk)")
+        return {
+            "valid": not errors,
+            "kind": kind,
+            "size": self.size,
+            "pages": (self.pages or None) if kind == "pdf" else None,
+            "errors": errors
+        }
+
+
+class UploadStore:
+    """Content-addressed storage for uploaded thesis files.
+
+    A file is streamed in chunks into a temporary file while its SHA-256 is
+    computed, then kept as <root>/<first two hex chars>/<digest><ext>. If that
+    object already exists (for example a thesis re-submitted after a rejected
+    defense) the temporary copy is dropped, so identical content is stored
+    only once. Files that fail validation are never stored.
+    """
+
+    def __init__(self, root: str = "uploads/theses", workers: int = 2):
+        self.root = Path(root)
+        self.workers = workers
+        self._executor = None
+
+    def object_path(self, digest: str, extension: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{extension.lower()}"
+
+    def put(self, source_path: str, extension: str, allowed_kinds: Optional[Iterable[str]] = None) -> Dict:
+        """Validate and copy source_path into the store.
+
+        Returns the validation result (valid, kind, size, pages, errors) with
+        sha256, deduplicated and path added; path is None for invalid files.
+        """
+        with open(source_path, 'rb') as src:
+            return self.put_stream(src, extension, allowed_kinds)
+
+    def put_stream(self, stream: BinaryIO, extension: str, allowed_kinds: Optional[Iterable[str]] = None,
+                   length: Optional[int] = None) -> Dict:
+        """Like put() but reads from an open binary stream (length bytes if given)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        validator = FileValidator(extension, allowed_kinds)
+        digest = hashlib.sha256()
+        remaining = length
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                while remaining is None or remaining > 0:
+                    chunk = stream.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        if remaining:
+                            raise ValueError(f"upload ended {remaining} bytes early")
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    digest.update(chunk)
+                    validator.feed(chunk)
+                    dst.write(chunk)
+
+            result = validator.result()
+            result["sha256"] = digest.hexdigest()
+            destination = self.object_path(result["sha256"], extension)
+            result["deduplicated"] = result["valid"] and destination.exists()
+            if not result["valid"] or result["deduplicated"]:
+                os.remove(tmp_path)
+            else:
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, destination)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        result["path"] = str(destination) if result["valid"] else None
+        return result
+
+    def submit(self, source_path: str, extension: str, allowed_kinds: Optional[Iterable[str]] = None) -> Future:
+        """Run put() on a background thread and return its Future"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        return self._executor.submit(self.put, source_path, extension, allowed_kinds)
+
+
+upload_store = UploadStore()
@@ -1,11 +1,11 @@
 # user.py
 import hashlib
-import json
-import os
 import random
 import string
 from enum import Enum
 from typing import List, Optional
+from repository import repository
+from user_directory import UserDirectory
 
 class UserType(Enum):
     STUDENT = "student"
@@ -13,10 +13,15 @@ class UserType(Enum):
     REVIEWER = "reviewer"  
     GUEST_REVIEWER = "guest_reviewer"
 
+def hash_password(password: str) -> str:
+    """SHA-256 hex digest stored in the users files"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
 class User:
     _students_file = "data/students.json"
     _professors_file = "data/professors.json"
     _guest_reviewers_file = "data/guest_reviewers.json"
+    _directory = None
     
     def __init__(self, user_id: str, name: str, password: str, user_type: UserType, 
                  national_id: str = None, major: str = None):
@@ -28,7 +33,7 @@ class User:
         self.major = major
 
     def _hash_password(self, password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
+        return hash_password(password)
 
     def verify_password(self, password: str) -> bool:
         return self.password == hashlib.sha256(password.encode()).hexdigest()
@@ -72,31 +77,32 @@ class User:
         file_path = cls._get_file_path(user_type)
         if not file_path:
             return []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return repository.load(file_path)
 
     @classmethod
-    def _save_users(cls, users: List[dict], user_type: UserType):
-        file_path = cls._get_file_path(user_type)
-        if not file_path:
-            return
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+    def _users_directory(cls) -> UserDirectory:
+        """Shared user_id / national_id index over all user files"""
+        if User._directory is None:
+            User._directory = UserDirectory({
+                user_type: User._get_file_path(user_type)
+                for user_type in [UserType.STUDENT, UserType.PROFESSOR, UserType.GUEST_REVIEWER]
+            })
+        return User._directory
+
+    @classmethod
+    def _add_user(cls, user_data: dict, user_type: UserType):
+        """Append a user record to its file and index it"""
+        repository.upsert(cls._get_file_path(user_type), user_data)
+        cls._users_directory().add(user_type, user_data)
 
     @classmethod
     def login(cls, user_id: str, password: str) -> Optional[tuple]:
         """Login user and return (user_type, user_id) or None if failed"""
         # چک کردن همه انواع کاربران
-        for user_type in [UserType.STUDENT, UserType.PROFESSOR, UserType.GUEST_REVIEWER]:
-            users = cls._load_users(user_type)
-            for user_data in users:
-                if user_data["user_id"] == user_id:
-                    if hashlib.sha256(password.encode()).hexdigest() == user_data["password"]:
-                        return user_type, user_id
+        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        for user_type, user_data in cls._users_directory().lookup(user_id):
+            if password_hash == user_data["password"]:
+                return user_type, user_id
         return None
 
     @classmethod
@@ -113,38 +119,39 @@ class User:
             return False
     
         new_user = cls(user_id, name, password, user_type, national_id, major)
-        users = cls._load_users(user_type)
-        users.append(new_user.to_dict())
-        cls._save_users(users, user_type)
+        cls._add_user(new_user.to_dict(), user_type)
         return True
     
     @classmethod
     def reset_password_with_national_id(cls, user_type: UserType, national_id: str) -> Optional[str]:
         """Password recovery with national ID"""
-        users = cls._load_users(user_type)
+        user_data = cls._users_directory().find_by_national_id(user_type, national_id)
         
-        for user_data in users:
-            if user_data.get("national_id") == national_id:
-                temp_password = cls._generate_temp_password()
-                user_data["password"] = hashlib.sha256(temp_password.encode()).hexdigest()
-                cls._save_users(users, user_type)
-                return temp_password
+        if user_data:
+            temp_password = cls._generate_temp_password()
+            cls._store_password(user_type, user_data, temp_password)
+            return temp_password
         
         return None
 
     @classmethod
     def change_password(cls, user_id: str, old_password: str, new_password: str) -> bool:
         """Change user password"""
-        for user_type in [UserType.STUDENT, UserType.PROFESSOR, UserType.GUEST_REVIEWER]:
-            users = cls._load_users(user_type)
-            for user_data in users:
-                if user_data["user_id"] == user_id:
-                    if hashlib.sha256(old_password.encode()).hexdigest() == user_data["password"]:
-                        user_data["password"] = hashlib.sha256(new_password.encode()).hexdigest()
-                        cls._save_users(users, user_type)
-                        return True
+        old_hash = hashlib.sha256(old_password.encode()).hexdigest()
+        for user_type, user_data in cls._users_directory().lookup(user_id):
+            if old_hash == user_data["password"]:
+                cls._store_password(user_type, user_data, new_password)
+                return True
         return False
 
+    @classmethod
+    def _store_password(cls, user_type: UserType, user_data: dict, password: str):
+        """Store a copy of user_data with a new password, then index the stored copy"""
+        # رکورد کش‌شده تا ذخیره‌ی موفق دست نمی‌خورد
+        updated = {**user_data, "password": hashlib.sha256(password.encode()).hexdigest()}
+        repository.upsert(cls._get_file_path(user_type), updated)
+        cls._users_directory().replace(user_type, updated)
+
     @classmethod
     def _generate_temp_password(cls, length: int = 8) -> str:
         """Generate temporary password"""
@@ -154,17 +161,13 @@ class User:
     @classmethod
     def _user_exists(cls, user_id: str) -> bool:
         """Check if user ID exists"""
-        for user_type in [UserType.STUDENT, UserType.PROFESSOR, UserType.GUEST_REVIEWER]:  # GUEST_REVIEWER اضافه شد
-            users = cls._load_users(user_type)
-            if any(user["user_id"] == user_id for user in users):
-                return True
-        return False
+        # شامل GUEST_REVIEWER
+        return any(True for _ in cls._users_directory().lookup(user_id))
 
     @classmethod
     def _national_id_exists(cls, national_id: str, user_type: UserType) -> bool:
         """Check if national ID exists"""
-        users = cls._load_users(user_type)
-        return any(user.get("national_id") == national_id for user in users)
+        return cls._users_directory().find_by_national_id(user_type, national_id) is not None
 
     @classmethod
     def redirect_after_login(cls, user_type: UserType, user_id: str):
@@ -200,18 +203,14 @@ class User:
         if is_guest:
             user_type = UserType.GUEST_REVIEWER
             new_user = cls(user_id, name, password, user_type, national_id)
-            users = cls._load_users(UserType.GUEST_REVIEWER)  # تغییر شد: از GUEST_REVIEWER استفاده کن
             user_data = new_user.to_dict()
             user_data["affiliation"] = affiliation
-            users.append(user_data)
-            cls._save_users(users, UserType.GUEST_REVIEWER) 
+            cls._add_user(user_data, UserType.GUEST_REVIEWER)
         else:
             # ثبت داور داخلی (همون استاد)
             user_type = UserType.PROFESSOR
             new_user = cls(user_id, name, password, user_type, national_id)
-            users = cls._load_users(user_type)
-            users.append(new_user.to_dict())
-            cls._save_users(users, user_type)
+            cls._add_user(new_user.to_dict(), user_type)
     
         return True
 
@@ -221,12 +220,4 @@ class User:
         if user_type == UserType.REVIEWER:
             return cls._load_users(UserType.PROFESSOR)
         else:
-            return cls._load_users(UserType.GUEST_REVIEWER)
-
-    @classmethod
-    def _save_reviewers(cls, users: List[dict], user_type: UserType):
-        """Save reviewers to file"""
-        if user_type == UserType.REVIEWER:
-            cls._save_users(users, UserType.PROFESSOR)
-        else:
-            cls._save_users(users, UserType.GUEST_REVIEWER)
\ No newline at end of file
+            return cls._load_users(UserType.GUEST_REVIEWER)
\ No newline at end of file
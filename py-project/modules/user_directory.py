@@ -0,0 +1,68 @@
+# user_directory.py
+from typing import Dict, Iterator, Optional, Tuple
+from repository import repository
+
+
+class UserDirectory:
+    """Hash indexes over the user files (user_id and national_id lookups).
+
+    sources maps each user type to its data file, in the order in which
+    login checks them. The index of a user type is rebuilt only when the
+    repository hands back a different list for its file (i.e. the file was
+    changed by someone else); local changes are applied with add().
+    """
+
+    def __init__(self, sources: Dict[object, str]):
+        self._sources = dict(sources)
+        self._loaded: Dict[object, Tuple[list, int]] = {}
+        self._by_id: Dict[object, Dict[str, dict]] = {}
+        self._by_national_id: Dict[object, Dict[str, str]] = {}
+
+    def _refresh(self, user_type) -> Dict[str, dict]:
+        path = self._sources.get(user_type)
+        if path is None:
+            return {}
+        records = repository.load(path)
+        loaded = self._loaded.get(user_type)
+        if loaded is None or loaded[0] is not records or loaded[1] != len(records):
+            by_id, by_national_id = {}, {}
+            for record in records:
+                by_id.setdefault(record.get("user_id"), record)
+                if record.get("national_id"):
+                    by_national_id.setdefault(record["national_id"], record.get("user_id"))
+            self._by_id[user_type] = by_id
+            self._by_national_id[user_type] = by_national_id
+            self._loaded[user_type] = (records, len(records))
+        return self._by_id[user_type]
+
+    def lookup(self, user_id: str) -> Iterator[Tuple[object, dict]]:
+        """Yield (user_type, record) for every user type that has user_id"""
+        for user_type in self._sources:
+            record = self._refresh(user_type).get(user_id)
+            if record is not None:
+                yield user_type, record
+
+    def get(self, user_type, user_id: str) -> Optional[dict]:
+        return self._refresh(user_type).get(user_id)
+
+    def find_by_national_id(self, user_type, national_id: str) -> Optional[dict]:
+        self._refresh(user_type)
+        user_id = self._by_national_id.get(user_type, {}).get(national_id)
+        return None if user_id is None else self._by_id[user_type].get(user_id)
+
+    def add(self, user_type, record: dict):
+        """Index a record that was just stored in the file of user_type"""
+        loaded = self._loaded.get(user_type)
+        records = repository.load(self._sources[user_type])
+        if loaded is None or loaded[0] is not records:
+            self._refresh(user_type)
+            return
+        self._loaded[user_type] = (records, len(records))
+        self._by_id[user_type].setdefault(record.get("user_id"), record)
+        if record.get("national_id"):
+            self._by_national_id[user_type].setdefault(record["national_id"], record.get("user_id"))
+
+    def replace(self, user_type, record: dict):
+        """Index a stored record that replaced the one with the same user_id"""
+        self._refresh(user_type)
+        self._by_id[user_type][record.get("user_id")] = record